@@ -0,0 +1,184 @@
+"""Query latency of the project/execution hot paths with and without indexes.
+
+Seeds a scratch database with synthetic projects, scripts and executions
+(1M executions by default), then times the query shapes used by
+``project/service.py`` twice: once with only ``_id`` indexes and once after
+creating ``project.indexes.INDEXES``. Each query also reports the winning
+plan stage and documents examined (from ``explain``)::
+
+    python -m bench.index_bench                                   # localhost, 1M executions
+    python -m bench.index_bench --mongo-uri mongodb://db:27017 --executions 200000
+    python -m bench.index_bench --reuse --json                    # keep the seeded data
+
+Needs a real MongoDB (mongomock has no query planner). The scratch database
+(``--db``, default ``xray_index_bench``) is dropped unless ``--reuse``/``--keep``.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from pymongo import MongoClient
+
+from project.indexes import INDEXES
+
+STATUSES = ["success"] * 8 + ["error", "limit_exceeded"]
+
+
+def seed(db, projects: int, scripts_per_project: int, executions: int, seed: int = 0, batch: int = 10_000):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=90)
+    db.projects.insert_many([
+        {"projectId": f"P{i:06d}", "projectStatus": "active" if i % 4 else "passive",
+         "tags": [f"tag{i % 10}"], "executionConfig": {}}
+        for i in range(projects)
+    ])
+    db.scripts.insert_many([
+        {"scriptId": f"S{i:06d}V{v}", "projectId": f"P{i:06d}", "version": v, "code": "OUTPUT={}"}
+        for i in range(projects) for v in range(1, scripts_per_project + 1)
+    ])
+    docs: List[Dict[str, Any]] = []
+    for n in range(executions):
+        p = rng.randrange(projects)
+        v = rng.randint(1, scripts_per_project)
+        t = start + timedelta(seconds=n * 90 * 86400 / executions)
+        docs.append({
+            "executionId": f"E{n:09d}",
+            "projectId": f"P{p:06d}",
+            "scriptId": f"S{p:06d}V{v}",
+            "scriptVersion": v,
+            "status": rng.choice(STATUSES),
+            "startTime": t.isoformat(),
+            "endTime": (t + timedelta(seconds=3)).isoformat(),
+            "duration": round(rng.uniform(0.5, 60), 3),
+            "resultCount": rng.randint(0, 50),
+            "output": "",
+            "errorMessage": "",
+        })
+        if len(docs) >= batch:
+            db.executions.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        db.executions.insert_many(docs, ordered=False)
+
+
+def queries(db, projects: int, executions: int) -> Dict[str, Callable[[random.Random], Any]]:
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+
+    def pid(rng):
+        return f"P{rng.randrange(projects):06d}"
+
+    order = [("startTime", -1), ("executionId", -1)]
+    deep = 25 * 20  # 26. sayfa (proje başına ~1000 execution, 20'lik sayfalar)
+
+    def keyset_page(rng):
+        # list_executions: cursor'daki (startTime, executionId)'den sonrası
+        p = pid(rng)
+        last = list(db.executions.find({"projectId": p}, {"startTime": 1, "executionId": 1})
+                    .sort(order).skip(deep - 1).limit(1))
+        after = last[0] if last else {"startTime": "", "executionId": ""}
+        return db.executions.find({"projectId": p, "$or": [
+            {"startTime": {"$lt": after["startTime"]}},
+            {"startTime": after["startTime"], "executionId": {"$lt": after["executionId"]}},
+        ]}).sort(order).limit(20)
+
+    return {
+        # find_script / resolve_script
+        "latest_script": lambda rng: db.scripts.find({"projectId": pid(rng)}).sort("version", -1).limit(1),
+        # list_executions
+        "list_executions": lambda rng: db.executions.find({"projectId": pid(rng)}).sort(order).limit(20),
+        "list_executions_status": lambda rng: db.executions.find(
+            {"projectId": pid(rng), "status": "error"}).sort(order).limit(20),
+        "list_executions_script": lambda rng: db.executions.find(
+            {"projectId": (p := pid(rng)), "scriptId": f"S{p[1:]}V1"}).sort(order).limit(20),
+        "deep_page_skip": lambda rng: db.executions.find({"projectId": pid(rng)}).sort(order).skip(deep).limit(20),
+        # cursor'u bulan ilk sorgu hazırlıktır, ölçülen keyset sayfasının kendisidir
+        "deep_page_keyset": keyset_page,
+        "get_execution": lambda rng: db.executions.find(
+            {"executionId": f"E{rng.randrange(executions):09d}"}).limit(1),
+        "get_project": lambda rng: db.projects.find({"projectId": pid(rng)}).limit(1),
+        # execution_stats window
+        "stats_window": lambda rng: db.executions.find({"startTime": {"$gte": since}}, {"duration": 1}),
+    }
+
+
+def _plan(cursor) -> Dict[str, Any]:
+    explain = cursor.explain()
+    stats = explain.get("executionStats", {})
+    stage = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # en içteki aşama: COLLSCAN / IXSCAN
+    while "inputStage" in stage:
+        stage = stage["inputStage"]
+    return {"stage": stage.get("stage"), "docsExamined": stats.get("totalDocsExamined")}
+
+
+def measure(db, projects: int, executions: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for name, make in queries(db, projects, executions).items():
+        rng = random.Random(1)
+        times = []
+        for _ in range(repeat):
+            cursor = make(rng)
+            t0 = time.perf_counter()
+            list(cursor)
+            times.append((time.perf_counter() - t0) * 1000)
+        times.sort()
+        out[name] = {
+            "median_ms": round(statistics.median(times), 3),
+            "p95_ms": round(times[max(int(len(times) * 0.95) - 1, 0)], 3),
+            **_plan(make(random.Random(1))),
+        }
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark service queries with and without Mongo indexes")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="xray_index_bench", help="scratch database (dropped!)")
+    parser.add_argument("--executions", type=int, default=1_000_000)
+    parser.add_argument("--projects", type=int, default=1_000)
+    parser.add_argument("--scripts-per-project", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--reuse", action="store_true", help="reuse already seeded data")
+    parser.add_argument("--keep", action="store_true", help="do not drop the scratch database at the end")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    client = MongoClient(args.mongo_uri)
+    db = client[args.db]
+    if not (args.reuse and db.executions.estimated_document_count() >= args.executions):
+        client.drop_database(args.db)
+        t0 = time.perf_counter()
+        seed(db, args.projects, args.scripts_per_project, args.executions)
+        print(f"seeded {args.executions} executions in {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+
+    results = {}
+    for coll in INDEXES:
+        db[coll].drop_indexes()
+    results["no_indexes"] = measure(db, args.projects, args.executions, args.repeat)
+    t0 = time.perf_counter()
+    for coll, models in INDEXES.items():
+        db[coll].create_indexes(models)
+    print(f"built indexes in {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+    results["indexed"] = measure(db, args.projects, args.executions, args.repeat)
+
+    if not (args.keep or args.reuse):
+        client.drop_database(args.db)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'query':<24} {'no index ms':>12} {'stage':>9} {'docs':>9}   {'indexed ms':>11} {'stage':>9} {'docs':>6}")
+    for name, before in results["no_indexes"].items():
+        after = results["indexed"][name]
+        print(f"{name:<24} {before['median_ms']:>12.2f} {before['stage'] or '':>9} {before['docsExamined'] or 0:>9}"
+              f"   {after['median_ms']:>11.2f} {after['stage'] or '':>9} {after['docsExamined'] or 0:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Load generator for a running XRAY API.
+
+Drives one scenario at a set of concurrency levels and reports throughput
+and latency percentiles::
+
+    python -m bench.mock_openai --port 8100 &          # fake model, no network
+    python xray-api.py &
+    python -m bench.load_test ask_stream --model mock-local --concurrency 1,4,16 --duration 20
+    python -m bench.load_test ws --concurrency 10,100
+    python -m bench.load_test tools_run --concurrency 1,8,32
+
+Scenarios:
+
+``ask_stream``
+    ``POST /api/chat/ask_stream``; latency is until the SSE stream ends, TTFB
+    is until the first event. The API allows one active generation at a
+    time, so concurrent requests beyond the first report ``409`` – which is
+    exactly the contention this measures.
+``ws``
+    Connect to ``/ws/bridge`` and wait for the initial ``memory_update``.
+``tools_run``
+    ``POST /api/tools/run`` against a UI tool (``loadtest_echo``) that this
+    script registers and answers itself over ``/ws/bridge``, so the full
+    router → WebSocket → result path is exercised without external tools.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import websockets
+
+ECHO_TOOL = "loadtest_echo"
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, int(round(p / 100 * len(s) + 0.5)) - 1))
+    return s[k]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfb: List[float] = []
+        self.outcomes: Counter = Counter()
+
+    def add(self, outcome: str, latency: float, ttfb: Optional[float] = None):
+        self.outcomes[outcome] += 1
+        if outcome == "ok":
+            self.latencies.append(latency)
+            if ttfb is not None:
+                self.ttfb.append(ttfb)
+
+    def report(self, concurrency: int, elapsed: float) -> Dict[str, Any]:
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        ok = self.outcomes.get("ok", 0)
+        out = {
+            "concurrency": concurrency,
+            "requests": sum(self.outcomes.values()),
+            "ok": ok,
+            "outcomes": dict(self.outcomes),
+            "throughput_rps": round(ok / elapsed, 2) if elapsed else 0,
+            "p50_ms": ms(percentile(self.latencies, 50)),
+            "p90_ms": ms(percentile(self.latencies, 90)),
+            "p99_ms": ms(percentile(self.latencies, 99)),
+            "mean_ms": ms(statistics.fmean(self.latencies)) if self.latencies else None,
+        }
+        if self.ttfb:
+            out["ttfb_p50_ms"] = ms(percentile(self.ttfb, 50))
+            out["ttfb_p99_ms"] = ms(percentile(self.ttfb, 99))
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Scenarios – each performs ONE request and records it in Stats
+# ---------------------------------------------------------------------------
+
+async def ask_stream_once(client: httpx.AsyncClient, args, stats: Stats, i: int):
+    t0 = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream("POST", "/api/chat/ask_stream",
+                                 json={"message": f"{args.message} #{i}", "model": args.model}) as r:
+            if r.status_code != 200:
+                await r.aread()
+                stats.add(str(r.status_code), time.perf_counter() - t0)
+                return
+            async for line in r.aiter_lines():
+                if line.startswith("data:") and ttfb is None:
+                    ttfb = time.perf_counter() - t0
+        stats.add("ok", time.perf_counter() - t0, ttfb)
+    except Exception as exc:
+        stats.add(type(exc).__name__, time.perf_counter() - t0)
+
+
+async def ws_once(client: httpx.AsyncClient, args, stats: Stats, i: int):
+    t0 = time.perf_counter()
+    try:
+        async with websockets.connect(args.ws_url, max_size=None) as ws:
+            while True:
+                msg = json.loads(await ws.recv())
+                if msg.get("event") == "memory_update":
+                    break
+        stats.add("ok", time.perf_counter() - t0)
+    except Exception as exc:
+        stats.add(type(exc).__name__, time.perf_counter() - t0)
+
+
+async def tools_run_once(client: httpx.AsyncClient, args, stats: Stats, i: int):
+    t0 = time.perf_counter()
+    try:
+        r = await client.post("/api/tools/run", json={"tool_name": f"ui__{ECHO_TOOL}",
+                                                     "params": {"text": f"ping {i}"}})
+        body = r.json()
+        ok = r.status_code == 200 and not (isinstance(body, dict) and body.get("error"))
+        stats.add("ok" if ok else f"{r.status_code}:error", time.perf_counter() - t0)
+    except Exception as exc:
+        stats.add(type(exc).__name__, time.perf_counter() - t0)
+
+
+async def echo_responder(ws_url: str, ready: asyncio.Event):
+    """Answer every ``loadtest_echo`` tool call broadcast on the bridge."""
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        ready.set()
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get("event") == "tool_call" and msg.get("tool") == ECHO_TOOL:
+                await ws.send(json.dumps({"event": "tool_result", "call_id": msg["call_id"],
+                                          "result": json.dumps(msg.get("args", {}))}))
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "ask_stream": ask_stream_once,
+    "ws": ws_once,
+    "tools_run": tools_run_once,
+}
+
+
+async def run_level(scenario: Callable, args, concurrency: int) -> Dict[str, Any]:
+    stats = Stats()
+    deadline = time.perf_counter() + args.duration
+    counter = iter(range(sys.maxsize))
+    limits = httpx.Limits(max_connections=concurrency + 4, max_keepalive_connections=concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                n = next(counter)
+                if args.requests and n >= args.requests:
+                    return
+                await scenario(client, args, stats, n)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    return stats.report(concurrency, elapsed)
+
+
+async def main_async(args) -> List[Dict[str, Any]]:
+    scenario = SCENARIOS[args.scenario]
+    responder = None
+    if args.scenario == "tools_run":
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            await client.post("/api/ui_tools/add", json={
+                "name": ECHO_TOOL,
+                "description": "Load-test echo tool answered by bench/load_test.py",
+                "parameters": {"type": "object",
+                               "properties": {"text": {"type": "string", "description": "Text to echo"}},
+                               "required": ["text"]},
+            })
+        ready = asyncio.Event()
+        responder = asyncio.create_task(echo_responder(args.ws_url, ready))
+        await asyncio.wait_for(ready.wait(), timeout=10)
+
+    results = []
+    try:
+        for level in args.concurrency:
+            res = await run_level(scenario, args, level)
+            results.append(res)
+            print(json.dumps(res), flush=True)
+    finally:
+        if responder:
+            responder.cancel()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="XRAY API load generator")
+    parser.add_argument("scenario", choices=list(SCENARIOS))
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="XRAY API base URL")
+    parser.add_argument("--ws-url", default=None, help="bridge URL (default: derived from --url)")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--requests", type=int, default=0, help="stop each level after N requests (0 = duration only)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--model", default="mock-local", help="model config id for ask_stream")
+    parser.add_argument("--message", default="Load test message")
+    args = parser.parse_args(argv)
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    if args.ws_url is None:
+        args.ws_url = args.url.replace("http", "ws", 1).rstrip("/") + "/ws/bridge"
+
+    results = asyncio.run(main_async(args))
+    print("\nconc   requests    ok     rps      p50      p90      p99  outcomes", file=sys.stderr)
+    for r in results:
+        print(f"{r['concurrency']:>4} {r['requests']:>10} {r['ok']:>5} {r['throughput_rps']:>7} "
+              f"{r['p50_ms'] or '-':>8} {r['p90_ms'] or '-':>8} {r['p99_ms'] or '-':>8}  {r['outcomes']}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
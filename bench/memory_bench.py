@@ -0,0 +1,186 @@
+"""Benchmarks for the per-turn memory hot paths.
+
+Measures wall time and peak Python heap (tracemalloc) of
+
+    ContextMemory.snapshot / refine
+    TemporalMemory.refine / recall
+    ContextMemory.delete / delete_after
+
+over synthetic sessions (see ``bench/synthetic.py``) and compares the result
+with ``bench/baseline.json``.
+
+Run from the repository root::
+
+    python -m bench.memory_bench                      # default cases, compare
+    python -m bench.memory_bench --cases small,large  # subset
+    python -m bench.memory_bench --update-baseline    # record a new baseline
+
+Exit status is 1 when any operation is slower (or uses more memory) than the
+baseline by more than ``--tolerance``. Baselines are machine-specific –
+regenerate them on the box that runs the comparison.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from bench.synthetic import (
+    build_context_memory,
+    build_temporal_memory,
+    recall_patterns,
+    session_messages,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+KB = 1024
+MB = 1024 * KB
+
+# name → (messages, tool output bytes, temporal keys)
+CASES: Dict[str, Tuple[int, int, int]] = {
+    "small": (100, 1 * KB, 10),
+    "medium": (1_000, 16 * KB, 100),
+    "large": (10_000, 1 * KB, 1_000),
+    "xlarge": (50_000, 1 * KB, 5_000),
+    "huge-tools": (200, 1 * MB, 20),
+}
+DEFAULT_CASES = ["small", "medium", "large", "huge-tools"]
+
+
+def _measure(fn: Callable[[], Any], setup: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Median wall time over *repeat* runs, then one traced run for peak memory.
+
+    *setup* builds a fresh argument for every run (not timed) so that
+    mutating operations (delete …) always start from the same state.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+    arg = setup()
+    gc.collect()
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "time_ms": round(statistics.median(times) * 1000, 3),
+        "peak_kb": round(peak / KB, 1),
+    }
+
+
+def run_case(name: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    n_messages, tool_bytes, n_keys = CASES[name]
+    messages = session_messages(n_messages, tool_bytes)
+    ctx = build_context_memory(messages)
+    tm = build_temporal_memory(messages, n_keys)
+    patterns = recall_patterns(n_keys)
+
+    ids = [m["meta"]["id"] for m in ctx.snapshot() if m["role"] != "system"]
+    delete_ids = ids[::10]
+    middle_id = ids[len(ids) // 2]
+
+    same = lambda obj: (lambda: obj)
+    fresh = lambda obj: (lambda: copy.deepcopy(obj))
+
+    return {
+        "context.snapshot": _measure(lambda m: m.snapshot(), same(ctx), repeat),
+        "context.refine": _measure(lambda m: m.refine(no_metadata=True), same(ctx), repeat),
+        "temporal.refine": _measure(lambda m: m.refine(), same(tm), repeat),
+        "temporal.recall": _measure(lambda m: m.recall(patterns), same(tm), repeat),
+        "context.delete": _measure(lambda m: m.delete(delete_ids), fresh(ctx), repeat),
+        "context.delete_after": _measure(lambda m: m.delete_after(middle_id), fresh(ctx), repeat),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for case, ops in results.items():
+        for op, cur in ops.items():
+            base = baseline.get(case, {}).get(op)
+            if not base:
+                continue
+            for metric in ("time_ms", "peak_kb"):
+                b, c = base.get(metric), cur.get(metric)
+                # ignore noise on sub-millisecond / tiny allocations
+                floor = 1.0 if metric == "time_ms" else 64.0
+                if b is None or c is None or max(b, c) < floor:
+                    continue
+                if c > b * (1 + tolerance):
+                    regressions.append(f"{case:<11} {op:<21} {metric}: {b} → {c} (+{(c / b - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ContextMemory/TemporalMemory hot paths")
+    parser.add_argument("--cases", default=",".join(DEFAULT_CASES),
+                        help=f"comma separated, from: {', '.join(CASES)} (or 'all')")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per operation (median is reported)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON path")
+    parser.add_argument("--update-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    names = list(CASES) if args.cases == "all" else [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results: Dict[str, Any] = {}
+    for name in names:
+        n_messages, tool_bytes, n_keys = CASES[name]
+        print(f"[bench] {name}: {n_messages} messages, {tool_bytes // KB} KB tool outputs, {n_keys} keys", file=sys.stderr)
+        results[name] = run_case(name, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for case, ops in results.items():
+            for op, r in ops.items():
+                print(f"{case:<11} {op:<21} {r['time_ms']:>10.3f} ms {r['peak_kb']:>12.1f} KB")
+
+    if args.update_baseline:
+        existing = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                existing = json.load(f)
+        existing.update(results)
+        existing["_meta"] = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(existing, f, indent=2)
+            f.write("\n")
+        print(f"[bench] baseline written: {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("[bench] no baseline found – run with --update-baseline first", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n[bench] REGRESSIONS:", file=sys.stderr)
+        for r in regressions:
+            print("  " + r, file=sys.stderr)
+        return 1
+    print("[bench] no regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
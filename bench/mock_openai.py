@@ -0,0 +1,224 @@
+"""Local mock of the OpenAI-compatible chat completions API.
+
+Lets the agent loop run (and be load-tested) without a real model or any
+network access. Point a model in ``xray_config.yaml`` at it::
+
+    - id: mock-local
+      model_id: mock
+      base_url: http://127.0.0.1:8100/v1
+      api_key: no_key
+
+and start it with::
+
+    python -m bench.mock_openai --port 8100 --ttft-ms 300 --tokens-per-sec 40
+
+Behaviour per request:
+
+*   **Scripted** (``--script steps.json``): a JSON list of steps, picked by the
+    number of assistant turns since the last user message::
+
+        [{"type": "tool_call", "name": "python-environment__execute",
+          "arguments": {"python_code": "OUTPUT = {}"}},
+         {"type": "text", "content": "All done."}]
+
+    Past the end of the list the last step is repeated.
+*   **Randomized** (default): when the request offers tools, a tool call to a
+    random tool (arguments generated from its JSON schema) is returned with
+    ``--tool-call-prob``, at most ``--max-tool-rounds`` times per user turn;
+    otherwise a text reply of ``--reply-tokens`` tokens.
+
+Streaming honours ``stream_options.include_usage``. Latency is shaped by
+``--ttft-ms`` (± ``--jitter``) and ``--tokens-per-sec``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from turn_metrics import count_message_tokens
+
+WORDS = ("the quick brown fox jumps over lazy dog data page item price title link "
+         "result scrape parse table row value list json output done").split()
+
+
+class MockSettings:
+    def __init__(self, ttft_ms=300.0, tokens_per_sec=40.0, jitter=0.2, reply_tokens=60,
+                 tool_call_prob=0.7, max_tool_rounds=2, script=None, seed=None):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.jitter = jitter
+        self.reply_tokens = reply_tokens
+        self.tool_call_prob = tool_call_prob
+        self.max_tool_rounds = max_tool_rounds
+        self.script: Optional[List[Dict[str, Any]]] = script
+        self.rng = random.Random(seed)
+
+
+def _rounds_since_user(messages: List[Dict[str, Any]]) -> int:
+    rounds = 0
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            break
+        if m.get("role") == "assistant":
+            rounds += 1
+    return rounds
+
+
+def _fake_value(schema: Dict[str, Any], rng: random.Random) -> Any:
+    t = schema.get("type", "string")
+    if isinstance(t, list):
+        t = next((x for x in t if x != "null"), "string")
+    if "default" in schema:
+        return schema["default"]
+    if t == "integer":
+        return rng.randint(1, 10)
+    if t == "number":
+        return round(rng.random() * 10, 2)
+    if t == "boolean":
+        return rng.random() < 0.5
+    if t == "array":
+        return [_fake_value(schema.get("items", {}), rng)]
+    if t == "object":
+        return {k: _fake_value(v, rng) for k, v in schema.get("properties", {}).items()}
+    return " ".join(rng.choices(WORDS, k=3))
+
+
+def plan_reply(body: Dict[str, Any], settings: MockSettings) -> Dict[str, Any]:
+    """Decide this turn's reply: ``{"type": "text"|"tool_call", …}``."""
+    messages = body.get("messages", [])
+    rounds = _rounds_since_user(messages)
+    if settings.script:
+        return settings.script[min(rounds, len(settings.script) - 1)]
+    tools = body.get("tools") or []
+    if tools and rounds < settings.max_tool_rounds and settings.rng.random() < settings.tool_call_prob:
+        fn = settings.rng.choice(tools)["function"]
+        return {
+            "type": "tool_call",
+            "name": fn["name"],
+            "arguments": _fake_value(fn.get("parameters", {"type": "object"}), settings.rng),
+        }
+    return {"type": "text", "content": " ".join(settings.rng.choices(WORDS, k=settings.reply_tokens))}
+
+
+def _ttft(settings: MockSettings) -> float:
+    j = 1 + settings.rng.uniform(-settings.jitter, settings.jitter)
+    return max(settings.ttft_ms * j, 0) / 1000
+
+
+def _pieces(step: Dict[str, Any]) -> List[str]:
+    """Split the reply into 'tokens' (one streamed delta each)."""
+    if step["type"] == "text":
+        words = step.get("content", "").split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+    args = json.dumps(step.get("arguments", {}))
+    return [args[i:i + 8] for i in range(0, len(args), 8)] or ["{}"]
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "xray"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        step = plan_reply(body, settings)
+        pieces = _pieces(step)
+        prompt_tokens = count_message_tokens(body.get("messages", []), model)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                 "total_tokens": prompt_tokens + len(pieces)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        call_id = f"call_{uuid.uuid4().hex[:24]}"
+        finish = "tool_calls" if step["type"] == "tool_call" else "stop"
+        delay = 1 / settings.tokens_per_sec if settings.tokens_per_sec > 0 else 0
+
+        if not body.get("stream"):
+            await asyncio.sleep(_ttft(settings) + delay * (len(pieces) - 1))
+            message: Dict[str, Any] = {"role": "assistant", "content": None}
+            if step["type"] == "tool_call":
+                message["tool_calls"] = [{"id": call_id, "type": "function",
+                                          "function": {"name": step["name"], "arguments": "".join(pieces)}}]
+            else:
+                message["content"] = "".join(pieces)
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+                "usage": usage,
+            })
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish_reason=None, choices=True, with_usage=False) -> str:
+            data: Dict[str, Any] = {"id": completion_id, "object": "chat.completion.chunk",
+                                    "created": created, "model": model,
+                                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else []}
+            if with_usage:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def gen():
+            await asyncio.sleep(_ttft(settings))
+            yield chunk({"role": "assistant", "content": ""})
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(delay)
+                if step["type"] == "tool_call":
+                    tc: Dict[str, Any] = {"index": 0, "function": {"arguments": piece}}
+                    if i == 0:
+                        tc.update({"id": call_id, "type": "function"})
+                        tc["function"]["name"] = step["name"]
+                    yield chunk({"tool_calls": [tc]})
+                else:
+                    yield chunk({"content": piece})
+            yield chunk({}, finish_reason=finish)
+            if include_usage:
+                yield chunk({}, choices=False, with_usage=True)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="time to first token (ms)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative TTFT jitter (0.2 = ±20%%)")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0, help="decode rate (0 = no delay)")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="tokens per text reply")
+    parser.add_argument("--tool-call-prob", type=float, default=0.7, help="chance of a tool call when tools are offered")
+    parser.add_argument("--max-tool-rounds", type=int, default=2, help="tool-call turns per user message")
+    parser.add_argument("--script", help="JSON file with a scripted step list")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+        if not isinstance(script, list) or not script:
+            parser.error("--script must contain a non-empty JSON list of steps")
+
+    settings = MockSettings(
+        ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec, jitter=args.jitter,
+        reply_tokens=args.reply_tokens, tool_call_prob=args.tool_call_prob,
+        max_tool_rounds=args.max_tool_rounds, script=script, seed=args.seed,
+    )
+    import uvicorn
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
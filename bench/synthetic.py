@@ -0,0 +1,87 @@
+"""Synthetic chat sessions for the memory benchmarks.
+
+Sessions are generated from a seeded RNG so every run (and every machine)
+benchmarks the same transcript shape:
+
+    system
+    [user → assistant(tool_calls) → tool … → assistant(reply)] * N
+
+A fraction of the tool calls repeat an earlier ``(name, arguments)`` pair so
+that ``ContextMemory.refine`` has duplicates to prune, and ``TemporalMemory``
+sessions get ``keys`` memorised snippets named ``ns{i}:item{j}`` plus a last
+user message that references some of them exactly and through wildcards.
+"""
+import json
+import random
+import string
+from typing import Any, Dict, List
+
+from context_memory import ContextMemory
+from temporal_memory import TemporalMemory
+
+TOOL_NAMES = ["python-environment__execute", "scout__browser_navigate", "project__save_script_tool"]
+
+
+def _payload(rng: random.Random, size: int) -> str:
+    """Distinct string of *size* chars (a unique prefix plus filler)."""
+    head = "".join(rng.choices(string.ascii_letters, k=min(size, 32)))
+    return head + ("x" * max(size - len(head), 0))
+
+
+def session_messages(n_messages: int, tool_bytes: int, seed: int = 0, dup_ratio: float = 0.2) -> List[Dict[str, Any]]:
+    """Return roughly *n_messages* OpenAI-format messages (without system)."""
+    rng = random.Random(seed)
+    msgs: List[Dict[str, Any]] = []
+    seen_calls: List[tuple] = []
+    turn = 0
+    while len(msgs) < n_messages:
+        turn += 1
+        msgs.append({"role": "user", "content": f"Step {turn}: scrape page {rng.randint(1, 10_000)}"})
+        n_calls = rng.randint(1, 2)
+        calls = []
+        for c in range(n_calls):
+            if seen_calls and rng.random() < dup_ratio:
+                name, args = rng.choice(seen_calls)
+            else:
+                name = rng.choice(TOOL_NAMES)
+                args = json.dumps({"python_code": f"OUTPUT = {{'n': {turn * 10 + c}}}"})
+                seen_calls.append((name, args))
+            calls.append({"id": f"call_{turn}_{c}", "type": "function", "function": {"name": name, "arguments": args}})
+        msgs.append({"role": "assistant", "content": None, "tool_calls": calls})
+        for call in calls:
+            msgs.append({"role": "tool", "tool_call_id": call["id"], "content": _payload(rng, tool_bytes)})
+        msgs.append({"role": "assistant", "content": f"Done with step {turn}."})
+    return msgs[:n_messages]
+
+
+def build_context_memory(messages: List[Dict[str, Any]]) -> ContextMemory:
+    mem = ContextMemory(system="You are a helpful assistant.")
+    for m in messages:
+        mem.add_message(m)
+    return mem
+
+
+def build_temporal_memory(messages: List[Dict[str, Any]], n_keys: int, seed: int = 0) -> TemporalMemory:
+    """TemporalMemory with *n_keys* memorised messages and a final user turn
+    referencing a few keys exactly plus ``#ns0:*``-style wildcards."""
+    rng = random.Random(seed)
+    mem = TemporalMemory(system="You are a helpful assistant.")
+    ids: List[str] = []
+    for m in messages:
+        msg_id = mem.add_message(m)
+        if m["role"] in ("assistant", "tool"):
+            ids.append(msg_id)
+    namespaces = max(n_keys // 10, 1)
+    for i in range(n_keys):
+        if not ids:
+            break
+        mem.memorize(f"ns{i % namespaces}:item{i}", rng.choice(ids), f"Snippet {i}")
+    exact = [f"#ns{i % namespaces}:item{i}" for i in range(0, n_keys, max(n_keys // 5, 1))]
+    wild = ["#ns0:*", "#ns1:item?"]
+    mem.add_message({"role": "user", "content": "Use " + " ".join(exact + wild)})
+    return mem
+
+
+def recall_patterns(n_keys: int) -> List[str]:
+    namespaces = max(n_keys // 10, 1)
+    return ["ns0:item0", "ns1:*", "*item1?", f"ns{namespaces - 1}:*", "missing:*"]
@@ -47,6 +47,9 @@ class ContextMemory:
             cb(self)
 
     # --- Message accessors ---
+    def __len__(self) -> int:
+        return len(self.__messages)
+
     def snapshot(self) -> List[Dict[str, Any]]:
         # Return deep copy to avoid external mutation
         return copy.deepcopy(self.__messages)
@@ -81,7 +84,8 @@ class ContextMemory:
     def add_assistant_reply(
         self,
         content: Optional[str],
-        tool_calls_with_result: Optional[List[Dict[str, Any]]] = None
+        tool_calls_with_result: Optional[List[Dict[str, Any]]] = None,
+        meta: Optional[Dict[str, Any]] = None,
     ) -> None:
         assistant_reply = {
             "role": "assistant"
@@ -99,7 +103,7 @@ class ContextMemory:
                 }
                 for call in tool_calls_with_result
             ]
-            assistant_id = self.add_message(assistant_reply)
+            assistant_id = self.add_message(assistant_reply, meta=meta)
             # Sadece BİR assistant mesajı, ardından her tool_call için tool mesajı!
             for call in tool_calls_with_result:
                 self.add_message({
@@ -109,7 +113,7 @@ class ContextMemory:
                 }, meta={"assistant_id": assistant_id})
         elif content:
             assistant_reply["content"] = content
-            self.add_message(assistant_reply)
+            self.add_message(assistant_reply, meta=meta)
         else:
             raise ValueError("Assistant reply: No content or tool call!")
 
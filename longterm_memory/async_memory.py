@@ -0,0 +1,158 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from semantic_memory import SemanticMemory, EMBED_BATCH_SIZE, INSERT_BATCH_SIZE, logger
+
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+MEMORY_IO_WORKERS = int(os.getenv("MEMORY_IO_WORKERS", "4"))
+
+
+class EmbedBatcher:
+    """
+    Runs `embed(texts) -> vectors` on a single dedicated inference thread. Requests that
+    arrive while the first one waits up to `max_wait_ms` (or until `max_batch` texts are
+    queued) share one forward pass; requests queued during a forward pass form the next batch.
+    """
+    def __init__(self, embed: Callable[[List[str]], np.ndarray], max_batch: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self._embed = embed
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.requests = 0
+        self.batches = 0
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if self._task is None or self._task.done():
+            # created lazily so it binds to the server's running loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            pending = [(texts, future) for texts, future in pending if not future.done()]  # caller gave up
+            if not pending:
+                continue
+            texts = [t for batch, _ in pending for t in batch]
+            self.batches += 1
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._embed, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            start = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(batch)])
+                start += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+
+class AsyncSemanticMemory:
+    """
+    Event-loop friendly wrapper around SemanticMemory for the MCP server: inference goes
+    through an EmbedBatcher, Milvus calls run on a small I/O thread pool.
+    """
+    def __init__(self, memory: SemanticMemory, max_batch: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS, io_workers: int = MEMORY_IO_WORKERS):
+        self.memory = memory
+        self.batcher = EmbedBatcher(memory.embed, max_batch, max_wait_ms)
+        self._io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="milvus")
+
+    async def warm_up(self):
+        """Load the model on the inference thread and the collection on the I/O pool, concurrently."""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            loop.run_in_executor(self.batcher._executor, self.memory.warm_up_model),
+            self._io_call(lambda: self.memory.client),
+            return_exceptions=True,
+        )
+        for error in results:
+            if isinstance(error, Exception):
+                # not fatal: the first tool call retries the load and reports the error
+                logger.warning("Memory warm-up failed: %s", error)
+
+    async def _io_call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    async def memorize(self, content: str, key: Optional[str] = None) -> str:
+        key = (key or f"mem_{int(datetime.utcnow().timestamp()*1000)}").strip()
+        await self._io_call(self.memory.insert_rows, [(key, content)], await self.batcher.embed([content]))
+        return key
+
+    async def memorize_many(self, contents: List[str], keys: Optional[List[Optional[str]]] = None,
+                            chunk: bool = True, insert_batch_size: int = INSERT_BATCH_SIZE) -> List[str]:
+        rows = self.memory.prepare_rows(contents, keys, chunk)
+        for start in range(0, len(rows), insert_batch_size):
+            batch = rows[start:start + insert_batch_size]
+            # big slices are encoded in EMBED_BATCH_SIZE pieces so searches can slip in between
+            vectors = [await self.batcher.embed([c for _, c in batch[i:i + EMBED_BATCH_SIZE]])
+                       for i in range(0, len(batch), EMBED_BATCH_SIZE)]
+            await self._io_call(self.memory.insert_rows, batch, np.concatenate(vectors))
+        return [key for key, _ in rows]
+
+    async def semantic_search(self, query: str, top_k: int = 5, after: Optional[str] = None,
+                              before: Optional[str] = None) -> List[Dict[str, Any]]:
+        if await self._io_call(self.memory.count) == 0:
+            return []
+        try:
+            vector = (await self.batcher.embed([query]))[0]
+        except ValueError:
+            return []
+        return await self._io_call(self.memory.search_vector, vector, top_k, after, before)
+
+    async def recall(self, key: str) -> Dict[str, Any]:
+        return await self._io_call(self.memory.recall, key)
+
+    async def forget(self, key: str) -> bool:
+        return await self._io_call(self.memory.forget, key)
+
+    async def status(self) -> Dict[str, Any]:
+        status = await self._io_call(self.memory.status)
+        status["embed_batcher"] = self.batcher.stats()
+        return status
+
+    def close(self):
+        self.batcher.close()
+        self._io.shutdown(wait=False)
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", None)   # e.g. ./embeddings.sqlite; unset = memory only
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    LRU cache of normalized embeddings keyed by sha1(model name + whitespace-normalized text).
+    With `path` set, vectors are also kept in a SQLite file as float16 (half the size of
+    float32) so they survive restarts; memory misses fall back to it.
+    """
+    def __init__(self, model_name: str, max_entries: int = EMBED_CACHE_SIZE, path: Optional[str] = EMBED_CACHE_PATH):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, vector BLOB)")
+            self._db.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, None for misses."""
+        keys = [self.key(t) for t in texts]
+        found: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for k in keys:
+                v = self._entries.get(k)
+                if v is not None:
+                    self._entries.move_to_end(k)
+                found.append(v)
+            missing = [k for k, v in zip(keys, found) if v is None]
+            from_disk = self._load(missing) if missing and self._db else {}
+            for i, (k, v) in enumerate(zip(keys, found)):
+                if v is not None:
+                    self.hits += 1
+                elif k in from_disk:
+                    found[i] = from_disk[k]
+                    self._remember(k, from_disk[k])
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            for k, v in zip(keys, vectors):
+                self._remember(k, np.asarray(v, dtype=np.float32))
+            if self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+                    [(k, len(v), np.asarray(v, dtype=np.float16).tobytes()) for k, v in zip(keys, vectors)],
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        out = {}
+        for start in range(0, len(keys), 500):   # SQLite parameter limit
+            part = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for k, blob in rows:
+                v = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+                out[k] = v / max(float(np.linalg.norm(v)), 1e-9)   # float16 rounding
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.disk_hits + self.misses
+        stats = {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+        if self._db:
+            with self._lock:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stats
@@ -1,15 +1,31 @@
 # frontal_cortex/main.py
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from mcp.server.fastmcp import FastMCP
 from semantic_memory import SemanticMemory
+from async_memory import AsyncSemanticMemory
 from dotenv import load_dotenv
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 load_dotenv()
 
-mem = SemanticMemory()
-mcp = FastMCP("longterm_memory")
+mem = AsyncSemanticMemory(SemanticMemory())   # instant: model and collection load lazily
+
+
+@asynccontextmanager
+async def lifespan(server):
+    # answer the handshake / list_tools right away; load model + collection in the background
+    warm = asyncio.create_task(mem.warm_up())
+    try:
+        yield {}
+    finally:
+        warm.cancel()
+        mem.close()
+
+mcp = FastMCP("longterm_memory", lifespan=lifespan)
 
 def to_iso8601(val: Optional[str]) -> Optional[str]:
     """
@@ -45,7 +61,19 @@ def to_iso8601(val: Optional[str]) -> Optional[str]:
 )
 async def memorize(content: str, key: Optional[str] = None):
     """Store a text in semantic memory. Optionally specify a key; returns the key used."""
-    return {"key": mem.memorize(content, key)}
+    return {"key": await mem.memorize(content, key)}
+
+@mcp.tool(
+    name="memorize_many",
+    description=(
+        "Store many texts at once (batched embedding + bulk insert); optional keys list of the same length. "
+        "Long texts are split into chunks stored as '<key>#<n>' unless chunk=false. Returns the stored keys."
+    )
+)
+async def memorize_many(contents: List[str], keys: Optional[List[str]] = None, chunk: bool = True):
+    """Store a batch of texts in semantic memory; returns the keys used (one per stored chunk)."""
+    stored = await mem.memorize_many(contents, keys, chunk=chunk)
+    return {"keys": stored, "count": len(stored)}
 
 @mcp.tool(
     name="recall",
@@ -53,7 +81,7 @@ async def memorize(content: str, key: Optional[str] = None):
 )
 async def recall(key: str):
     """Retrieve text from semantic memory by key."""
-    return mem.recall(key)
+    return await mem.recall(key)
 
 @mcp.tool(
     name="semantic_search",
@@ -74,7 +102,7 @@ async def semantic_search(
     """
     after_iso = to_iso8601(after) if after else None
     before_iso = to_iso8601(before) if before else None
-    return mem.semantic_search(query, top_k=k, after=after_iso, before=before_iso)
+    return await mem.semantic_search(query, top_k=k, after=after_iso, before=before_iso)
 
 @mcp.tool(
     name="forget",
@@ -82,15 +110,15 @@ async def semantic_search(
 )
 async def forget(key: str):
     """Remove a text from semantic memory by key."""
-    return {"deleted": mem.forget(key)}
+    return {"deleted": await mem.forget(key)}
 
 @mcp.tool(
     name="status",
-    description="Get collection status: field names and record count."
+    description="Get collection status: field names, record count, embedding cache and batching stats."
 )
 async def status():
     """Get information about the memory collection: field names and record count."""
-    return mem.status()
+    return await mem.status()
 
 if __name__ == "__main__":
     mcp.run()
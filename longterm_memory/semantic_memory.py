@@ -1,18 +1,30 @@
+import logging
 import os
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from pymilvus import MilvusClient, DataType
+
+from embedding_cache import EmbeddingCache, EMBED_CACHE_PATH, EMBED_CACHE_SIZE, normalize_text
 
 COLLECTION_NAME = os.getenv("MEMORY_COLLECTION", "semantic_memory")
 EMBED_MODEL_NAME = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
 EMBED_DIM = 384
+# "torch" (default), "onnx" or "openvino"; the latter two need sentence-transformers[onnx] / [openvino]
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+# ONNX/OpenVINO file inside the model repo, e.g. onnx/model_qint8_avx2.onnx (int8 quantized)
+EMBED_MODEL_FILE = os.getenv("EMBED_MODEL_FILE", None)
 MILVUS_URI = os.getenv("MILVUS_URI", None)
 MILVUS_TOKEN = os.getenv("MILVUS_TOKEN", None)
 MILVUS_DB_FILE = os.getenv("MILVUS_DB_FILE", "./memory.db")   # Local DB file path for Milvus Lite
 DEFAULT_TTL = int(os.getenv("MEMORY_TTL", "0"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+INSERT_BATCH_SIZE = int(os.getenv("MEMORY_INSERT_BATCH", "1024"))
+logger = logging.getLogger("longterm_memory")
+
+CONTENT_MAX_BYTES = 2048   # "content" VARCHAR max_length
+KEY_MAX_LENGTH = 128
 
 def _normalize(v: np.ndarray) -> np.ndarray:
     v = v.astype(np.float32)
@@ -22,6 +34,35 @@ def _normalize(v: np.ndarray) -> np.ndarray:
 def _timestamp() -> str:
     return datetime.utcnow().isoformat(timespec='milliseconds') + 'Z'
 
+def _chunk_text(text: str, size: int = 1500, overlap: int = 200) -> List[str]:
+    """
+    Split text into overlapping chunks of at most `size` chars, preferring whitespace
+    boundaries. Chunks are also kept under CONTENT_MAX_BYTES when UTF-8 encoded.
+    """
+    text = text.strip()
+    if len(text.encode("utf-8")) <= CONTENT_MAX_BYTES and len(text) <= size:
+        return [text] if text else []
+    overlap = max(0, min(overlap, size // 2))
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut > start:
+                end = cut
+        chunk = text[start:end].strip()
+        # multi-byte text: shrink until it fits the column
+        while len(chunk.encode("utf-8")) > CONTENT_MAX_BYTES:
+            end = start + (end - start) * 3 // 4
+            chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
 class SemanticMemory:
     """
     SemanticMemory using Milvus 2.5+ API (works with Milvus Lite/Standalone or remote).
@@ -37,27 +78,84 @@ class SemanticMemory:
         enable_dynamic_field: bool = False,
         num_shards: int = 1,
         enable_mmap: bool = True,
-        consistency_level: str = "Session"
+        consistency_level: str = "Session",
+        cache_size: int = EMBED_CACHE_SIZE,
+        cache_path: Optional[str] = EMBED_CACHE_PATH,
+        backend: str = EMBED_BACKEND,
+        model_file: Optional[str] = EMBED_MODEL_FILE,
     ):
-        self.model = SentenceTransformer(model_name)
+        # Model and Milvus collection are loaded on first use (or by warm_up), so
+        # constructing SemanticMemory is instant.
+        self.model_name = model_name
+        self.backend = backend
+        self.model_file = model_file
         self.collection = collection
+        self._collection_options = dict(
+            ttl_seconds=ttl_seconds,
+            enable_dynamic_field=enable_dynamic_field,
+            num_shards=num_shards,
+            enable_mmap=enable_mmap,
+            consistency_level=consistency_level,
+        )
+        self._client_options = dict(uri=uri, token=token, db_file=db_file)
+        self._model = None
+        self._client = None
+        self._model_lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        # quantized/ONNX vectors differ slightly from torch ones: keep their cache entries apart
+        cache_model = model_name if backend == "torch" else f"{model_name}:{backend}:{model_file or ''}"
+        self.cache = EmbeddingCache(cache_model, max_entries=cache_size, path=cache_path)
 
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "torch":
+            return SentenceTransformer(self.model_name)
+        kwargs = {"model_kwargs": {"file_name": self.model_file}} if self.model_file else {}
+        try:
+            return SentenceTransformer(self.model_name, backend=self.backend, **kwargs)
+        except (ImportError, TypeError, ValueError) as e:
+            logger.warning("Embedding backend %r unavailable (%s); falling back to torch.", self.backend, e)
+            self.backend = "torch"
+            self.cache.model_name = self.model_name
+            return SentenceTransformer(self.model_name)
+
+    def _connect(self):
+        from pymilvus import MilvusClient, DataType
+
+        opts = self._collection_options
         # --- MilvusClient Initialization ---
         # Use local Milvus Lite if db_file is provided and uri is not.
         client_kwargs = {}
-        if uri:
-            client_kwargs["uri"] = uri
-        if token:
-            client_kwargs["token"] = token
-        if db_file and not uri:
-            client_kwargs["db_file"] = db_file
-        #self.client = MilvusClient(**client_kwargs)
-        self.client = MilvusClient("./memory.db")
+        if self._client_options["uri"]:
+            client_kwargs["uri"] = self._client_options["uri"]
+        if self._client_options["token"]:
+            client_kwargs["token"] = self._client_options["token"]
+        if self._client_options["db_file"] and not self._client_options["uri"]:
+            client_kwargs["db_file"] = self._client_options["db_file"]
+        #client = MilvusClient(**client_kwargs)
+        client = MilvusClient("./memory.db")
 
         # --- Schema Setup ---
-        schema = self.client.create_schema(
+        schema = client.create_schema(
             auto_id=True,
-            enable_dynamic_field=enable_dynamic_field,
+            enable_dynamic_field=opts["enable_dynamic_field"],
         )
         schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
         schema.add_field(field_name="key", datatype=DataType.VARCHAR, max_length=128)
@@ -65,7 +163,7 @@ class SemanticMemory:
         schema.add_field(field_name="content", datatype=DataType.VARCHAR, max_length=2048)
         schema.add_field(field_name="timestamp", datatype=DataType.VARCHAR, max_length=64)
 
-        index_params = self.client.prepare_index_params()
+        index_params = client.prepare_index_params()
         index_params.add_index(
             field_name="vector",
             index_type="AUTOINDEX",
@@ -73,36 +171,108 @@ class SemanticMemory:
         )
 
         properties = {}
-        if ttl_seconds > 0:
-            properties["collection.ttl.seconds"] = ttl_seconds
+        if opts["ttl_seconds"] > 0:
+            properties["collection.ttl.seconds"] = opts["ttl_seconds"]
 
-        if not self.client.has_collection(self.collection):
-            self.client.create_collection(
+        if not client.has_collection(self.collection):
+            client.create_collection(
                 collection_name=self.collection,
                 schema=schema,
                 index_params=index_params,
                 properties=properties,
-                num_shards=num_shards,
-                enable_mmap=enable_mmap,
-                consistency_level=consistency_level,
+                num_shards=opts["num_shards"],
+                enable_mmap=opts["enable_mmap"],
+                consistency_level=opts["consistency_level"],
             )
-        self.client.load_collection(self.collection)
+        client.load_collection(self.collection)
+        return client
+
+    def warm_up_model(self):
+        """Load the embedder and run one tiny forward pass (first real call is then fast)."""
+        self.model.encode(["warm up"], show_progress_bar=False)
+
+    def warm_up(self):
+        self.client
+        self.warm_up_model()
 
     def memorize(self, content: str, key: Optional[str] = None) -> str:
         key = (key or f"mem_{int(datetime.utcnow().timestamp()*1000)}").strip()
-        encoded = self.model.encode([content])
-        if not isinstance(encoded, np.ndarray) or encoded.shape[0] == 0:
-            raise ValueError("Failed to encode content for memory.")
-        vector = _normalize(encoded)[0].tolist()
-        entity = {
-            "vector": vector,
-            "key": key,
-            "content": content,
-            "timestamp": _timestamp()
-        }
-        self.client.insert(collection_name=self.collection, data=[entity])
+        self.insert_rows([(key, content)], self.embed([content]))
         return key
 
+    def insert_rows(self, rows: List[Tuple[str, str]], vectors: np.ndarray):
+        """Insert (key, content) rows with their already computed, normalized vectors."""
+        timestamp = _timestamp()
+        entities = [
+            {"vector": vector.tolist(), "key": key, "content": content, "timestamp": timestamp}
+            for (key, content), vector in zip(rows, vectors)
+        ]
+        self.client.insert(collection_name=self.collection, data=entities)
+
+    def embed(self, texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+        """Normalized embeddings; cached texts skip the model, repeated texts are encoded once."""
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(normalize_text(t) for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            encoded = self.model.encode(missing, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+            if not isinstance(encoded, np.ndarray) or encoded.shape[0] != len(missing):
+                raise ValueError("Failed to encode content for memory.")
+            encoded = _normalize(encoded)
+            self.cache.put_many(missing, encoded)
+            fresh = dict(zip(missing, encoded))
+            vectors = [fresh[normalize_text(t)] if v is None else v for t, v in zip(texts, vectors)]
+        return np.stack(vectors)
+
+    def memorize_many(
+        self,
+        contents: List[str],
+        keys: Optional[List[Optional[str]]] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        insert_batch_size: int = INSERT_BATCH_SIZE,
+        chunk: bool = True,
+        chunk_size: int = 1500,
+        chunk_overlap: int = 200,
+    ) -> List[str]:
+        """
+        Store many texts at once: embeds `batch_size` texts per model call and inserts
+        `insert_batch_size` rows per Milvus write. With chunk=True texts longer than the
+        content column are split into overlapping chunks stored as "<key>#<n>";
+        otherwise they raise ValueError. Returns the stored keys, one per row.
+        """
+        rows = self.prepare_rows(contents, keys, chunk, chunk_size, chunk_overlap)
+        for start in range(0, len(rows), insert_batch_size):
+            batch = rows[start:start + insert_batch_size]
+            self.insert_rows(batch, self.embed([content for _, content in batch], batch_size))
+        return [key for key, _ in rows]
+
+    def prepare_rows(
+        self,
+        contents: List[str],
+        keys: Optional[List[Optional[str]]] = None,
+        chunk: bool = True,
+        chunk_size: int = 1500,
+        chunk_overlap: int = 200,
+    ) -> List[Tuple[str, str]]:
+        """(key, content) rows for memorize_many: default keys, chunking and length checks."""
+        if keys is not None and len(keys) != len(contents):
+            raise ValueError("keys must have the same length as contents.")
+        base = f"mem_{int(datetime.utcnow().timestamp()*1000)}"
+        rows = []
+        for i, content in enumerate(contents):
+            key = ((keys[i] if keys else None) or f"{base}_{i}").strip()
+            if chunk:
+                parts = _chunk_text(content, chunk_size, chunk_overlap)
+            elif len(content.encode("utf-8")) > CONTENT_MAX_BYTES:
+                raise ValueError(f"Content #{i} is longer than {CONTENT_MAX_BYTES} bytes; use chunk=True.")
+            else:
+                parts = [content]
+            for n, part in enumerate(parts):
+                row_key = key if len(parts) == 1 else f"{key}#{n}"
+                if len(row_key) > KEY_MAX_LENGTH:
+                    raise ValueError(f"Key too long (max {KEY_MAX_LENGTH}): {row_key}")
+                rows.append((row_key, part))
+        return rows
+
     def recall(self, key: str) -> Dict[str, Any]:
         res = self.client.query(
             collection_name=self.collection,
@@ -123,10 +293,20 @@ class SemanticMemory:
     ) -> List[Dict[str, Any]]:
         if self.count() == 0:
             return []
-        encoded = self.model.encode([query])
-        if not isinstance(encoded, np.ndarray) or encoded.shape[0] == 0:
+        try:
+            vector = self.embed([query])[0]
+        except ValueError:
             return []
-        vector = _normalize(encoded)[0].tolist()
+        return self.search_vector(vector, top_k, after, before)
+
+    def search_vector(
+        self,
+        vector: np.ndarray,
+        top_k: int = 5,
+        after: Optional[str] = None,
+        before: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """semantic_search with an already computed, normalized query vector."""
         filter_clauses = []
         if after:
             filter_clauses.append(f"timestamp >= '{after}'")
@@ -136,7 +316,7 @@ class SemanticMemory:
 
         hits = self.client.search(
             collection_name=self.collection,
-            data=[vector],
+            data=[vector.tolist()],
             limit=top_k,
             output_fields=["key", "content", "timestamp"],
             filter=filter_str,
@@ -178,5 +358,8 @@ class SemanticMemory:
         row_count = self.count()
         return {
             "record_count": row_count,
-            "fields": fields
+            "fields": fields,
+            "model_loaded": self._model is not None,
+            "embed_backend": self.backend,
+            "embedding_cache": self.cache.stats(),
         }
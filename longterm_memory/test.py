@@ -29,7 +29,14 @@ def simple_test():
     print(f"Deleted {key2}: {deleted}")
     print("Memory count after delete:", mem.count())
 
-    # 6. Status
+    # 6. Batch insert (long texts are chunked)
+    keys = mem.memorize_many(
+        ["Playwright automates browsers.", "MongoDB stores documents.", "lorem ipsum " * 400],
+        keys=["pw", "mongo", None],
+    )
+    print(f"Batch inserted {len(keys)} rows: {keys[:5]}")
+
+    # 7. Status
     print("Collection status:", mem.status())
 
 if __name__ == "__main__":
@@ -1,6 +1,5 @@
 # memory_test.py
 
-import os
 import json
 from temporal_memory import TemporalMemory
 
@@ -13,11 +12,13 @@ def read_messages_from_json(json_path):
 
 def test_temporal_memory():
     msgs = read_messages_from_json("test/sample.json")
-    tm = TemporalMemory()
-    # Burada path'i parametre ile geçiriyoruz:
-    refined = tm.refine(msgs,preserve_last_n_massive_tool_pairs=1,trim_char_limit=200,tool_arg_trim_limit=100,preserve_last_n_recall_calls=1)
+    system = next((m["content"] for m in msgs if m["role"] == "system"), "You are a helpful assistant.")
+    tm = TemporalMemory(system=system)
+    for m in msgs:
+        tm.add_message(m)  # system messages are skipped by add_message
+    refined = tm.refine(with_id=True)
     with open("test/temporal.json", "w", encoding="utf-8") as f:
-        json.dump(tm.data, f, ensure_ascii=False, indent=2)
+        json.dump(tm.status(), f, ensure_ascii=False, indent=2)
     
     with open("test/refined.json", "w", encoding="utf-8") as f:
         json.dump(refined, f, ensure_ascii=False, indent=2)
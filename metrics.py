@@ -0,0 +1,251 @@
+"""Minimal in-process Prometheus metrics registry.
+
+Recording is meant to be cheap enough for the agent/tool hot paths:
+
+*   ``metric.labels(...)`` returns a cached child; once a label set has been
+    seen (or preallocated with :py:meth:`_Metric.preallocate`) recording is a
+    dict lookup plus an integer/float add.
+*   There are no locks. Everything runs on the asyncio event loop; a value
+    updated concurrently from a worker thread may lose an increment, which is
+    acceptable for monitoring data.
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+RATE_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 20, 40, 60, 80, 120, 160, 240, 320)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def preallocate(self, label_sets: Iterable[Sequence[str]]) -> None:
+        """Create children up front so the first request doesn't allocate."""
+        for values in label_sets:
+            self.labels(*values)
+
+    def _label_str(self, values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{self._label_str(values)} {_fmt(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{self._label_str(values, ('le', _fmt(bound)))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_str(values)} {_fmt(child.sum)}")
+        lines.append(f"{self.name}_count{self._label_str(values)} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------------------------------------------------------------------------
+# XRAY metrics
+# ---------------------------------------------------------------------------
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "xray_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "xray_http_request_duration_seconds", "HTTP request latency (until response headers).", ("method", "route"))
+
+AGENT_LOOPS = REGISTRY.counter(
+    "xray_agent_loop_iterations_total", "Agent tool-loop iterations.", ("model",))
+LLM_TTFT = REGISTRY.histogram(
+    "xray_llm_ttft_seconds", "Time to first token per LLM request.", ("model",))
+LLM_DECODE_RATE = REGISTRY.histogram(
+    "xray_llm_decode_tokens_per_second", "Decode rate per LLM request.", ("model",), buckets=RATE_BUCKETS)
+LLM_TOKENS = REGISTRY.counter(
+    "xray_llm_tokens_total", "Prompt/completion tokens.", ("model", "kind"))
+REFINE_LATENCY = REGISTRY.histogram(
+    "xray_refine_duration_seconds", "Context refine duration per agent loop iteration.")
+MEMORY_MESSAGES = REGISTRY.gauge(
+    "xray_memory_messages", "Messages currently held in the chat context memory.")
+
+TOOL_LATENCY = REGISTRY.histogram(
+    "xray_tool_call_duration_seconds", "Tool-call latency per ToolRouter client.", ("client",))
+TOOL_CALLS = REGISTRY.counter(
+    "xray_tool_calls_total", "Tool calls per ToolRouter client and outcome.", ("client", "outcome"))
+
+WS_BROADCAST_LATENCY = REGISTRY.histogram(
+    "xray_ws_broadcast_duration_seconds", "Fan-out time of one WebSocket broadcast to all clients.")
+WS_CLIENTS = REGISTRY.gauge(
+    "xray_ws_clients", "Connected /ws/bridge clients.")
+
+SCRIPT_LATENCY = REGISTRY.histogram(
+    "xray_script_execution_duration_seconds", "pw_runner script execution duration.", ("status",))
+
+
+def preallocate(model_ids: Iterable[str] = (), client_ids: Iterable[str] = ()) -> None:
+    """Allocate label sets for the configured models and tool clients."""
+    model_ids, client_ids = list(model_ids), list(client_ids)
+    for metric in (AGENT_LOOPS, LLM_TTFT, LLM_DECODE_RATE):
+        metric.preallocate((m,) for m in model_ids)
+    LLM_TOKENS.preallocate((m, k) for m in model_ids for k in ("prompt", "completion"))
+    TOOL_LATENCY.preallocate((c,) for c in client_ids)
+    TOOL_CALLS.preallocate((c, o) for c in client_ids for o in ("ok", "error"))
+    SCRIPT_LATENCY.preallocate((s,) for s in ("success", "error", "limit_exceeded"))
+
+
+def observe_turn(record: dict) -> None:
+    """Record one :py:class:`turn_metrics.TurnMetrics` summary."""
+    model = record.get("model") or "unknown"
+    AGENT_LOOPS.labels(model).inc()
+    if record.get("ttft_ms") is not None:
+        LLM_TTFT.labels(model).observe(record["ttft_ms"] / 1000)
+    if record.get("decode_tps") is not None:
+        LLM_DECODE_RATE.labels(model).observe(record["decode_tps"])
+    if record.get("prompt_tokens"):
+        LLM_TOKENS.labels(model, "prompt").inc(record["prompt_tokens"])
+    if record.get("completion_tokens"):
+        LLM_TOKENS.labels(model, "completion").inc(record["completion_tokens"])
+    if record.get("refine_ms") is not None:
+        REFINE_LATENCY.observe(record["refine_ms"] / 1000)
@@ -1,12 +1,15 @@
 from __future__ import annotations
 import json
 import time
-from typing import Any, Dict, Optional, Callable, AsyncGenerator, Union
+from typing import Any, Dict, List, Optional, Callable, AsyncGenerator, Union
 
 from openai import AsyncOpenAI
 from tool_client import ToolClient
 from context_memory import ContextMemory
 from status_enum import AgentStatus
+from turn_metrics import TurnMetrics
+from metrics import observe_turn
+from tracing import TRACER, current_span
 
 def dump_messages(messages, path="messages_dump.json"):
     # with open(path, "w", encoding="utf-8") as f:
@@ -24,7 +27,8 @@ class OpenAIAgent:
         context_memory: ContextMemory,
         tool_client: ToolClient = None,
         on_status_update: Optional[Callable[[dict], None]] = None,
-        max_tool_loop=10        
+        max_tool_loop=10,
+        include_usage: bool = True,
     ):
         self.api_key = api_key
         self.base_url = base_url
@@ -33,7 +37,12 @@ class OpenAIAgent:
         self.context_memory = context_memory
         self.on_status_update = on_status_update
         self.client: Optional[AsyncOpenAI] = None
-        self.max_tool_loop = max_tool_loop        
+        self.max_tool_loop = max_tool_loop
+        # Ask the server for token usage on streamed replies; set False for
+        # backends that reject ``stream_options``.
+        self.include_usage = include_usage
+        # One record per tool-loop iteration of the last ask (see TurnMetrics).
+        self.turn_metrics: List[Dict[str, Any]] = []
 
     # ---------------------------------------------------------------------
     # Lifecycle helpers
@@ -80,6 +89,23 @@ class OpenAIAgent:
         no_content = not ((message.content if message else "") or "").strip()
         return fr == "stop" and (no_toolcalls or no_content)
     
+    def _refined_messages(self, turn: TurnMetrics) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        messages = self.context_memory.refine(no_metadata=True)
+        turn.refine_done(started)
+        return messages
+
+    def _finish_turn(self, turn: TurnMetrics) -> Dict[str, Any]:
+        record = turn.finish()
+        self.turn_metrics.append(record)
+        observe_turn(record)
+        current_span().set_attributes(
+            prompt_tokens=record["prompt_tokens"],
+            completion_tokens=record["completion_tokens"],
+            tool_calls=len(record["tools"]),
+        )
+        return record
+
     def dump(self):
         dump_messages(self.context_memory.refine(), "refined_memory_dump.json")
         dump_messages(self.context_memory.snapshot(), "orginal_memory_dump.json")
@@ -100,11 +126,18 @@ class OpenAIAgent:
     # NON-STREAM CHAIN
     # ------------------------------------------------------------------
     async def ask_chain_non_stream(self, prompt: str) -> str:
+        with TRACER.span("agent.ask_chain", model=self.model_id, stream=False) as span:
+            reply = await self._ask_chain_non_stream(prompt)
+            span.set_attribute("loops", len(self.turn_metrics))
+            return reply
+
+    async def _ask_chain_non_stream(self, prompt: str) -> str:
         if self.client is None:
             raise RuntimeError("Agent not initialized – use `async with`")
 
         await self._notify_status({"state": AgentStatus.GENERATING.value, "phase": "start"})
         self.context_memory.add_user_prompt(prompt)
+        self.turn_metrics = []
 
         loop_guard = 0
         reply = ""
@@ -113,95 +146,109 @@ class OpenAIAgent:
             if loop_guard >= self.max_tool_loop:
                 raise RuntimeError("MAX_TOOL_LOOP limit aşıldı – muhtemel sonsuz döngü")
             loop_guard += 1
+            with TRACER.span("agent.loop", loop=loop_guard, stream=False):
+                turn = TurnMetrics(self.model_id, loop_guard, stream=False)
+
+                tool_defs = None
+                if self.tool_client is not None:
+                    tool_defs = await self.tool_client.list_tools()
+
+                messages = self._refined_messages(turn)
+                with TRACER.span("llm.request", model=self.model_id, loop=loop_guard, stream=False) as llm_span:
+                    turn.request_sent()
+                    resp = await self.client.chat.completions.create(
+                        model=self.model_id,
+                        messages=messages,
+                        tools=tool_defs,
+                        stream=False,
+                    )
+                    turn.response_done()
+                    turn.set_usage(getattr(resp, "usage", None))
+                    llm_span.set_attribute("finish_reason", getattr(resp.choices[0], "finish_reason", None))
+                choice = resp.choices[0]
+                msg = choice.message
+                finish_reason = getattr(choice, "finish_reason", None)
+
+                buffer = ""
+                tool_calls = []
+                tool_calls_with_result = []
 
-            tool_defs = None
-            if self.tool_client is not None:
-                tool_defs = await self.tool_client.list_tools()
-
-            resp = await self.client.chat.completions.create(
-                model=self.model_id,
-                messages=self.context_memory.refine(no_metadata=True),
-                tools=tool_defs,
-                stream=False,
-            )
-            choice = resp.choices[0]
-            msg = choice.message
-            finish_reason = getattr(choice, "finish_reason", None)
-
-            buffer = ""
-            tool_calls = []
-            tool_calls_with_result = []
-
-            # ----------- Asistan cevabı geldiyse -----------
-            if msg.content and msg.content.strip():
-                buffer += msg.content
-                reply += buffer
-                await self._notify_status({
-                    "state": AgentStatus.GENERATING.value,
-                    "phase": "partial_assistant",
-                    "content": buffer,
-                    "loop": loop_guard,
-                    "max_loop": self.max_tool_loop,
-                })
-
-
-            # ----------- Tool-call geldiyse -----------
-            if msg.tool_calls:
-                for tc in msg.tool_calls:
-                    call_id = tc.id
-                    name = tc.function.name
-                    raw_args = tc.function.arguments or ""
-                    # Tool çağrısını context'e eklemeye gerek yok, topluca ekleyeceğiz
-                    try:
-                        args = json.loads(raw_args) if raw_args else {}
-                    except json.JSONDecodeError as e:
-                        print(str(e))
-                        args = {}
-
-                    try:
-                        result = await self.tool_client.call_tool(call_id, name, args)
-                        await self._notify_status({
-                            "state": AgentStatus.TOOL.value,
-                            "phase": "tool_result",
-                            "call_id": call_id,
-                            "result": result,
-                        })
-                    except Exception as ex:
-                        result = json.dumps({"error": "TOOL EXECUTION FAILED", "detail": str(ex)}, indent=2)
-                        print(result)
-                        await self._notify_status({"state": AgentStatus.ERROR.value, "phase": "tool_error"})
-
-                    tool_calls_with_result.append({
-                        "id": call_id,
-                        "type": tc.type,
-                        "name": name,
-                        "arguments": raw_args,
-                        "result": result if isinstance(result, str) else json.dumps(result),
+                # ----------- Asistan cevabı geldiyse -----------
+                if msg.content and msg.content.strip():
+                    buffer += msg.content
+                    reply += buffer
+                    await self._notify_status({
+                        "state": AgentStatus.GENERATING.value,
+                        "phase": "partial_assistant",
+                        "content": buffer,
+                        "loop": loop_guard,
+                        "max_loop": self.max_tool_loop,
                     })
 
-            # --- Cevap ve/veya tool-calls context'e topluca ekleniyor ---
-            if tool_calls_with_result:
-                self.context_memory.add_assistant_reply(None, tool_calls_with_result)
-
-            elif buffer.strip():
-                self.context_memory.add_assistant_reply(buffer)
-            else:
-                # Asistan ne cevap ne de tool call verdi, döngüyü kır
-                break
-
-            self.dump()
-
-            # ----- Finish reason ile çıkış kararı -----
-            if finish_reason == "stop":
-                if not buffer.strip():
-                    reply += "\n(Soru tamamlandı, lütfen yeni bir komut girin.)"
-                await self._notify_status({
-                    "state": AgentStatus.DONE.value,
-                    "phase": "done",
-                    "loop": loop_guard,
-                    "max_loop": self.max_tool_loop,
-                })
-                break
+
+                # ----------- Tool-call geldiyse -----------
+                if msg.tool_calls:
+                    for tc in msg.tool_calls:
+                        call_id = tc.id
+                        name = tc.function.name
+                        raw_args = tc.function.arguments or ""
+                        # Tool çağrısını context'e eklemeye gerek yok, topluca ekleyeceğiz
+                        try:
+                            args = json.loads(raw_args) if raw_args else {}
+                        except json.JSONDecodeError as e:
+                            print(str(e))
+                            args = {}
+
+                        tool_started = time.perf_counter()
+                        try:
+                            result = await self.tool_client.call_tool(call_id, name, args)
+                            turn.tool_done(call_id, name, tool_started)
+                            await self._notify_status({
+                                "state": AgentStatus.TOOL.value,
+                                "phase": "tool_result",
+                                "call_id": call_id,
+                                "result": result,
+                            })
+                        except Exception as ex:
+                            turn.tool_done(call_id, name, tool_started, error=True)
+                            result = json.dumps({"error": "TOOL EXECUTION FAILED", "detail": str(ex)}, indent=2)
+                            print(result)
+                            await self._notify_status({"state": AgentStatus.ERROR.value, "phase": "tool_error"})
+
+                        tool_calls_with_result.append({
+                            "id": call_id,
+                            "type": tc.type,
+                            "name": name,
+                            "arguments": raw_args,
+                            "result": result if isinstance(result, str) else json.dumps(result),
+                        })
+
+                turn.fill_missing_tokens(messages, buffer, tool_calls_with_result)
+                record = self._finish_turn(turn)
+
+                # --- Cevap ve/veya tool-calls context'e topluca ekleniyor ---
+                if tool_calls_with_result:
+                    self.context_memory.add_assistant_reply(None, tool_calls_with_result, meta={"metrics": record})
+
+                elif buffer.strip():
+                    self.context_memory.add_assistant_reply(buffer, meta={"metrics": record})
+                else:
+                    # Asistan ne cevap ne de tool call verdi, döngüyü kır
+                    break
+
+                self.dump()
+
+                # ----- Finish reason ile çıkış kararı -----
+                if finish_reason == "stop":
+                    if not buffer.strip():
+                        reply += "\n(Soru tamamlandı, lütfen yeni bir komut girin.)"
+                    await self._notify_status({
+                        "state": AgentStatus.DONE.value,
+                        "phase": "done",
+                        "loop": loop_guard,
+                        "max_loop": self.max_tool_loop,
+                    })
+                    break
 
         return reply
 
@@ -211,17 +258,22 @@ class OpenAIAgent:
     # ------------------------------------------------------------------
 
     async def ask_chain_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        with TRACER.span("agent.ask_chain", model=self.model_id, stream=True) as span:
+            async for event in self._ask_chain_stream(prompt):
+                yield event
+            span.set_attribute("loops", len(self.turn_metrics))
+
+    async def _ask_chain_stream(self, prompt: str) -> AsyncGenerator[str, None]:
         if self.client is None:
             raise RuntimeError("Agent not initialized – use `async with`")
 
         loop_guard = 0
-        
-        token_count = 0
-        t0 = time.perf_counter()
+        turn: Optional[TurnMetrics] = None
+        self.turn_metrics = []
 
         async def notify_status():
-            tps = lambda: token_count / max(time.perf_counter() - t0, 1e-3)
-            await self._notify_status({"state": AgentStatus.GENERATING.value, "phase": "start", "tps":tps(), "loop": loop_guard, "max_loop": self.max_tool_loop})
+            tps = turn.live_tps() if turn is not None else 0.0
+            await self._notify_status({"state": AgentStatus.GENERATING.value, "phase": "start", "tps":tps, "loop": loop_guard, "max_loop": self.max_tool_loop})
 
         self.context_memory.add_user_prompt(prompt)
         self.context_memory.notify_observers()
@@ -232,117 +284,136 @@ class OpenAIAgent:
             if loop_guard >= self.max_tool_loop:
                 raise RuntimeError("MAX_TOOL_LOOP limit aşıldı – muhtemel sonsuz döngü")
             loop_guard += 1
-            await notify_status()
-
-            buffer: str = ""
-            tool_parts: Dict[int, Dict[str, Any]] = defaultdict(
-                lambda: {"id": None, "type": None, "name": None, "arguments": ""}
-            )
-            finish_reason: Optional[str] = None
-
-
-            tool_defs = None
-            if self.tool_client is not None:
-                tool_defs = await self.tool_client.list_tools()
-            stream_resp = await self.client.chat.completions.create(
-                model=self.model_id,
-                messages=self.context_memory.refine(no_metadata=True),
-                tools=tool_defs,
-                stream=True,
-            )
-            tool_calls = []
-            async for chunk in stream_resp:
-                delta = chunk.choices[0].delta
+            with TRACER.span("agent.loop", loop=loop_guard, stream=True):
+                turn = TurnMetrics(self.model_id, loop_guard, stream=True)
                 await notify_status()
 
-                if delta.content:
-                    buffer += delta.content
-                    token_count += len(delta.content.split())
-                    yield json.dumps({"type": "partial_assistant","content": buffer})
-
-                if chunk.choices[0].finish_reason is not None:
-                    finish_reason = chunk.choices[0].finish_reason
-                    print(f"!!!!!!!!!!!!!!!!!!!!{finish_reason}!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-
-                if delta.tool_calls:
-                    for tc in delta.tool_calls:
-                        p = tool_parts[tc.index]
-                        if tc.id:
-                            p["id"] = tc.id
-                        if tc.type:
-                            p["type"] = tc.type
-                        if tc.function:
-                            if tc.function.name:
-                                p["name"] = tc.function.name
-                            if tc.function.arguments:
-                                p["arguments"] += tc.function.arguments
-
-                        args_ready = (
-                            p["arguments"].startswith("{")
-                            and p["arguments"].rstrip().endswith("}")
-                        )
-                        if p["id"] and p["type"] and p["name"] and args_ready:
-                            try:
-                                # Sadece burada parse et, aksi halde biriktirmeye devam
-                                args_dict = json.loads(p["arguments"])
-                            except json.JSONDecodeError:
-                                # Henüz tam gelmemiş olabilir, bir sonraki chunk'ı bekle
-                                continue
+                buffer: str = ""
+                tool_parts: Dict[int, Dict[str, Any]] = defaultdict(
+                    lambda: {"id": None, "type": None, "name": None, "arguments": ""}
+                )
+                finish_reason: Optional[str] = None
+
+
+                tool_defs = None
+                if self.tool_client is not None:
+                    tool_defs = await self.tool_client.list_tools()
+                messages = self._refined_messages(turn)
+                extra = {"stream_options": {"include_usage": True}} if self.include_usage else {}
+                with TRACER.span("llm.request", model=self.model_id, loop=loop_guard, stream=True) as llm_span:
+                    turn.request_sent()
+                    stream_resp = await self.client.chat.completions.create(
+                        model=self.model_id,
+                        messages=messages,
+                        tools=tool_defs,
+                        stream=True,
+                        **extra,
+                    )
+                    tool_calls = []
+                    async for chunk in stream_resp:
+                        # include_usage: the last chunk carries usage and no choices
+                        turn.set_usage(getattr(chunk, "usage", None))
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.content or delta.tool_calls:
+                            turn.on_delta(delta.content)
+                        await notify_status()
+
+                        if delta.content:
+                            buffer += delta.content
+                            yield json.dumps({"type": "partial_assistant","content": buffer})
+
+                        if chunk.choices[0].finish_reason is not None:
+                            finish_reason = chunk.choices[0].finish_reason
+                            print(f"!!!!!!!!!!!!!!!!!!!!{finish_reason}!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+
+                        if delta.tool_calls:
+                            for tc in delta.tool_calls:
+                                p = tool_parts[tc.index]
+                                if tc.id:
+                                    p["id"] = tc.id
+                                if tc.type:
+                                    p["type"] = tc.type
+                                if tc.function:
+                                    if tc.function.name:
+                                        p["name"] = tc.function.name
+                                    if tc.function.arguments:
+                                        p["arguments"] += tc.function.arguments
+
+                                args_ready = (
+                                    p["arguments"].startswith("{")
+                                    and p["arguments"].rstrip().endswith("}")
+                                )
+                                if p["id"] and p["type"] and p["name"] and args_ready:
+                                    try:
+                                        # Sadece burada parse et, aksi halde biriktirmeye devam
+                                        args_dict = json.loads(p["arguments"])
+                                    except json.JSONDecodeError:
+                                        # Henüz tam gelmemiş olabilir, bir sonraki chunk'ı bekle
+                                        continue
                     
-                            tool_calls.append({
-                                    "id": p["id"],
-                                    "type": p["type"],
-                                    "name": p["name"],
-                                    "arguments": p["arguments"],
-                                }
-                            )
-                            del tool_parts[tc.index]
-
-            content=""
-            if buffer.strip():
-                content=buffer
-            if len(tool_calls)==0:
-                self.context_memory.add_assistant_reply(content)
-                self.context_memory.notify_observers()
-                await notify_status()
-                yield json.dumps({"type": "end"})
-            else:
-                tool_calls_with_result = []
+                                    tool_calls.append({
+                                            "id": p["id"],
+                                            "type": p["type"],
+                                            "name": p["name"],
+                                            "arguments": p["arguments"],
+                                        }
+                                    )
+                                    del tool_parts[tc.index]
+                    turn.response_done()
+                    llm_span.set_attributes(ttft_s=turn.ttft_s, finish_reason=finish_reason, tool_calls=len(tool_calls))
+
+                content=""
+                if buffer.strip():
+                    content=buffer
+                if len(tool_calls)==0:
+                    turn.fill_missing_tokens(messages, content, tool_calls)
+                    self.context_memory.add_assistant_reply(content, meta={"metrics": self._finish_turn(turn)})
+                    self.context_memory.notify_observers()
+                    await notify_status()
+                    yield json.dumps({"type": "end"})
+                else:
+                    tool_calls_with_result = []
+
+                    for tool_call in tool_calls:
+                        call_id = tool_call["id"]
+                        name = tool_call["name"]
+                        args = json.loads(tool_call["arguments"])
+                        tool_started = time.perf_counter()
+                        try:
+                            result = await self.tool_client.call_tool(call_id, name, args)
+                            turn.tool_done(call_id, name, tool_started)
+                        except Exception as ex:
+                            turn.tool_done(call_id, name, tool_started, error=True)
+                            result = json.dumps({"error": "TOOL EXECUTION FAILED", "detail": str(ex)})
+                            await notify_status()
+
+                        tool_calls_with_result.append({
+                            "id": call_id,
+                            "type": tool_call["type"],
+                            "name": name,
+                            "arguments": tool_call["arguments"],
+                            "result": result if isinstance(result, str) else json.dumps(result),
+                        })
+                        # yield json.dumps({
+                        #     "type": "tool_result",
+                        #     "call_id": call_id,
+                        #     "result": result,
+                        #     "tps": tps(),
+                        # })
 
-                for tool_call in tool_calls:
-                    call_id = tool_call["id"]
-                    name = tool_call["name"]
-                    args = json.loads(tool_call["arguments"])
-                    try:
-                        result = await self.tool_client.call_tool(call_id, name, args)
-                    except Exception as ex:
-                        result = json.dumps({"error": "TOOL EXECUTION FAILED", "detail": str(ex)})
-                        await notify_status()
+                    turn.fill_missing_tokens(messages, content, tool_calls)
+                    self.context_memory.add_assistant_reply(None, tool_calls_with_result, meta={"metrics": self._finish_turn(turn)})
+                    self.context_memory.notify_observers()
+
+                await notify_status()
 
-                    tool_calls_with_result.append({
-                        "id": call_id,
-                        "type": tool_call["type"],
-                        "name": name,
-                        "arguments": tool_call["arguments"],
-                        "result": result if isinstance(result, str) else json.dumps(result),
+                if finish_reason == "stop":
+                    yield json.dumps({
+                        "type": "end",
+                        "info": "Soru tamamlandı, lütfen yeni bir komut girin."
                     })
-                    # yield json.dumps({
-                    #     "type": "tool_result",
-                    #     "call_id": call_id,
-                    #     "result": result,
-                    #     "tps": tps(),
-                    # })
-
-                self.context_memory.add_assistant_reply(None, tool_calls_with_result)
-                self.context_memory.notify_observers()
-
-            await notify_status()
-
-            if finish_reason == "stop":
-                yield json.dumps({
-                    "type": "end",
-                    "info": "Soru tamamlandı, lütfen yeni bir komut girin."
-                })
-                break
+                    break
 
         self.dump()
@@ -1,15 +1,23 @@
 # project/api.py
 from fastapi import APIRouter, Request, HTTPException, Body, Query
+from fastapi.responses import Response, StreamingResponse
+import json
+from gridfs.errors import NoFile
 from typing import List, Dict, Any
 from project.service import (
     create_project, list_projects, get_project, update_project, delete_project,
     save_script, list_scripts, find_script, update_script, delete_script,
     save_execution, list_executions, update_prompts, get_prompts,
-    set_current_project, get_current_project_by_state,run_script_for_project, update_prompts
+    set_current_project, get_current_project, run_script_for_project, update_prompts,
+    resolve_script, stream_script_for_project, execution_stats, get_execution
 
 )
 
-from project.utils import drop_mongo_id, drop_mongo_ids
+from project.blobstore import get_blob_store
+from project.diff import execution_diff
+from project.retention import RetentionTask, list_rollups
+from project.jobs import enqueue_job, get_job, list_jobs, cancel_job
+from project.utils import drop_mongo_id
 from project.models import Prompt
 
 router = APIRouter()
@@ -24,9 +32,23 @@ async def create_project_ep(request: Request):
     return drop_mongo_id(proj)
 
 @router.get("/api/project", response_model=List[dict])
-async def list_projects_ep(request: Request):
+async def list_projects_ep(
+    request: Request,
+    response: Response,
+    tag: str = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = Query(None),
+    full: bool = Query(False),
+):
+    """Liste döner (prompts hariç, full=true ile dahil); sonraki sayfa X-Next-Cursor header'ında."""
     db = request.app.state.db
-    return await list_projects(db)
+    try:
+        page = await list_projects(db, tag=tag, limit=limit, cursor=cursor, full=full)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page["nextCursor"]:
+        response.headers["X-Next-Cursor"] = page["nextCursor"]
+    return page["projects"]
 
 @router.get("/api/project/{project_id}", response_model=dict)
 async def get_project_ep(project_id: str, request: Request):
@@ -117,14 +139,143 @@ async def get_project_executions_ep(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     script_id: str = Query(None),
-    status: str = Query(None)
+    status: str = Query(None),
+    cursor: str = Query(None),
+    full: bool = Query(False),
+    total: str = Query("cached"),
 ):
+    """
+    cursor: önceki cevabın nextCursor'ı (keyset; page yerine tercih edin).
+    full=true: output/result/logs alanları da gelir. total: exact | cached | none.
+    """
+    if total not in ("exact", "cached", "none"):
+        raise HTTPException(status_code=400, detail="total must be exact, cached or none")
     db = request.app.state.db
-    executions, total = await list_executions(
-        db, project_id, page=page, page_size=page_size,
-        script_id=script_id, status=status
-    )
-    return {"executions": drop_mongo_ids(executions), "total": total}
+    try:
+        return await list_executions(
+            db, project_id, page=page, page_size=page_size,
+            script_id=script_id, status=status,
+            cursor=cursor, full=full, total=total,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/api/execution/{execution_id}/output")
+async def download_execution_output_ep(execution_id: str, request: Request):
+    """
+    Execution'ın tam çıktısı (JSON). Blob deposundakiler parça parça akıtılır;
+    istemci gzip kabul ediyorsa sıkıştırılmış hali olduğu gibi gönderilir.
+    """
+    db = request.app.state.db
+    execution = await get_execution(db, execution_id)
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    headers = {"Content-Disposition": f'attachment; filename="{execution_id}.json"'}
+    ref = execution.get("outputRef")
+    if not ref:
+        body = execution.get("output") or json.dumps(execution.get("result") or {}, ensure_ascii=False)
+        return Response(body, media_type="application/json", headers=headers)
+    store = get_blob_store(db, ref["store"])
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        body = await _open_blob_stream(store.open_raw(ref))
+        return StreamingResponse(body, media_type="application/json", headers=headers)
+    body = await _open_blob_stream(store.open(ref))
+    headers["Content-Length"] = str(ref["size"])
+    return StreamingResponse(body, media_type="application/json", headers=headers)
+
+
+async def _open_blob_stream(chunks):
+    """İlk parçayı yanıt başlamadan okur: blob yoksa 200 + yarım gövde yerine 404 döner."""
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except (NoFile, FileNotFoundError):
+        await chunks.aclose()
+        raise HTTPException(status_code=404, detail="Execution output not found")
+
+    async def body():
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+    return body()
+
+
+@router.get("/api/execution/{execution_id}/diff", response_model=Dict[str, Any])
+async def get_execution_diff_ep(
+    execution_id: str,
+    request: Request,
+    against: str = Query(None, description="executionId to compare with (default: previous run)"),
+    key_field: str = Query(None, alias="keyField"),
+):
+    """
+    Önceki çalıştırmaya (ya da `against`'a) göre eklenen / değişen / silinen kayıtlar.
+    Diff modundaki execution'lar için kaydedilmiş fark döner.
+    """
+    db = request.app.state.db
+    execution = await get_execution(db, execution_id)
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    base = None
+    if against:
+        base = await get_execution(db, against)
+        if not base:
+            raise HTTPException(status_code=404, detail="Execution to compare with not found")
+    diff = await execution_diff(db, execution, against=base, key_field=key_field)
+    if diff is None:
+        raise HTTPException(status_code=409, detail="No comparable result data for this execution")
+    return diff
+
+
+@router.get("/api/project/{project_id}/execution/rollups", response_model=List[dict])
+async def get_execution_rollups_ep(
+    project_id: str,
+    request: Request,
+    script_id: str = Query(None),
+    days: int = Query(90, ge=1, le=3650),
+):
+    """Saklama süresi dolup sıkıştırılmış execution'ların günlük özetleri."""
+    return await list_rollups(request.app.state.db, project_id, script_id=script_id, days=days)
+
+
+@router.get("/api/retention", response_model=Dict[str, Any])
+async def retention_status_ep(request: Request):
+    task = getattr(request.app.state, "retention", None)
+    if task is None:
+        return {"enabled": False}
+    return {"enabled": True, **task.status()}
+
+
+@router.post("/api/retention/run", response_model=Dict[str, Any])
+async def retention_run_ep(request: Request, project_id: str = Query(None, alias="projectId")):
+    """Sıkıştırmayı hemen çalıştırır (retention kapalıysa varsayılan politikayla)."""
+    task = getattr(request.app.state, "retention", None) or RetentionTask(request.app.state.db)
+    return await task.run(project_id=project_id)
+
+
+@router.get("/api/project/{project_id}/execution/stats", response_model=Dict[str, Any])
+async def get_project_execution_stats_ep(
+    project_id: str,
+    request: Request,
+    hours: float = Query(24, gt=0, le=24 * 90),
+):
+    return await execution_stats(request.app.state.db, project_id, hours=hours)
+
+
+@router.get("/api/executions/stats", response_model=Dict[str, Any])
+async def get_execution_stats_ep(
+    request: Request,
+    hours: float = Query(24, gt=0, le=24 * 90),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Tüm projelerde script bazında p50/p95 süre ve başarı oranı (en yavaşlar önce)."""
+    return await execution_stats(request.app.state.db, hours=hours, limit=limit)
 
 
 
@@ -164,7 +315,7 @@ async def set_current_project_ep(request: Request):
 
 @router.get("/api/project/current", response_model=dict)
 async def get_current_project_ep(request: Request):
-    proj = get_current_project_by_state(request)
+    proj = await get_current_project(request, request.app.state.db)
     if not proj:
         raise HTTPException(404, "No current project set")
     return drop_mongo_id(proj)
@@ -176,6 +327,16 @@ async def run_script_ep(project_id: str, request: Request):
     body = await request.json()
     script_id = body.get("scriptId")
     max_count = body.get("maxCount", 3)
+    queue = getattr(request.app.state, "jobs", None)
+    if not body.get("wait") and queue is not None:
+        # varsayılan: kuyruğa ekle, job id'yi hemen dön (GET /api/jobs/{jobId});
+        # kuyruk kapalıysa (jobs.enabled: false) iş hiç çalışmaz, eskisi gibi senkron çalıştırılır
+        project = await get_project(db, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+        job = await enqueue_job(db, project, script_id=script_id, max_count=max_count)
+        queue.notify()
+        return {"ok": True, "jobId": job["jobId"], "job": job}
     try:
         execution = await run_script_for_project(
             db, project_id,
@@ -185,3 +346,91 @@ async def run_script_ep(project_id: str, request: Request):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     return {"ok": True, "execution": execution}
+
+
+@router.post("/api/project/{project_id}/run_stream")
+async def run_script_stream_ep(project_id: str, request: Request):
+    """Script'i çalıştırır, emit() edilen kayıtları SSE olarak anında iletir."""
+    db = request.app.state.db
+    body = await request.json()
+    script_id = body.get("scriptId")
+    max_count = body.get("maxCount", 3)
+    try:
+        await resolve_script(db, project_id, script_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def gen():
+        async for event in stream_script_for_project(db, project_id, script_id=script_id, max_count=max_count):
+            yield "data: " + json.dumps(event, ensure_ascii=False, default=str) + "\n\n"
+
+    return StreamingResponse(gen(), media_type="text/event-stream")
+
+
+# -- JOB ENDPOINTS --
+
+@router.get("/api/project/{project_id}/jobs", response_model=List[dict])
+async def list_project_jobs_ep(project_id: str, request: Request, status: str = Query(None),
+                               limit: int = Query(50, ge=1, le=500)):
+    return await list_jobs(request.app.state.db, project_id=project_id, status=status, limit=limit)
+
+
+@router.get("/api/jobs", response_model=Dict[str, Any])
+async def jobs_status_ep(request: Request, status: str = Query(None), limit: int = Query(50, ge=1, le=500)):
+    queue = getattr(request.app.state, "jobs", None)
+    return {
+        "queue": queue.status() if queue is not None else None,
+        "jobs": await list_jobs(request.app.state.db, status=status, limit=limit),
+    }
+
+
+@router.get("/api/jobs/{job_id}", response_model=dict)
+async def get_job_ep(job_id: str, request: Request):
+    job = await get_job(request.app.state.db, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@router.post("/api/jobs/{job_id}/cancel", response_model=dict)
+async def cancel_job_ep(job_id: str, request: Request):
+    job = await cancel_job(request.app.state.db, job_id)
+    if not job:
+        raise HTTPException(409, "Job not found or already started")
+    return {"ok": True, "job": job}
+
+
+# -- BULK EXPORT / IMPORT --
+
+@router.get("/api/export")
+async def export_ep(
+    request: Request,
+    project_id: List[str] = Query(None, alias="projectId"),
+    tag: List[str] = Query(None),
+    executions: bool = Query(True),
+    outputs: bool = Query(True),
+    gzip: bool = Query(False),
+):
+    """Projeler + script'ler + execution'lar NDJSON olarak akıtılır (gzip=true: .ndjson.gz)."""
+    # project.transfer aynı zamanda CLI (python -m); paket import'unda yüklenmesin
+    from project.transfer import export_ndjson
+    db = request.app.state.db
+    stream = export_ndjson(db, compress=gzip, project_ids=project_id, tags=tag,
+                           executions=executions, outputs=outputs)
+    name = "xray-export.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream,
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+@router.post("/api/import", response_model=Dict[str, Any])
+async def import_ep(request: Request, mode: str = Query("upsert")):
+    """Gövde: /api/export çıktısı (düz ya da gzip NDJSON), istek akarken yazılır."""
+    from project.transfer import import_records, iter_ndjson
+    db = request.app.state.db
+    try:
+        return await import_records(db, iter_ndjson(request.stream()), mode=mode)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Import failed: {e}")
@@ -0,0 +1,274 @@
+# project/blobstore.py
+"""
+Büyük execution çıktıları için içerik adresli (sha256) gzip blob deposu.
+
+Eşikten (threshold_bytes) büyük OUTPUT execution dokümanına yazılmaz; blob
+deposuna konur ve dokümanda sadece küçük bir özet + `outputRef` kalır:
+
+    outputRef = {"store": "gridfs" | "local", "id": sha256, "size": ham bayt,
+                 "storedSize": sıkıştırılmış bayt, "encoding": "gzip"}
+
+Backend'ler:
+    gridfs  aynı Mongo veritabanında `execution_outputs` bucket'ı (varsayılan)
+    local   <path>/ab/cdef….gz dosyaları (tek makineli kurulumlar)
+
+Aynı içerik bir kez saklanır; bu yüzden execution silinince blob silinmez
+(başka execution'lar da gösterebilir), bkz. collect_garbage. Tekrar put edilen
+blob'un yaşı tazelenir (local: mtime, gridfs: yeniden yüklenir), yoksa GC yeni
+execution'ı yazılmadan önce eski blob'u silebilir.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+CHUNK = 256 * 1024
+
+_config: Dict[str, Any] = {"backend": "gridfs", "path": "blobs", "threshold_bytes": 256 * 1024, "level": 6}
+_stores: Dict[tuple, "BlobStore"] = {}
+
+
+def configure_blob_store(cfg: Optional[Dict[str, Any]]):
+    """xray_config.yaml `blob_store:` bölümü."""
+    cfg = cfg or {}
+    backend = cfg.get("backend", "gridfs")
+    if backend not in ("gridfs", "local"):
+        raise ValueError(f"Unknown blob store backend: {backend}")
+    _config.update({k: v for k, v in cfg.items() if v is not None})
+    _stores.clear()
+
+
+def blob_threshold() -> int:
+    return int(_config["threshold_bytes"])
+
+
+def get_blob_store(db, backend=None) -> "BlobStore":
+    """Yapılandırılmış backend'in deposu; okurken ref["store"] verilir (backend sonradan değişmiş olabilir)."""
+    backend = backend or _config["backend"]
+    store = _stores.get((id(db), backend))
+    if store is None or store.db is not db:
+        if backend == "local":
+            store = LocalBlobStore(db, _config["path"], _config["level"])
+        else:
+            store = GridFSBlobStore(db, level=_config["level"])
+        _stores[(id(db), backend)] = store
+    return store
+
+
+async def gunzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    d = zlib.decompressobj(wbits=31)
+    async for chunk in chunks:
+        out = d.decompress(chunk)
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+class BlobStore:
+    name = ""
+
+    def __init__(self, db, level=6):
+        self.db = db
+        self.level = level
+
+    def _ref(self, digest, size, stored_size):
+        return {"store": self.name, "id": digest, "size": size, "storedSize": stored_size, "encoding": "gzip"}
+
+    async def put(self, data: bytes) -> Dict[str, Any]:
+        """Veriyi sıkıştırıp saklar (zaten varsa tekrar yazmaz) ve outputRef döndürür."""
+        digest = hashlib.sha256(data).hexdigest()
+        existing = await self._stored_size(digest)
+        if existing is not None and await self._touch(digest):
+            return self._ref(digest, len(data), existing)
+        packed = await asyncio.to_thread(gzip.compress, data, self.level)
+        await self._write(digest, packed)
+        return self._ref(digest, len(data), len(packed))
+
+    async def put_stream(self, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """put'un akış hali: veri bellekte toplanmaz, sha256 + gzip geçici dosyada hesaplanır."""
+        sha = hashlib.sha256()
+        size = 0
+        with tempfile.TemporaryFile() as packed:
+            gz = gzip.GzipFile(fileobj=packed, mode="wb", compresslevel=self.level)
+            async for chunk in chunks:
+                sha.update(chunk)
+                size += len(chunk)
+                await asyncio.to_thread(gz.write, chunk)
+            gz.close()
+            stored_size = packed.tell()
+            digest = sha.hexdigest()
+            existing = await self._stored_size(digest)
+            if existing is not None and await self._touch(digest):
+                return self._ref(digest, size, existing)
+            packed.seek(0)
+            await self._write(digest, packed)
+        return self._ref(digest, size, stored_size)
+
+    async def open_raw(self, ref) -> AsyncIterator[bytes]:
+        """Sıkıştırılmış (gzip) baytlar, parça parça."""
+        raise NotImplementedError
+
+    async def open(self, ref) -> AsyncIterator[bytes]:
+        """Açılmış baytlar, parça parça."""
+        async for chunk in gunzip_chunks(self.open_raw(ref)):
+            yield chunk
+
+    async def read(self, ref) -> bytes:
+        return b"".join([c async for c in self.open(ref)])
+
+    async def delete(self, digest: str, before: Optional[float] = None):
+        """Blob'u siler; before (epoch) verilirse sadece o andan önce yazılmış/tazelenmişse."""
+        raise NotImplementedError
+
+    async def ids(self) -> AsyncIterator[tuple]:
+        """(sha256, oluşturulma zamanı epoch) çiftleri."""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def _stored_size(self, digest) -> Optional[int]:
+        raise NotImplementedError
+
+    async def _touch(self, digest) -> bool:
+        """Var olan blob'un yaşını sıfırlar; False: tekrar yazılmalı."""
+        return False
+
+    async def _write(self, digest, packed):
+        """packed: gzip baytları ya da okunabilir ikili dosya."""
+        raise NotImplementedError
+
+
+class GridFSBlobStore(BlobStore):
+    name = "gridfs"
+
+    def __init__(self, db, bucket="execution_outputs", level=6):
+        super().__init__(db, level)
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket, chunk_size_bytes=CHUNK)
+        self.files = db[f"{bucket}.files"]
+
+    async def _stored_size(self, digest):
+        doc = await self.files.find_one({"filename": digest}, {"length": 1})
+        return doc["length"] if doc else None
+
+    async def _write(self, digest, packed):
+        # uploadDate değiştirilemez; tekrar put'ta yeni revizyon yüklenir, eskiler silinir
+        file_id = await self.bucket.upload_from_stream(digest, packed, metadata={"encoding": "gzip"})
+        async for doc in self.files.find({"filename": digest, "_id": {"$ne": file_id}}, {"_id": 1}):
+            await self.bucket.delete(doc["_id"])
+
+    async def open_raw(self, ref):
+        stream = await self.bucket.open_download_stream_by_name(ref["id"])
+        while True:
+            chunk = await stream.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def delete(self, digest, before=None):
+        query = {"filename": digest}
+        if before is not None:
+            query["uploadDate"] = {"$lt": datetime.fromtimestamp(before, timezone.utc)}
+        async for doc in self.files.find(query, {"_id": 1}):
+            await self.bucket.delete(doc["_id"])
+
+    async def ids(self):
+        async for doc in self.files.find({}, {"filename": 1, "uploadDate": 1}):
+            uploaded = doc["uploadDate"]
+            if uploaded.tzinfo is None:
+                uploaded = uploaded.replace(tzinfo=timezone.utc)
+            yield doc["filename"], uploaded.timestamp()
+
+
+class LocalBlobStore(BlobStore):
+    name = "local"
+
+    def __init__(self, db, root="blobs", level=6):
+        super().__init__(db, level)
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:] + ".gz")
+
+    async def _stored_size(self, digest):
+        try:
+            return os.path.getsize(self._path(digest))
+        except OSError:
+            return None
+
+    async def _touch(self, digest):
+        try:
+            await asyncio.to_thread(os.utime, self._path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def _write(self, digest, packed):
+        def write():
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # önce geçici dosya, sonra rename: yarım yazılmış blob görünmez
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(packed, bytes):
+                    f.write(packed)
+                else:
+                    shutil.copyfileobj(packed, f, CHUNK)
+            os.replace(tmp, path)
+        await asyncio.to_thread(write)
+
+    async def open_raw(self, ref):
+        f = await asyncio.to_thread(open, self._path(ref["id"]), "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, digest, before=None):
+        path = self._path(digest)
+        try:
+            if before is None or os.path.getmtime(path) < before:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def ids(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith(".gz"):
+                    yield prefix + name[:-3], os.path.getmtime(os.path.join(folder, name))
+
+
+async def collect_garbage(db, min_age=3600) -> int:
+    """
+    Hiçbir execution'ın outputRef'i göstermeyen blob'ları siler.
+    min_age saniyeden yeni blob'lara dokunmaz (put edilmiş ama execution'ı henüz yazılmamış olabilir).
+    """
+    store = get_blob_store(db)
+    cutoff = time.time() - min_age
+    removed = 0
+    async for digest, created in store.ids():
+        if created > cutoff:
+            continue
+        if await db.executions.find_one({"outputRef.id": digest}, {"_id": 1}):
+            continue
+        await store.delete(digest, before=cutoff)  # bu arada tekrar put edildiyse dokunma
+        removed += 1
+    return removed
@@ -0,0 +1,95 @@
+# project/cache.py
+"""
+Proje / prompt / script okumaları için süreç içi read-through cache.
+
+- TTL: başka bir süreçteki (ör. ikinci API worker'ı) yazmalar en geç `ttl` saniyede görünür
+- max_entries: LRU ile sınırlı
+- versiyon damgası: proje başına sayaç; invalidate(project_id) sayacı artırır,
+  o projenin tüm kayıtları (ve app.state.current_project kopyası) bayatlar
+- aynı anahtar için eşzamanlı cache miss'ler tek bir DB okumasını paylaşır
+
+Dönen değerler kopyadır; çağıran değiştirse de cache bozulmaz.
+"""
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ProjectCache:
+    def __init__(self, ttl: float = 5.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key → (expires_at, version, value)
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        if ttl is not None:
+            self.ttl = float(ttl)
+        if max_entries is not None:
+            self.max_entries = int(max_entries)
+        self.clear()
+
+    def version(self, project_id: str) -> int:
+        return self._versions.get(project_id, 0)
+
+    async def get(self, key: tuple, project_id: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """key'in değeri; yoksa/bayatsa loader() ile okunur ve saklanır."""
+        if self.ttl <= 0:
+            return await loader()
+        version = self.version(project_id)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic() and entry[1] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+        self.misses += 1
+        pending = self._inflight.get((key, version))
+        if pending is not None:
+            return copy.deepcopy(await asyncio.shield(pending))
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[(key, version)] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # bekleyen yoksa "never retrieved" uyarısı çıkmasın
+            raise
+        finally:
+            self._inflight.pop((key, version), None)
+        future.set_result(value)
+        # okuma sürerken invalidate olduysa eski değeri saklama
+        if self.version(project_id) == version:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return copy.deepcopy(value)
+
+    def invalidate(self, project_id: str):
+        self._versions[project_id] = self.version(project_id) + 1
+        for key in [k for k in self._entries if k[1] == project_id]:
+            del self._entries[key]
+
+    def clear(self):
+        # versiyonlar korunur: current_project damgaları yanlışlıkla tekrar geçerli olmasın
+        self._entries.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+CACHE = ProjectCache()
+
+
+def configure_cache(cfg: Optional[Dict[str, Any]]):
+    """xray_config.yaml `cache:` bölümü (ttl 0 cache'i kapatır)."""
+    cfg = cfg or {}
+    CACHE.configure(cfg.get("ttl"), cfg.get("max_entries"))
+    return CACHE
@@ -0,0 +1,225 @@
+# project/diff.py
+"""
+Çalıştırmalar arası sonuç farkı (change detection).
+
+Proje bazında açılır:
+
+    executionConfig.diff = {"enabled": true, "keyField": "url", "fullEvery": 50}
+
+Başarılı her çalıştırmada result["data"] kayıtları hash'lenir (sha1, anahtarları
+sıralı JSON). Kaydın kimliği `keyField` alanıdır; verilmemişse / kayıtta yoksa
+içeriğin hash'i (o zaman değişen kayıt "silindi + eklendi" görünür). Aynı anahtar
+tekrar ederse ikincisi "anahtar#2" olur. Script başına son durum `result_states`'te:
+
+    {projectId, scriptId, executionId, keyField, items: [[key, hash], ...], runs, updatedAt}
+
+Diff modunda execution'a tüm veri değil sadece fark yazılır (resultMode="diff"):
+
+    output/result = {"added":   [{"key": k, "data": kayıt}, ...],
+                     "changed": [{"key": k, "data": yeni kayıt}, ...],
+                     "removed": [k, ...]}
+    diff = {baseExecutionId, keyField, added, changed, removed, unchanged}
+
+İlk çalıştırma ve her `fullEvery`'inci çalıştırma tam veri saklar (resultMode="full").
+Hata ile biten ya da erken durdurulan çalıştırmalar durumu değiştirmez (yarım veri
+"silindi" sayılmasın). Durum execution yazıldıktan sonra ilerletilir (record_result_state),
+böylece `result_states` hiçbir zaman yazılmamış bir execution'ı göstermez; arada başka
+bir çalıştırma durumu değiştirdiyse bu çalıştırmanın farkı yine baseExecutionId'ye göre
+geçerlidir, sadece durum ona geçmez. Bir diff execution'ının tam verisi baseExecutionId
+zinciri tam kayda kadar izlenip ileri doğru diff'ler uygulanarak kurulur (reconstruct_data);
+çalıştırmalar üst üste binebildiği için taban startTime'a göre daha yeni olabilir.
+Retention bu zinciri silmez.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from project.utils import now_iso
+
+DEFAULTS = {"enabled": False, "keyField": None, "fullEvery": 50}
+
+
+def diff_policy(execution_config) -> Optional[Dict[str, Any]]:
+    """executionConfig.diff (kapalıysa None)."""
+    cfg = (execution_config or {}).get("diff")
+    if cfg is True:
+        cfg = {"enabled": True}
+    if not isinstance(cfg, dict) or not cfg.get("enabled", True):
+        return None
+    return {**DEFAULTS, **cfg, "enabled": True}
+
+
+def item_hash(item) -> str:
+    raw = json.dumps(item, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def keyed_items(items: List[Any], key_field=None) -> Dict[str, Tuple[str, Any]]:
+    """key → (hash, kayıt); sıra korunur."""
+    keyed: Dict[str, Tuple[str, Any]] = {}
+    seen: Dict[str, int] = {}
+    for item in items:
+        digest = item_hash(item)
+        value = item.get(key_field) if key_field and isinstance(item, dict) else None
+        key = str(value) if value is not None else digest
+        n = seen[key] = seen.get(key, 0) + 1
+        if n > 1:
+            key = f"{key}#{n}"
+        keyed[key] = (digest, item)
+    return keyed
+
+
+def diff_items(previous: Dict[str, str], keyed: Dict[str, Tuple[str, Any]]) -> Dict[str, Any]:
+    """previous: key → hash (önceki durum). Dönüş: added / changed / removed / unchanged."""
+    added, changed = [], []
+    unchanged = 0
+    for key, (digest, item) in keyed.items():
+        old = previous.get(key)
+        if old is None:
+            added.append({"key": key, "data": item})
+        elif old != digest:
+            changed.append({"key": key, "data": item})
+        else:
+            unchanged += 1
+    removed = [key for key in previous if key not in keyed]
+    return {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
+
+
+def diff_summary(diff: Dict[str, Any], base_execution_id, key_field) -> Dict[str, Any]:
+    return {
+        "baseExecutionId": base_execution_id,
+        "keyField": key_field,
+        "added": len(diff["added"]),
+        "changed": len(diff["changed"]),
+        "removed": len(diff["removed"]),
+        "unchanged": diff["unchanged"],
+    }
+
+
+async def prepare_result_state(db, project_id, script_id, execution_id, output_json, policy):
+    """
+    Çalıştırmanın verisini script'in son durumuyla karşılaştırır.
+    Dönüş: (saklanacak output_json, diff özeti ya da None, "full" | "diff", durum güncellemesi ya da None).
+    Durum güncellemesi execution yazıldıktan sonra record_result_state'e verilir.
+    """
+    if not isinstance(output_json, dict) or not isinstance(output_json.get("data"), list):
+        return output_json, None, "full", None
+    key_field = policy.get("keyField")
+    keyed = keyed_items(output_json["data"], key_field)
+    state = await db.result_states.find_one({"projectId": project_id, "scriptId": script_id})
+    base_id = state.get("executionId") if state else None
+    # anahtar alanı değiştiyse eski durum karşılaştırılamaz
+    comparable = state is not None and state.get("keyField") == key_field
+    runs = (state or {}).get("runs", 0) + 1
+    update = {
+        "baseExecutionId": base_id,
+        "state": {
+            "projectId": project_id,
+            "scriptId": script_id,
+            "executionId": execution_id,
+            "keyField": key_field,
+            "items": [[key, digest] for key, (digest, _) in keyed.items()],
+            "runs": runs,
+            "updatedAt": now_iso(),
+        },
+    }
+    if not comparable:
+        return output_json, None, "full", update
+    diff = diff_items(dict(state.get("items") or []), keyed)
+    summary = diff_summary(diff, base_id, key_field)
+    full_every = int(policy.get("fullEvery") or 0)
+    if full_every and runs % full_every == 0:
+        return output_json, summary, "full", update
+    stored = {k: diff[k] for k in ("added", "changed", "removed")}
+    return stored, summary, "diff", update
+
+
+async def record_result_state(db, update) -> bool:
+    """
+    Script'in durumunu yazılmış execution'a ilerletir. İyimser kilit: arada başka bir
+    çalıştırma durumu değiştirdiyse upsert unique index'e takılır ve durum olduğu gibi kalır (False).
+    """
+    state = update["state"]
+    try:
+        await db.result_states.replace_one(
+            {"projectId": state["projectId"], "scriptId": state["scriptId"],
+             "executionId": update["baseExecutionId"]},
+            state, upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+# --- okuma ---
+
+async def _load_output(db, execution):
+    from project.service import load_execution_output
+    return await load_execution_output(db, execution)
+
+
+async def reconstruct_data(db, execution) -> Optional[List[Any]]:
+    """
+    Execution'ın tam result["data"]'sı. Diff modundaysa en yakın tam kayıttan
+    itibaren diff'ler uygulanır; zincir kopuksa (ör. retention tam kaydı silmişse) None.
+    """
+    if execution.get("resultMode") != "diff":
+        data = (await _load_output(db, execution) or {}).get("data")
+        return data if isinstance(data, list) else None
+
+    # zincir baseExecutionId ile izlenir: üst üste binen çalıştırmalarda taban daha geç başlamış olabilir
+    chain = [execution]
+    while chain[-1].get("resultMode") == "diff":
+        base_id = (chain[-1].get("diff") or {}).get("baseExecutionId")
+        doc = await db.executions.find_one({"executionId": base_id}, {"_id": 0, "logs": 0}) if base_id else None
+        if doc is None or doc["executionId"] in {c["executionId"] for c in chain}:
+            return None
+        chain.append(doc)
+
+    data = (await _load_output(db, chain[-1]) or {}).get("data")
+    if not isinstance(data, list):
+        return None
+    keyed = {key: item for key, (_, item) in keyed_items(data, execution["diff"].get("keyField")).items()}
+    for doc in reversed(chain[:-1]):
+        diff = await _load_output(db, doc) or {}
+        for key in diff.get("removed", []):
+            keyed.pop(key, None)
+        for entry in diff.get("added", []) + diff.get("changed", []):
+            keyed[entry["key"]] = entry["data"]
+    return list(keyed.values())
+
+
+async def execution_diff(db, execution, against=None, key_field=None) -> Optional[Dict[str, Any]]:
+    """
+    Execution'ın farkı. against verilmemişse kaydedilen fark (diff modu) ya da
+    bir önceki başarılı çalıştırmaya göre hesaplanan fark; verilmişse o execution'a göre.
+    Veri kurulamıyorsa None.
+    """
+    summary = execution.get("diff") or {}
+    if against is None:
+        if execution.get("resultMode") == "diff":
+            stored = await _load_output(db, execution) or {}
+            return {"executionId": execution["executionId"], **summary,
+                    **{k: stored.get(k, []) for k in ("added", "changed", "removed")}}
+        if summary.get("baseExecutionId"):
+            against = await db.executions.find_one({"executionId": summary["baseExecutionId"]}, {"_id": 0, "logs": 0})
+        else:
+            against = await db.executions.find_one(
+                {"projectId": execution["projectId"], "scriptId": execution["scriptId"], "status": "success",
+                 "startTime": {"$lt": execution["startTime"]}},
+                {"_id": 0, "logs": 0}, sort=[("startTime", -1), ("executionId", -1)],
+            )
+        if against is None:
+            return None
+    if key_field is None:
+        key_field = summary.get("keyField") or (against.get("diff") or {}).get("keyField")
+    current = await reconstruct_data(db, execution)
+    base = await reconstruct_data(db, against)
+    if current is None or base is None:
+        return None
+    previous = {key: digest for key, (digest, _) in keyed_items(base, key_field).items()}
+    diff = diff_items(previous, keyed_items(current, key_field))
+    return {"executionId": execution["executionId"], **diff_summary(diff, against["executionId"], key_field),
+            **{k: diff[k] for k in ("added", "changed", "removed")}}
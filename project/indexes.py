@@ -0,0 +1,147 @@
+# project/indexes.py
+"""
+Mongo index tanımları ve başlangıç migration'ı.
+
+service / jobs sorgularının şekilleri:
+    projects    {projectId}, {tags}, {projectStatus}
+    scripts     {projectId} sort version, {projectId, scriptId} sort version, {scriptId}
+    executions  {projectId[, scriptId][, status]} sort (startTime, executionId), {executionId},
+                {startTime >= since} (stats), {outputRef.id} (blob GC)
+    execution_rollups {projectId, scriptId, day} (upsert), {projectId} sort day, TTL expireAt
+    result_states {projectId, scriptId} (diff durumu, iyimser kilit için unique)
+    jobs        {jobId}, {status, runAt} (claim), {status, lockedUntil} (recover),
+                {projectId} sort createdAt
+
+Index'ler anahtar sırası + unique ile karşılaştırılır; isim farkı önemsizdir.
+Aynı anahtarlı ama unique olmayan eski bir index varsa unique haline yükseltilir
+(eski veri tekrar içeriyorsa eski index geri kurulur ve "failed" raporlanır).
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger("xray.indexes")
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "projects": [
+        IndexModel([("projectId", ASCENDING)], name="projectId_unique", unique=True),
+        IndexModel([("tags", ASCENDING)], name="tags"),
+        IndexModel([("projectStatus", ASCENDING)], name="projectStatus"),
+    ],
+    "scripts": [
+        IndexModel([("scriptId", ASCENDING)], name="scriptId"),
+        IndexModel([("projectId", ASCENDING), ("version", DESCENDING)], name="projectId_version", unique=True),
+        IndexModel([("projectId", ASCENDING), ("scriptId", ASCENDING), ("version", DESCENDING)],
+                   name="projectId_scriptId_version"),
+    ],
+    "executions": [
+        IndexModel([("executionId", ASCENDING)], name="executionId_unique", unique=True),
+        # (startTime, executionId): list_executions keyset sıralaması
+        IndexModel([("projectId", ASCENDING), ("startTime", DESCENDING), ("executionId", DESCENDING)],
+                   name="projectId_startTime_executionId"),
+        IndexModel([("projectId", ASCENDING), ("scriptId", ASCENDING), ("startTime", DESCENDING),
+                    ("executionId", DESCENDING)], name="projectId_scriptId_startTime_executionId"),
+        IndexModel([("projectId", ASCENDING), ("status", ASCENDING), ("startTime", DESCENDING),
+                    ("executionId", DESCENDING)], name="projectId_status_startTime_executionId"),
+        IndexModel([("startTime", DESCENDING)], name="startTime"),
+        IndexModel([("outputRef.id", ASCENDING)], name="outputRef_id", sparse=True),
+    ],
+    "execution_rollups": [
+        IndexModel([("projectId", ASCENDING), ("scriptId", ASCENDING), ("day", DESCENDING)],
+                   name="projectId_scriptId_day", unique=True),
+        IndexModel([("projectId", ASCENDING), ("day", DESCENDING)], name="projectId_day"),
+        # TTL: özetler expireAt'te silinir
+        IndexModel([("expireAt", ASCENDING)], name="expireAt_ttl", expireAfterSeconds=0),
+    ],
+    "result_states": [
+        IndexModel([("projectId", ASCENDING), ("scriptId", ASCENDING)], name="projectId_scriptId", unique=True),
+    ],
+    "jobs": [
+        IndexModel([("jobId", ASCENDING)], name="jobId_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("runAt", ASCENDING)], name="status_runAt"),
+        IndexModel([("status", ASCENDING), ("lockedUntil", ASCENDING)], name="status_lockedUntil"),
+        IndexModel([("projectId", ASCENDING), ("createdAt", DESCENDING)], name="projectId_createdAt"),
+    ],
+}
+
+
+def _key(spec) -> tuple:
+    return tuple((field, int(direction)) for field, direction in spec)
+
+
+def _model_key(model: IndexModel) -> tuple:
+    return _key(model.document["key"].items())
+
+
+async def _existing(db, coll) -> Dict[tuple, Dict]:
+    """{anahtar: {"name", "unique"}} – koleksiyondaki mevcut index'ler."""
+    info = await db[coll].index_information()
+    return {_key(i["key"]): {"name": name, "unique": bool(i.get("unique"))} for name, i in info.items()}
+
+
+async def missing_indexes(db) -> Dict[str, List[str]]:
+    """Tanımlı olup veritabanında olmayan (ya da unique olmayan) index'ler: {koleksiyon: [isim, ...]}."""
+    missing = {}
+    for coll, models in INDEXES.items():
+        existing = await _existing(db, coll)
+        names = [
+            m.document["name"] for m in models
+            if _model_key(m) not in existing
+            or (m.document.get("unique") and not existing[_model_key(m)]["unique"])
+        ]
+        if names:
+            missing[coll] = names
+    return missing
+
+
+async def _create(db, coll, model: IndexModel):
+    """Index'i kurar; aynı anahtarlı unique olmayan eski index'i unique'e yükseltir."""
+    old = (await _existing(db, coll)).get(_model_key(model))
+    if old is None:
+        await db[coll].create_indexes([model])
+        return
+    await db[coll].drop_index(old["name"])
+    try:
+        await db[coll].create_indexes([model])
+    except OperationFailure:
+        await db[coll].create_indexes([IndexModel(list(model.document["key"].items()), name=old["name"])])
+        raise
+
+
+async def ensure_indexes(db, create=True) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Eksik index'leri oluşturur (create=False ise sadece raporlar).
+    Dönüş: {"created": {...}, "failed": {...}, "missing": {...}[, "error": ...]}
+    Başarısız olan (ör. mevcut veride tekrar eden projectId yüzünden unique
+    index kurulamayan) index'ler loglanır; başlangıç durdurulmaz.
+    """
+    report = {"created": {}, "failed": {}, "missing": {}}
+    try:
+        missing = await missing_indexes(db)
+    except PyMongoError as e:
+        # Mongo'ya ulaşılamıyor: API yine açılsın, index'ler sonraki açılışta kurulur
+        logger.warning("index check skipped: %s", e)
+        report["error"] = str(e)
+        return report
+    for coll, names in missing.items():
+        if not create:
+            report["missing"][coll] = names
+            continue
+        for model in INDEXES[coll]:
+            name = model.document["name"]
+            if name not in names:
+                continue
+            try:
+                await _create(db, coll, model)
+                report["created"].setdefault(coll, []).append(name)
+            except OperationFailure as e:
+                report["failed"].setdefault(coll, []).append(name)
+                logger.warning("index %s.%s could not be created: %s", coll, name, e)
+
+    for coll, names in report["created"].items():
+        logger.info("created indexes on %s: %s", coll, ", ".join(names))
+    for coll, names in report["missing"].items():
+        logger.warning("missing indexes on %s: %s", coll, ", ".join(names))
+    return report
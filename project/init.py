@@ -1,19 +1,26 @@
 # project/init.py
 from fastapi import FastAPI
 from .api import router
+from .indexes import ensure_indexes
 
-def setup_all(app: FastAPI, db=None, tool_clients=None):
+async def setup_all(app: FastAPI, db=None, tool_clients=None, create_indexes=True):
     """
     Tüm project altı setup işlemlerini merkezi olarak yapar.
     Args:
         app: FastAPI app instance.
         db: Opsiyonel olarak dışarıdan db instance verilebilir.
         tool_clients: Tool clientlar listesini referans olarak alır.
+        create_indexes: False ise eksik index'ler oluşturulmaz, sadece loglanır.
     """
     # Eğer db dışarıdan verilirse onu kullan, yoksa otomatik get_db ile kur (ama genelde lifespan ile atanacak)
     if db is not None:
         app.state.db = db
 
+    # index migration: eksikleri kur (ya da raporla)
+    db = getattr(app.state, "db", None)
+    if db is not None:
+        app.state.index_report = await ensure_indexes(db, create=create_indexes)
+
     app.include_router(router)
 
     # Tool registration: tool_clients parametresi ToolRouter’a aktarılacak
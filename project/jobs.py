@@ -0,0 +1,344 @@
+# project/jobs.py
+"""
+Kalıcı iş kuyruğu: script çalıştırmaları `jobs` koleksiyonuna yazılır,
+JobQueue worker'ları bunları sırayla alıp run_script_for_project ile çalıştırır.
+
+- concurrency:          aynı anda çalışan toplam iş
+- domain_concurrency:   aynı scraperDomain için aynı anda çalışan iş
+- domain_min_interval:  aynı domain'e iki iş başlangıcı arasındaki en az süre (s)
+- retry:                executionConfig.retries kadar tekrar, üstel bekleme
+                        (retry_base * 2^(deneme-1), en fazla retry_max)
+- scheduler:            executionConfig.interval (hourly/daily/weekly ya da saniye)
+                        dolan aktif projeler için iş ekler
+
+Job dokümanı:
+    {jobId, projectId, scriptId, maxCount, domain, trigger, status,
+     attempts, maxAttempts, runAt, createdAt, startedAt, finishedAt,
+     lockedBy, lockedUntil, executionId, error}
+
+status: queued → running → succeeded | failed   (queued → cancelled)
+
+Domain limitleri süreç içidir; birden çok API süreci aynı kuyruğu
+işleyebilir ama domain limitlerini paylaşmaz.
+"""
+import asyncio
+import logging
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from project.cache import CACHE
+from project.service import run_script_for_project
+from project.utils import nanoid, now_iso, drop_mongo_id
+
+logger = logging.getLogger("xray.jobs")
+
+INTERVALS = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400}
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+
+def _iso_in(seconds: float) -> str:
+    return (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+
+
+def interval_seconds(execution_config) -> Optional[float]:
+    interval = (execution_config or {}).get("interval")
+    if isinstance(interval, (int, float)) and interval > 0:
+        return float(interval)
+    return INTERVALS.get(interval)
+
+
+async def enqueue_job(db, project, script_id=None, max_count=3, trigger="api", run_at=None):
+    """Proje için kuyruğa bir iş ekler ve job dokümanını döndürür."""
+    retries = int((project.get("executionConfig") or {}).get("retries", 0) or 0)
+    now = now_iso()
+    job = {
+        "jobId": nanoid(14),
+        "projectId": project["projectId"],
+        "scriptId": script_id,
+        "maxCount": max_count,
+        "domain": project.get("scraperDomain") or "",
+        "trigger": trigger,
+        "status": "queued",
+        "attempts": 0,
+        "maxAttempts": 1 + max(retries, 0),
+        "runAt": run_at or now,
+        "createdAt": now,
+        "startedAt": None,
+        "finishedAt": None,
+        "lockedBy": None,
+        "lockedUntil": None,
+        "executionId": None,
+        "error": "",
+    }
+    await db.jobs.insert_one(job)
+    return drop_mongo_id(job)
+
+
+async def get_job(db, job_id):
+    job = await db.jobs.find_one({"jobId": job_id})
+    return drop_mongo_id(job) if job else None
+
+
+async def list_jobs(db, project_id=None, status=None, limit=50):
+    query = {}
+    if project_id:
+        query["projectId"] = project_id
+    if status:
+        query["status"] = status
+    jobs = await db.jobs.find(query).sort("createdAt", -1).to_list(length=limit)
+    return [drop_mongo_id(j) for j in jobs]
+
+
+async def cancel_job(db, job_id):
+    """Sadece henüz başlamamış (queued) işler iptal edilebilir."""
+    job = await db.jobs.find_one_and_update(
+        {"jobId": job_id, "status": "queued"},
+        {"$set": {"status": "cancelled", "finishedAt": now_iso()}},
+        return_document=True,
+    )
+    return drop_mongo_id(job) if job else None
+
+
+class _DomainLimiter:
+    def __init__(self, concurrency: int, min_interval: float):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.running: Dict[str, int] = {}
+        self.last_start: Dict[str, float] = {}
+
+    def blocked(self):
+        """Şu an iş başlatılamayacak domain'ler."""
+        now = time.monotonic()
+        out = {d for d, n in self.running.items() if self.concurrency and n >= self.concurrency}
+        if self.min_interval:
+            out |= {d for d, t in self.last_start.items() if now - t < self.min_interval}
+        out.discard("")  # domain'i olmayan projeler sınırlanmaz
+        return out
+
+    def acquire(self, domain):
+        self.running[domain] = self.running.get(domain, 0) + 1
+        self.last_start[domain] = time.monotonic()
+
+    def release(self, domain):
+        self.running[domain] = max(self.running.get(domain, 1) - 1, 0)
+
+
+class JobQueue:
+    def __init__(self, db, concurrency=4, poll_interval=2.0, domain_concurrency=1,
+                 domain_min_interval=0.0, retry_base=30.0, retry_max=3600.0,
+                 lease_seconds=1800.0, scheduler=True, schedule_tick=30.0):
+        self.db = db
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease_seconds = lease_seconds
+        self.scheduler = scheduler
+        self.schedule_tick = schedule_tick
+        self.worker_id = f"{socket.gethostname()}:{nanoid(6)}"
+        self.domains = _DomainLimiter(domain_concurrency, domain_min_interval)
+        self._claim_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "retried": 0, "scheduled": 0, "recovered": 0}
+
+    # --- lifecycle ---
+
+    async def start(self):
+        await self.recover_stale()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        if self.scheduler:
+            self._tasks.append(asyncio.create_task(self._scheduler()))
+        logger.info("job queue started: %d workers (%s)", self.concurrency, self.worker_id)
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Yeni iş eklendi: bekleyen worker'ları hemen uyandır."""
+        self._wakeup.set()
+
+    # --- queue ---
+
+    async def claim(self):
+        # domain sınırları süreç içi olduğundan claim + acquire atomik olmalı
+        async with self._claim_lock:
+            now = now_iso()
+            job = await self.db.jobs.find_one_and_update(
+                {"status": "queued", "runAt": {"$lte": now}, "domain": {"$nin": list(self.domains.blocked())}},
+                {
+                    "$set": {
+                        "status": "running",
+                        "startedAt": now,
+                        "lockedBy": self.worker_id,
+                        "lockedUntil": _iso_in(self.lease_seconds),
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("runAt", 1)],
+                return_document=True,
+            )
+            if job:
+                self.domains.acquire(job.get("domain", ""))
+                self.stats["claimed"] += 1
+            return job
+
+    async def _heartbeat(self, job_id):
+        """İş sürdükçe lease'i uzatır; yoksa lease_seconds'tan uzun iş recover_stale ile ikinci kez çalışır."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await self.db.jobs.update_one(
+                    {"jobId": job_id, "status": "running", "lockedBy": self.worker_id},
+                    {"$set": {"lockedUntil": _iso_in(self.lease_seconds)}},
+                )
+                if not result.matched_count:
+                    logger.warning("job %s lease lost", job_id)
+                    return
+            except Exception:
+                logger.exception("job %s heartbeat failed", job_id)
+
+    async def run_job(self, job):
+        error = ""
+        execution = None
+        heartbeat = asyncio.create_task(self._heartbeat(job["jobId"]))
+        try:
+            execution = await run_script_for_project(
+                self.db, job["projectId"], script_id=job.get("scriptId"), max_count=job.get("maxCount", 3)
+            )
+            if execution.get("status") != "success":
+                error = execution.get("errorMessage") or execution.get("status", "error")
+        except asyncio.CancelledError:
+            # kuyruk durduruluyor: iş kaybolmasın, hemen tekrar alınabilsin
+            self.domains.release(job.get("domain", ""))
+            await self.db.jobs.update_one(
+                {"jobId": job["jobId"]},
+                {"$set": {"status": "queued", "runAt": now_iso(), "lockedBy": None, "lockedUntil": None},
+                 "$inc": {"attempts": -1}},
+            )
+            raise
+        except ValueError as e:
+            # script yok: tekrar denemenin anlamı yok
+            error = str(e)
+            job["maxAttempts"] = job["attempts"]
+        except Exception as e:
+            logger.exception("job %s failed", job["jobId"])
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+        self.domains.release(job.get("domain", ""))
+
+        update = {
+            "lockedBy": None,
+            "lockedUntil": None,
+            "executionId": execution["executionId"] if execution else None,
+            "error": error,
+        }
+        if not error:
+            update.update(status="succeeded", finishedAt=now_iso())
+            self.stats["succeeded"] += 1
+        elif job["attempts"] < job["maxAttempts"]:
+            delay = min(self.retry_base * 2 ** (job["attempts"] - 1), self.retry_max)
+            update.update(status="queued", runAt=_iso_in(delay))
+            self.stats["retried"] += 1
+        else:
+            update.update(status="failed", finishedAt=now_iso())
+            self.stats["failed"] += 1
+        await self.db.jobs.update_one({"jobId": job["jobId"]}, {"$set": update})
+        return update["status"]
+
+    async def recover_stale(self):
+        """Lease süresi dolmuş running işleri (çöken süreç) kuyruğa geri koyar."""
+        result = await self.db.jobs.update_many(
+            {"status": "running", "lockedUntil": {"$lt": now_iso()}},
+            {"$set": {"status": "queued", "lockedBy": None, "lockedUntil": None, "runAt": now_iso()}},
+        )
+        if result.modified_count:
+            self.stats["recovered"] += result.modified_count
+            logger.warning("requeued %d stale job(s)", result.modified_count)
+
+    async def _worker(self, n):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("job claim failed")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+            self._wakeup.set()  # bir domain serbest kaldı, diğer worker'lar bakabilir
+
+    # --- scheduler ---
+
+    async def schedule_due(self):
+        """interval'i dolan aktif projeler için iş ekler (zaten bekleyen işi olanlar hariç)."""
+        projects = await self.db.projects.find(
+            {"projectStatus": "active", "executionConfig.interval": {"$exists": True}},
+            {"_id": 0, "projectId": 1, "scraperDomain": 1, "executionConfig": 1, "lastScheduledAt": 1},
+        ).to_list(length=None)
+        now = datetime.utcnow()
+        added = 0
+        for project in projects:
+            seconds = interval_seconds(project.get("executionConfig"))
+            if not seconds:
+                continue
+            last = project.get("lastScheduledAt")
+            if not last:
+                # ilk görüşte hemen çalıştırma (deploy anında tüm projeler birden kuyruğa girmesin):
+                # saat şimdi başlar, ilk çalışma bir interval sonra
+                await self.db.projects.update_one(
+                    {"projectId": project["projectId"], "lastScheduledAt": last},
+                    {"$set": {"lastScheduledAt": now.isoformat()}},
+                )
+                CACHE.invalidate(project["projectId"])
+                continue
+            due_before = (now - timedelta(seconds=seconds)).isoformat()
+            if last and last > due_before:
+                continue
+            # çok süreçli çalışmada aynı projeyi iki kez planlamamak için koşullu güncelle
+            claimed = await self.db.projects.find_one_and_update(
+                {"projectId": project["projectId"], "lastScheduledAt": last},
+                {"$set": {"lastScheduledAt": now.isoformat()}},
+            )
+            if not claimed:
+                continue
+            CACHE.invalidate(project["projectId"])
+            pending = await self.db.jobs.find_one(
+                {"projectId": project["projectId"], "status": {"$in": ["queued", "running"]}}
+            )
+            if pending:
+                continue
+            await enqueue_job(self.db, project, trigger="schedule")
+            added += 1
+        if added:
+            self.stats["scheduled"] += added
+            self.notify()
+        return added
+
+    async def _scheduler(self):
+        while True:
+            try:
+                await self.recover_stale()
+                await self.schedule_due()
+            except Exception:
+                logger.exception("job scheduler tick failed")
+            await asyncio.sleep(self.schedule_tick)
+
+    def status(self):
+        return {
+            "workerId": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": {d: n for d, n in self.domains.running.items() if n},
+            "stats": self.stats,
+        }
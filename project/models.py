@@ -22,6 +22,7 @@ class Project(BaseModel):
     updatedAt: str
     prompts: List[Prompt] = []
     executionConfig: Optional[Dict[str, Any]] = {}
+    tags: List[str] = []
 
 class ScriptVersion(BaseModel):
     scriptId: str
@@ -40,10 +41,17 @@ class Execution(BaseModel):
     scriptId: str
     scriptVersion: int
     status: str
+    limitViolation: Optional[str] = None   # timeout | memory | cpu | output | pages
     startTime: str
     endTime: Optional[str] = None
-    duration: Optional[int] = 0
+    duration: Optional[float] = 0        # saniye (monotonic)
+    cpuTime: Optional[float] = None      # user + system CPU saniyesi (wait4 rusage)
+    maxRssKb: Optional[int] = None
+    outputBytes: Optional[int] = None
     resultCount: Optional[int] = 0
     output: Optional[str] = ""
+    outputRef: Optional[dict] = None     # büyük çıktı blob deposunda (project/blobstore.py)
+    resultMode: Optional[str] = None     # "diff": output/result sadece önceki çalıştırmaya göre fark (project/diff.py)
+    diff: Optional[dict] = None          # {baseExecutionId, keyField, added, changed, removed, unchanged}
     errorMessage: Optional[str] = ""
     result: Optional[dict] = {}
\ No newline at end of file
@@ -0,0 +1,269 @@
+# project/retention.py
+"""
+Execution saklama politikası ve sıkıştırma (compaction).
+
+Her (proje, script) için en yeni `keep_last` execution ve son `keep_days`
+gündekiler ham olarak kalır. Daha eskiler günlük özetlere (`execution_rollups`)
+işlenip silinir:
+
+    {projectId, scriptId, day: "YYYY-MM-DD", count, succeeded, failed, limitExceeded,
+     successRate, resultCount, cpuTime, minDuration, maxDuration, p95Duration,
+     durationHistogram: {"b00": n, ...}, updatedAt, expireAt}
+
+p95, sabit sınırlı süre histogramından hesaplanır (bin'in üst sınırı); böylece
+aynı güne sonraki çalıştırmalarda eklenen execution'lar $inc ile birleşir.
+Özetler `rollup_days` sonra TTL index'i (expireAt) ile silinir.
+
+Politika: xray_config.yaml `retention:` + proje bazında
+executionConfig.retention = {"keepLast": 50, "keepDays": 7}.
+
+Diff modundaki (bkz. project/diff.py) execution'lar en yakın tam kayıttan kurulur;
+kalan diff execution'larının baseExecutionId zincirindeki kayıtlar silinmez.
+
+Not: özet yazılıp ham dokümanlar silinmeden süreç ölürse bir sonraki
+çalıştırma o partiyi tekrar sayar (en fazla batch_size execution).
+"""
+import asyncio
+import bisect
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo import UpdateOne
+
+from project.blobstore import collect_garbage
+from project.utils import now_iso
+
+logger = logging.getLogger("xray.retention")
+
+# süre histogramı üst sınırları (s); son bin sınırsız
+DURATION_BINS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 900, 1800, 3600]
+
+DEFAULTS = {
+    "keep_last": 200,
+    "keep_days": 30,
+    "rollup_days": 730,
+    "interval": 86400,
+    "initial_delay": 300,
+    "batch_size": 1000,
+}
+
+
+def _bin(duration) -> str:
+    return f"b{bisect.bisect_left(DURATION_BINS, float(duration or 0)):02d}"
+
+
+def histogram_percentile(histogram: Dict[str, int], q: float) -> Optional[float]:
+    """Histogramdan yüzdelik: hedef sıranın düştüğü bin'in üst sınırı (son bin için None)."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = q / 100 * total
+    seen = 0
+    for key in sorted(histogram):
+        seen += histogram[key]
+        if seen >= rank:
+            i = int(key[1:])
+            return DURATION_BINS[i] if i < len(DURATION_BINS) else None
+    return None
+
+
+def project_policy(defaults: Dict[str, Any], execution_config) -> Dict[str, Any]:
+    """Genel politika + projenin executionConfig.retention override'ları."""
+    override = (execution_config or {}).get("retention") or {}
+    policy = dict(defaults)
+    if override.get("keepLast") is not None:
+        policy["keep_last"] = int(override["keepLast"])
+    if override.get("keepDays") is not None:
+        policy["keep_days"] = float(override["keepDays"])
+    return policy
+
+
+class _Rollups:
+    """Bir partinin günlük özetleri (bellekte), sonra tek bulk_write ile birleştirilir."""
+
+    def __init__(self):
+        self.days: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(self, doc):
+        key = (doc["projectId"], doc.get("scriptId"), (doc.get("startTime") or "")[:10])
+        r = self.days.get(key)
+        if r is None:
+            r = self.days[key] = {"inc": {}, "min": None, "max": None}
+        inc = r["inc"]
+        status = doc.get("status")
+        duration = float(doc.get("duration") or 0)
+        for field, value in (
+            ("count", 1),
+            ("succeeded", int(status == "success")),
+            ("failed", int(status == "error")),
+            ("limitExceeded", int(status == "limit_exceeded")),
+            ("resultCount", int(doc.get("resultCount") or 0)),
+            ("cpuTime", float(doc.get("cpuTime") or 0)),
+            (f"durationHistogram.{_bin(duration)}", 1),
+        ):
+            inc[field] = inc.get(field, 0) + value
+        r["min"] = duration if r["min"] is None else min(r["min"], duration)
+        r["max"] = duration if r["max"] is None else max(r["max"], duration)
+
+    def operations(self, expire_at):
+        ops = []
+        for (project_id, script_id, day), r in self.days.items():
+            update = {
+                "$inc": r["inc"],
+                "$min": {"minDuration": r["min"]},
+                "$max": {"maxDuration": r["max"]},
+                "$set": {"updatedAt": now_iso()},
+            }
+            if expire_at:
+                update["$set"]["expireAt"] = expire_at
+            ops.append(UpdateOne({"projectId": project_id, "scriptId": script_id, "day": day}, update, upsert=True))
+        return ops
+
+    def keys(self):
+        return [{"projectId": p, "scriptId": s, "day": d} for p, s, d in self.days]
+
+
+class RetentionTask:
+    def __init__(self, db, **cfg):
+        self.db = db
+        self.cfg = {**DEFAULTS, **{k: v for k, v in cfg.items() if v is not None}}
+        self._task = None
+        self._lock = asyncio.Lock()
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    # --- lifecycle ---
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+        logger.info("retention task started (every %ss)", self.cfg["interval"])
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        await asyncio.sleep(self.cfg["initial_delay"])
+        while True:
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("retention run failed")
+            await asyncio.sleep(self.cfg["interval"])
+
+    # --- compaction ---
+
+    async def run(self, project_id=None) -> Dict[str, Any]:
+        """Tüm projeleri (ya da birini) sıkıştırır; özet istatistik döner."""
+        async with self._lock:
+            started = datetime.utcnow()
+            stats = {"projects": 0, "scripts": 0, "compacted": 0, "rollups": 0, "blobsRemoved": 0}
+            query = {"projectId": project_id} if project_id else {}
+            async for project in self.db.projects.find(query, {"_id": 0, "projectId": 1, "executionConfig": 1}):
+                policy = project_policy(self.cfg, project.get("executionConfig"))
+                stats["projects"] += 1
+                for script_id in await self.db.executions.distinct("scriptId", {"projectId": project["projectId"]}):
+                    stats["scripts"] += 1
+                    compacted, rollups = await self.compact_script(project["projectId"], script_id, policy)
+                    stats["compacted"] += compacted
+                    stats["rollups"] += rollups
+            if stats["compacted"]:
+                stats["blobsRemoved"] = await collect_garbage(self.db)
+            stats["startedAt"] = started.isoformat()
+            stats["seconds"] = round((datetime.utcnow() - started).total_seconds(), 3)
+            self.last_run = stats
+            if stats["compacted"]:
+                logger.info("retention: compacted %d execution(s) into %d rollup update(s)",
+                            stats["compacted"], stats["rollups"])
+            return stats
+
+    async def compact_script(self, project_id, script_id, policy):
+        """Bir script'in saklama dışındaki execution'larını özetleyip siler."""
+        base = {"projectId": project_id, "scriptId": script_id}
+        order = [("startTime", -1), ("executionId", -1)]
+        boundary = await self.db.executions.find(base, {"_id": 0, "startTime": 1, "executionId": 1}) \
+            .sort(order).skip(max(int(policy["keep_last"]), 0)).limit(1).to_list(1)
+        if not boundary:
+            return 0, 0
+        b = boundary[0]
+        cutoff = (datetime.utcnow() - timedelta(days=policy["keep_days"])).isoformat()
+        query = {**base, "$and": [
+            {"$or": [
+                {"startTime": {"$lt": b["startTime"]}},
+                {"startTime": b["startTime"], "executionId": {"$lte": b["executionId"]}},
+            ]},
+            {"startTime": {"$lt": cutoff}},
+        ]}
+        chain_ids = await self._diff_chain_ids(base, query)
+        if chain_ids:
+            # kalan diff execution'larının kurulduğu kayıtlar silinmez
+            query["$and"].append({"executionId": {"$nin": sorted(chain_ids)}})
+        expire_at = None
+        if policy.get("rollup_days"):
+            expire_at = datetime.utcnow() + timedelta(days=policy["rollup_days"])
+        projection = {"_id": 0, "executionId": 1, "projectId": 1, "scriptId": 1, "startTime": 1,
+                      "status": 1, "duration": 1, "resultCount": 1, "cpuTime": 1}
+
+        compacted = rollups = 0
+        batch_size = int(policy["batch_size"])
+        while True:
+            docs = await self.db.executions.find(query, projection).sort(order).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            batch = _Rollups()
+            for doc in docs:
+                batch.add(doc)
+            await self.db.execution_rollups.bulk_write(batch.operations(expire_at), ordered=False)
+            await self._refresh_percentiles(batch.keys())
+            await self.db.executions.delete_many({"executionId": {"$in": [d["executionId"] for d in docs]}})
+            compacted += len(docs)
+            rollups += len(batch.days)
+            if len(docs) < batch_size:
+                break
+        return compacted, rollups
+
+    async def _diff_chain_ids(self, base, query):
+        """
+        Silinmeyecek diff execution'larının (resultMode="diff") baseExecutionId zincirindeki
+        execution'lar, tam kayda kadar. Çalıştırmalar üst üste binebildiği için zincir
+        startTime sırasını izlemez; baseExecutionId'ler tek tek takip edilir.
+        """
+        projection = {"_id": 0, "executionId": 1, "diff.baseExecutionId": 1}
+        kept = await self.db.executions.find(
+            {**base, "resultMode": "diff", "$nor": [{"$and": query["$and"]}]}, projection
+        ).to_list(length=None)
+        seen = {doc["executionId"] for doc in kept}
+        needed = set()
+        frontier = {(doc.get("diff") or {}).get("baseExecutionId") for doc in kept} - seen - {None}
+        while frontier:
+            needed |= frontier
+            parents = await self.db.executions.find(
+                {"executionId": {"$in": sorted(frontier)}, "resultMode": "diff"}, projection
+            ).to_list(length=None)
+            frontier = {(doc.get("diff") or {}).get("baseExecutionId") for doc in parents} - seen - needed - {None}
+        return needed
+
+    async def _refresh_percentiles(self, keys):
+        ops = []
+        async for r in self.db.execution_rollups.find({"$or": keys}):
+            p95 = histogram_percentile(r.get("durationHistogram") or {}, 95)
+            ops.append(UpdateOne({"_id": r["_id"]}, {"$set": {
+                "p95Duration": r.get("maxDuration") if p95 is None else min(p95, r.get("maxDuration") or p95),
+                "successRate": round(r["succeeded"] / r["count"], 4) if r.get("count") else None,
+            }}))
+        if ops:
+            await self.db.execution_rollups.bulk_write(ops, ordered=False)
+
+    def status(self):
+        return {"policy": self.cfg, "lastRun": self.last_run}
+
+
+async def list_rollups(db, project_id, script_id=None, days=90):
+    since = (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+    query = {"projectId": project_id, "day": {"$gte": since}}
+    if script_id:
+        query["scriptId"] = script_id
+    docs = await db.execution_rollups.find(query, {"_id": 0, "expireAt": 0}).sort("day", -1).to_list(length=None)
+    return docs
@@ -1,13 +1,25 @@
 # project/service.py
 
 from project.models import Project
-from project.utils import nanoid, drop_mongo_id, drop_mongo_ids, now_iso
+from project.utils import nanoid, drop_mongo_id, drop_mongo_ids, now_iso, encode_cursor, decode_cursor
 from typing import List
 
-from pw_simulator.pw_runner.runner import execute_python_code
+from pw_simulator.pw_runner.runner import execute_python_code, stream_python_code
+from pw_simulator.pw_runner.limits import resolve_limits
 from project.utils import nanoid, now_iso, drop_mongo_id
+import asyncio
 import json
+import math
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from project.blobstore import blob_threshold, get_blob_store
+from project.cache import CACHE
+from project.diff import diff_policy, prepare_result_state, record_result_state
 from project.models import Prompt
+from metrics import SCRIPT_LATENCY
+from tracing import TRACER
 
 # --- PROJECTS ---
 
@@ -24,18 +36,59 @@ async def create_project(db, data):
         updatedAt=now_iso(),
         prompts=prompts,
         executionConfig=data.get("executionConfig", {}),
+        tags=data.get("tags", []),
     )
     await db.projects.insert_one(project.dict())
     return drop_mongo_id(project.dict())
 
 
-async def list_projects(db) -> List[dict]:
-    docs = await db.projects.find({}).to_list(length=100)
-    return drop_mongo_ids(docs)
+# liste görünümlerinde gelmeyen büyük alanlar (full=True ile gelir)
+PROJECT_LIST_PROJECTION = {"_id": 0, "prompts": 0}
+EXECUTION_LIST_PROJECTION = {"_id": 0, "output": 0, "result": 0, "logs": 0}
+
+
+async def list_projects(db, tag=None, limit=100, cursor=None, full=False):
+    """
+    projectId'ye göre keyset sayfalama: {"projects": [...], "nextCursor": str | None}.
+    nextCursor bir sonraki sayfa için `cursor` olarak verilir.
+    """
+    query = {"tags": tag} if tag else {}
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query["projectId"] = {"$gt": last_id}
+    docs = await (
+        db.projects.find(query, None if full else PROJECT_LIST_PROJECTION)
+        .sort("projectId", 1)
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    next_cursor = encode_cursor([docs[limit - 1]["projectId"]]) if len(docs) > limit else None
+    return {"projects": drop_mongo_ids(docs[:limit]), "nextCursor": next_cursor}
+
+
+async def select_project_ids(db, project_ids=None, tags=None, all_active=False) -> List[str]:
+    """
+    Toplu çalıştırma için proje id'lerini seçer:
+    verilen id'ler + etiketlerden biri olan projeler + (all_active ise) tüm aktif projeler.
+    Sıra korunur, tekrarlar atılır.
+    """
+    ids = list(project_ids or [])
+    clauses = []
+    if tags:
+        clauses.append({"tags": {"$in": list(tags)}})
+    if all_active:
+        clauses.append({"projectStatus": "active"})
+    if clauses:
+        query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        async for doc in db.projects.find(query, {"_id": 0, "projectId": 1}).sort("projectId", 1):
+            ids.append(doc["projectId"])
+    return list(dict.fromkeys(ids))
 
 async def get_project(db, project_id):
-    doc = await db.projects.find_one({"projectId": project_id})
-    return drop_mongo_id(doc) if doc else None
+    async def load():
+        doc = await db.projects.find_one({"projectId": project_id})
+        return drop_mongo_id(doc) if doc else None
+    return await CACHE.get(("project", project_id), project_id, load)
 
 async def update_project(db, project_id, updates):
     updates["updatedAt"] = now_iso()
@@ -44,13 +97,17 @@ async def update_project(db, project_id, updates):
         {"$set": updates},
         return_document=True
     )
+    CACHE.invalidate(project_id)
     return drop_mongo_id(updated) if updated else None
 
 async def delete_project(db, project_id):
     # Tüm bağlı script ve execution’ları da sil
     await db.scripts.delete_many({"projectId": project_id})
     await db.executions.delete_many({"projectId": project_id})
+    await db.script_counters.delete_one({"_id": project_id})
+    await db.result_states.delete_many({"projectId": project_id})
     result = await db.projects.delete_one({"projectId": project_id})
+    CACHE.invalidate(project_id)
     return result.deleted_count > 0
 
 # --- PROMPTS ---
@@ -67,44 +124,79 @@ async def update_prompts(db, project_id, prompts):
         {"$set": {"prompts": validated_prompts, "updatedAt": now_iso()}},
         return_document=True
     )
+    CACHE.invalidate(project_id)
     return drop_mongo_id(updated) if updated else None
 
 async def get_prompts(db, project_id):
-    doc = await db.projects.find_one({"projectId": project_id}, {"_id": 0, "prompts": 1})
-    return doc.get("prompts", []) if doc else []
+    async def load():
+        doc = await db.projects.find_one({"projectId": project_id}, {"_id": 0, "prompts": 1})
+        return doc.get("prompts", []) if doc else []
+    return await CACHE.get(("prompts", project_id), project_id, load)
 
 # --- SCRIPTS ---
 
+SAVE_SCRIPT_ATTEMPTS = 5
+
 async def find_script(db, project_id, script_version=None):
-    if script_version is not None:
-        script = await db.scripts.find_one({
-            "projectId": project_id,
-            "version": int(script_version)
-        })
-        return drop_mongo_id(script) if script else None
-    scripts = await db.scripts.find({"projectId": project_id}).sort("version", -1).to_list(1)
-    return drop_mongo_id(scripts[0]) if scripts else None
+    version = int(script_version) if script_version is not None else None
+
+    async def load():
+        if version is not None:
+            script = await db.scripts.find_one({"projectId": project_id, "version": version})
+            return drop_mongo_id(script) if script else None
+        scripts = await db.scripts.find({"projectId": project_id}).sort("version", -1).to_list(1)
+        return drop_mongo_id(scripts[0]) if scripts else None
+    return await CACHE.get(("script", project_id, version), project_id, load)
+
+async def next_script_version(db, project_id):
+    """
+    Projenin bir sonraki script versiyonu: script_counters'ta atomik $inc (tek round trip).
+    Sayaç ilk kez oluşuyorsa (sayaçtan önce kaydedilmiş script'ler) en büyük mevcut versiyondan devam eder.
+    """
+    counter = await db.script_counters.find_one_and_update(
+        {"_id": project_id}, {"$inc": {"seq": 1}}, upsert=True, return_document=True
+    )
+    if counter["seq"] == 1 and await _sync_script_counter(db, project_id):
+        counter = await db.script_counters.find_one_and_update(
+            {"_id": project_id}, {"$inc": {"seq": 1}}, return_document=True
+        )
+    return counter["seq"]
+
+async def _sync_script_counter(db, project_id):
+    """Sayacı mevcut en büyük versiyona çeker; mevcut script varsa True."""
+    latest = await db.scripts.find({"projectId": project_id}, {"version": 1}).sort("version", -1).to_list(1)
+    if not latest:
+        return False
+    await db.script_counters.update_one({"_id": project_id}, {"$max": {"seq": latest[0]["version"]}}, upsert=True)
+    return True
 
 async def save_script(db, project_id, code, created_by="unknown", generated_by_llm=False, notes=""):
-    latest = await db.scripts.find({"projectId": project_id}).sort("version", -1).to_list(1)
-    version = (latest[0]["version"] if latest else 0) + 1
-    script_id = nanoid(14)
-    script = {
-        "scriptId": script_id,
-        "projectId": project_id,
-        "version": version,
-        "code": code,
-        "createdAt": now_iso(),
-        "createdBy": created_by,
-        "generatedByLLM": generated_by_llm,
-        "notes": notes
-    }
-    await db.scripts.insert_one(script)
-    return drop_mongo_id(script)
+    # (projectId, version) unique index'i sayaç geride kalırsa (eski veri / yarış) çakışmayı yakalar
+    for _ in range(SAVE_SCRIPT_ATTEMPTS):
+        script = {
+            "scriptId": nanoid(14),
+            "projectId": project_id,
+            "version": await next_script_version(db, project_id),
+            "code": code,
+            "createdAt": now_iso(),
+            "createdBy": created_by,
+            "generatedByLLM": generated_by_llm,
+            "notes": notes
+        }
+        try:
+            await db.scripts.insert_one(script)
+        except DuplicateKeyError:
+            await _sync_script_counter(db, project_id)
+            continue
+        CACHE.invalidate(project_id)
+        return drop_mongo_id(script)
+    raise RuntimeError(f"Could not allocate a script version for project {project_id}")
 
 async def delete_script(db, script_id):
-    result = await db.scripts.delete_one({"scriptId": script_id})
-    return result.deleted_count > 0
+    deleted = await db.scripts.find_one_and_delete({"scriptId": script_id}, {"projectId": 1})
+    if deleted:
+        CACHE.invalidate(deleted["projectId"])
+    return deleted is not None
 
 async def update_script(db, script_id, code=None, notes=None):
     update_fields = {}
@@ -120,6 +212,8 @@ async def update_script(db, script_id, code=None, notes=None):
         {"$set": update_fields},
         return_document=True
     )
+    if updated:
+        CACHE.invalidate(updated["projectId"])
     return drop_mongo_id(updated) if updated else None
 
 async def list_scripts(db, project_id, limit=100):
@@ -153,36 +247,99 @@ async def save_execution(db, project_id, data):
     await db.executions.insert_one(execution)
     return drop_mongo_id(execution)
 
-async def list_executions(db, project_id, page=1, page_size=20, script_id=None, status=None):
+COUNT_CACHE_TTL = 30.0
+_count_cache = {}
+
+
+async def _count(db, collection, query, mode):
+    """
+    mode: "exact" her seferinde count_documents, "cached" COUNT_CACHE_TTL saniye
+    süreç içi önbellek, "none" sayım yok (None).
+    """
+    if mode == "none":
+        return None
+    key = (collection, json.dumps(query, sort_keys=True, default=str))
+    hit = _count_cache.get(key)
+    if mode == "cached" and hit and time.monotonic() - hit[0] < COUNT_CACHE_TTL:
+        return hit[1]
+    total = await db[collection].count_documents(query)
+    if len(_count_cache) > 1000:
+        _count_cache.clear()
+    _count_cache[key] = (time.monotonic(), total)
+    return total
+
+
+async def list_executions(db, project_id, page=1, page_size=20, script_id=None, status=None,
+                          cursor=None, full=False, total="cached"):
+    """
+    (startTime, executionId) üzerinde keyset sayfalama; derin sayfalar da sabit maliyetli.
+    cursor verilmezse eski page/skip davranışı (ilk sayfa için aynı).
+    Dönüş: {"executions", "total", "nextCursor"}; total: exact | cached | none.
+    """
     query = {"projectId": project_id}
     if script_id:
         query["scriptId"] = script_id
     if status:
         query["status"] = status
-    total = await db.executions.count_documents(query)
-    executions = (
-        await db.executions
-        .find(query)
-        .sort("startTime", -1)
-        .skip((page - 1) * page_size)
-        .limit(page_size)
-        .to_list(length=page_size)
+    count = await _count(db, "executions", query, total)
+
+    find = dict(query)
+    skip = 0
+    if cursor:
+        start_time, execution_id = decode_cursor(cursor, 2)
+        find["$or"] = [
+            {"startTime": {"$lt": start_time}},
+            {"startTime": start_time, "executionId": {"$lt": execution_id}},
+        ]
+    else:
+        skip = (page - 1) * page_size
+    executions = await (
+        db.executions
+        .find(find, None if full else EXECUTION_LIST_PROJECTION)
+        .sort([("startTime", -1), ("executionId", -1)])
+        .skip(skip)
+        .limit(page_size + 1)
+        .to_list(length=page_size + 1)
     )
-    return executions, total
+    next_cursor = None
+    if len(executions) > page_size:
+        last = executions[page_size - 1]
+        next_cursor = encode_cursor([last["startTime"], last["executionId"]])
+    return {"executions": drop_mongo_ids(executions[:page_size]), "total": count, "nextCursor": next_cursor}
 
 
 # --- CURRENT PROJECT STATE (Context) ---
 
 async def set_current_project(request, db, project_id):
-    project = await db.projects.find_one({"projectId": project_id})
+    project = await get_project(db, project_id)
     if not project:
         return None
-    request.app.state.current_project = project
-    return {"ok": True, "current_project": drop_mongo_id(project)}
+    _store_current_project(request.app, project)
+    return {"ok": True, "current_project": project}
 
-def get_current_project_by_state(request):
-    project = getattr(request.app.state, "current_project", None)
-    return drop_mongo_id(project) if project else None
+def _store_current_project(app, project):
+    app.state.current_project = project
+    # versiyon damgası + zaman: invalidate ya da TTL sonrası kopya yenilenir
+    app.state.current_project_stamp = (CACHE.version(project["projectId"]), time.monotonic())
+
+async def get_current_project(request, db):
+    """
+    Seçili proje; app.state'teki kopya bayatsa (proje güncellendi/silindi ya da
+    TTL doldu) cache üzerinden yenilenir. Silinmişse seçim kaldırılır.
+    """
+    app = request.app
+    project = getattr(app.state, "current_project", None)
+    if not project:
+        return None
+    version, stored_at = getattr(app.state, "current_project_stamp", (None, 0.0))
+    if version == CACHE.version(project["projectId"]) and time.monotonic() - stored_at < CACHE.ttl:
+        return drop_mongo_id(project)
+    fresh = await get_project(db, project["projectId"])
+    if not fresh:
+        app.state.current_project = None
+        return None
+    _store_current_project(app, fresh)
+    return fresh
 
 
 async def find_script_by_id(db, script_id):
@@ -190,9 +347,9 @@ async def find_script_by_id(db, script_id):
     return drop_mongo_id(script) if script else None
 
 
-async def run_script_for_project(db, project_id, script_id=None, script_version=None, max_count=3):
+async def resolve_script(db, project_id, script_id=None, script_version=None):
     """
-    Belirtilen project_id için bir script çalıştırır.
+    Belirtilen project_id için çalıştırılacak script'i bulur.
     - script_id ve script_version ikisi verilirse: o script'in ilgili versiyonunu bulur.
     - Sadece script_id verilirse: o script_id'nin en yeni (büyük) versiyonunu bulur.
     - Sadece script_version verilirse: o versiyonu bulur.
@@ -229,37 +386,332 @@ async def run_script_for_project(db, project_id, script_id=None, script_version=
 
     if not script:
         raise ValueError(f"Script not found (project_id={project_id}, script_id={script_id}, script_version={script_version})")
+    return script
 
-    # Scripti çalıştır
-    result = await execute_python_code(
-        script["code"],
-        no_prints=False,
-        max_count=max_count
-    )
-    output_json = result.get("result")
-    logs = result.get("logs", "")
-    error = ""
-    if output_json and isinstance(output_json, dict):
+
+# executionConfig (camelCase, Mongo) → pw_runner limits
+EXECUTION_LIMIT_KEYS = {
+    "timeoutSec": "timeout",
+    "memoryMb": "memory_mb",
+    "cpuSec": "cpu_seconds",
+    "maxStdoutBytes": "max_stdout_bytes",
+    "maxPages": "max_pages",
+    "isolation": "isolation",
+}
+
+
+def execution_limits(execution_config):
+    """
+    Projenin executionConfig'inden çalıştırma limitlerini üretir:
+    {"profile": "strict", "timeoutSec": 30, ...} → profil + override'lar.
+    """
+    cfg = execution_config or {}
+    return resolve_limits(cfg.get("profile"), **{v: cfg.get(k) for k, v in EXECUTION_LIMIT_KEYS.items()})
+
+
+async def project_limits(db, project_id):
+    project = await get_project(db, project_id)
+    return execution_limits((project or {}).get("executionConfig"))
+
+
+OUTPUT_PREVIEW_ITEMS = 5
+
+
+def _output_preview(output_json):
+    """Blob'a taşınan çıktının dokümanda kalan özeti: ilk birkaç kayıt."""
+    if not isinstance(output_json, dict):
+        return {}
+    data = output_json.get("data")
+    preview = {"data": data[:OUTPUT_PREVIEW_ITEMS]} if isinstance(data, list) else {}
+    for key in ("added", "changed", "removed"):
+        # diff modundaki çıktı (project/diff.py)
+        if isinstance(output_json.get(key), list):
+            preview[key] = output_json[key][:OUTPUT_PREVIEW_ITEMS]
+    if output_json.get("error"):
+        preview["error"] = output_json["error"]
+    return preview
+
+
+async def get_execution(db, execution_id):
+    doc = await db.executions.find_one({"executionId": execution_id})
+    return drop_mongo_id(doc) if doc else None
+
+
+async def load_execution_output(db, execution):
+    """Execution'ın tam çıktısı (JSON), blob deposunda olsa bile; yoksa None."""
+    ref = execution.get("outputRef")
+    if ref:
+        raw = await get_blob_store(db, ref["store"]).read(ref)
+        return json.loads(raw)
+    if execution.get("output"):
+        return json.loads(execution["output"])
+    return execution.get("result") or None
+
+
+def _iso_after(start_iso, seconds):
+    return (datetime.fromisoformat(start_iso) + timedelta(seconds=seconds)).isoformat()
+
+
+async def _record_execution(db, project_id, script, result, started_at, elapsed, streamed=None, offloaded=None):
+    """
+    Runner sonucunu executions'a yazar.
+    started_at: başlangıç (now_iso), elapsed: monotonic süre (s);
+    cpuTime / maxRssKb / outputBytes çocuğun wait4 rusage'ından (result["usage"]).
+    offloaded: blob deposuna doğrudan akıtılmış çıktı {"outputRef", "result"} (bkz. _StreamSpool).
+    """
+    output_json = result.get("output")
+    logs = result.get("prints") or result.get("logs") or ""
+    usage = result.get("usage") or {}
+    error = result.get("exception") or ""
+    if not error and isinstance(output_json, dict):
         error = output_json.get("error", "")
     if not error and logs and "traceback" in logs.lower():
         error = logs
+    violation = result.get("limit_violation")
+    if violation:
+        error = result.get("error", violation)
+    status = "limit_exceeded" if violation else ("error" if error else "success")
+    SCRIPT_LATENCY.labels(status).observe(elapsed)
 
+    result_count = len(output_json["data"]) if isinstance(output_json, dict) and isinstance(output_json.get("data"), list) else 0
     execution_id = nanoid(14)
-    now = now_iso()
+    diff_summary, result_mode, state_update = None, None, None
+    if status == "success" and not (streamed or {}).get("stopped_early") and not offloaded:
+        policy = diff_policy(((await get_project(db, project_id)) or {}).get("executionConfig"))
+        if policy:
+            # değişmeyen kayıtlar tekrar saklanmaz; sadece önceki çalıştırmaya göre fark
+            output_json, diff_summary, result_mode, state_update = await prepare_result_state(
+                db, project_id, script["scriptId"], execution_id, output_json, policy)
+
+    output_text = json.dumps(output_json, ensure_ascii=False) if output_json else ""
+    result_doc = output_json if isinstance(output_json, dict) else {}
+    output_ref = None
+    output_bytes = output_text.encode("utf-8")
+    if offloaded:
+        output_ref, output_text, result_doc = offloaded["outputRef"], "", offloaded["result"]
+    elif len(output_bytes) > blob_threshold():
+        # büyük çıktı dokümana değil blob deposuna; dokümanda önizleme + outputRef
+        output_ref = await get_blob_store(db).put(output_bytes)
+        output_text = ""
+        result_doc = _output_preview(output_json)
+
     execution = {
         "executionId": execution_id,
         "projectId": project_id,
         "scriptId": script["scriptId"],
         "scriptVersion": script["version"],
-        "status": "error" if error else "success",
-        "startTime": now,
-        "endTime": now,
-        "duration": 1,
-        "resultCount": len(output_json.get("data", [])) if output_json and isinstance(output_json, dict) and "data" in output_json else 0,
-        "output": json.dumps(output_json, ensure_ascii=False) if output_json else "",
-        "logs": logs if logs else "",
+        "status": status,
+        "limitViolation": violation,
+        "startTime": started_at,
+        "endTime": _iso_after(started_at, elapsed),
+        "duration": round(elapsed, 4),
+        "cpuTime": usage.get("cpu_seconds"),
+        "maxRssKb": usage.get("max_rss_kb"),
+        "outputBytes": usage.get("output_bytes"),
+        "resultCount": result_count,
+        "output": output_text,
+        "outputRef": output_ref,
+        "logs": logs,
         "errorMessage": error or "",
-        "result": output_json if isinstance(output_json, dict) else {},
+        "result": result_doc,
     }
+    if result_mode:
+        execution["resultMode"] = result_mode
+        execution["diff"] = diff_summary
+    if streamed is not None:
+        # emit() ile akıtılan kayıtlar
+        execution["resultCount"] = streamed["count"]
+        execution["stoppedEarly"] = streamed["stopped_early"]
     await db.executions.insert_one(execution)
+    if state_update:
+        # execution yazıldıktan sonra: durum hiçbir zaman olmayan bir execution'ı göstermesin
+        await record_result_state(db, state_update)
     return drop_mongo_id(execution)
+
+
+def _percentile(sorted_values, q):
+    """Nearest-rank yüzdelik (değerler sıralı olmalı)."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+async def execution_stats(db, project_id=None, hours=24, limit=100):
+    """
+    Son `hours` saatteki execution'ların script bazında özeti:
+    sayı, başarı oranı, p50/p95/max süre, ortalama CPU, en yüksek RSS.
+    p95'e göre azalan sıralı döner (en yavaş scraper'lar önce).
+    """
+    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+    match = {"startTime": {"$gte": since}}
+    if project_id:
+        match["projectId"] = project_id
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$scriptId",
+            "projectId": {"$first": "$projectId"},
+            "scriptVersion": {"$max": "$scriptVersion"},
+            "count": {"$sum": 1},
+            "succeeded": {"$sum": {"$cond": [{"$eq": ["$status", "success"]}, 1, 0]}},
+            "limitExceeded": {"$sum": {"$cond": [{"$eq": ["$status", "limit_exceeded"]}, 1, 0]}},
+            "durations": {"$push": "$duration"},
+            "avgCpuTime": {"$avg": "$cpuTime"},
+            "maxRssKb": {"$max": "$maxRssKb"},
+            "avgOutputBytes": {"$avg": "$outputBytes"},
+            "lastRun": {"$max": "$startTime"},
+        }},
+    ]
+    stats = []
+    async for row in db.executions.aggregate(pipeline):
+        durations = sorted(d for d in row.pop("durations") if d is not None)
+        row["scriptId"] = row.pop("_id")
+        row["successRate"] = round(row["succeeded"] / row["count"], 4) if row["count"] else None
+        row["p50Duration"] = _percentile(durations, 50)
+        row["p95Duration"] = _percentile(durations, 95)
+        row["maxDuration"] = durations[-1] if durations else None
+        stats.append(row)
+    stats.sort(key=lambda r: r["p95Duration"] or 0, reverse=True)
+    return {"since": since, "hours": hours, "scripts": stats[:limit]}
+
+
+async def run_script_for_project(db, project_id, script_id=None, script_version=None, max_count=3):
+    """
+    Belirtilen project_id için bir script çalıştırır (script seçimi: resolve_script).
+    """
+    script = await resolve_script(db, project_id, script_id, script_version)
+    limits = await project_limits(db, project_id)
+
+    # Scripti çalıştır
+    started_at = now_iso()
+    started = time.perf_counter()
+    with TRACER.span("script.execute", project_id=project_id, script_id=script["scriptId"],
+                     script_version=script["version"]) as span:
+        result = await execute_python_code(
+            script["code"],
+            no_prints=False,
+            max_count=max_count,
+            traceparent=span.traceparent(),
+            browser_profile=project_id,
+            limits=limits,
+        )
+    elapsed = time.perf_counter() - started
+    return await _record_execution(db, project_id, script, result, started_at, elapsed)
+
+
+STREAM_SPOOL_BATCH = 256 * 1024
+
+
+class _StreamSpool:
+    """
+    emit() edilen kayıtlar bellekte toplanmaz: STREAM_SPOOL_BATCH'lik partiler halinde
+    geçici dosyaya yazılır (JSON dizisinin gövdesi), bellekte sadece sayı ve önizleme kalır.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+        self.count = 0
+        self.preview = []
+        self._batch = []
+        self._batch_size = 0
+
+    async def add(self, item):
+        raw = json.dumps(item, ensure_ascii=False, default=str).encode("utf-8")
+        self._batch.append(raw if not self.count else b"," + raw)
+        self._batch_size += len(self._batch[-1])
+        self.size += len(self._batch[-1])
+        self.count += 1
+        if len(self.preview) < OUTPUT_PREVIEW_ITEMS:
+            self.preview.append(item)
+        if self._batch_size >= STREAM_SPOOL_BATCH:
+            await self.flush()
+
+    async def flush(self):
+        if self._batch:
+            batch, self._batch, self._batch_size = b"".join(self._batch), [], 0
+            await asyncio.to_thread(self.file.write, batch)
+
+    async def items(self):
+        """Eşiğin altındaki (küçük) akışlar için: tüm kayıtlar."""
+        await self.flush()
+        self.file.seek(0)
+        return json.loads(b"[" + await asyncio.to_thread(self.file.read) + b"]")
+
+    async def chunks(self, output):
+        """OUTPUT'un geri kalanı + kayıtlar ("data" başta, OUTPUT["data"] sonda) JSON olarak, parça parça."""
+        await self.flush()
+        rest = {k: v for k, v in output.items() if k != "data"}
+        existing = output.get("data") if isinstance(output.get("data"), list) else []
+        yield b'{"data": ['
+        self.file.seek(0)
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, STREAM_SPOOL_BATCH)
+            if not chunk:
+                break
+            yield chunk
+        if existing:
+            yield (b"," if self.count else b"") + json.dumps(existing, ensure_ascii=False)[1:-1].encode("utf-8")
+        yield b"]"
+        if rest:
+            yield b", " + json.dumps(rest, ensure_ascii=False)[1:-1].encode("utf-8")
+        yield b"}"
+
+    def close(self):
+        self.file.close()
+
+
+async def _streamed_output(db, result, spool):
+    """
+    Akıtılan kayıtları çıktıya katar. Küçükse output["data"]'ya (diff / normal yol),
+    büyükse doğrudan blob deposuna; dönüş: _record_execution'ın offloaded argümanı ya da None.
+    """
+    output = result.get("output") if isinstance(result.get("output"), dict) else {}
+    if spool.size + len(json.dumps(output, ensure_ascii=False)) <= blob_threshold():
+        existing = output.get("data") if isinstance(output.get("data"), list) else []
+        result["output"] = {**output, "data": await spool.items() + existing}
+        return None
+    ref = await get_blob_store(db).put_stream(spool.chunks(output))
+    result["output"] = {k: v for k, v in output.items() if k != "data"}
+    preview = _output_preview({**output, "data": spool.preview})
+    return {"outputRef": ref, "result": preview}
+
+
+async def stream_script_for_project(db, project_id, script_id=None, script_version=None, max_count=3):
+    """
+    run_script_for_project'in akış hali: script emit() ettikçe
+    {"event": "item", ...} üretir, en sonda {"event": "execution", "execution": {...}}.
+    """
+    script = await resolve_script(db, project_id, script_id, script_version)
+    limits = await project_limits(db, project_id)
+
+    started_at = now_iso()
+    started = time.perf_counter()
+    final = {"count": 0, "stopped_early": False}
+    spool = _StreamSpool()
+    try:
+        with TRACER.span("script.execute", project_id=project_id, script_id=script["scriptId"],
+                         script_version=script["version"], streaming=True) as span:
+            async for event in stream_python_code(
+                script["code"],
+                no_prints=False,
+                max_count=max_count,
+                traceparent=span.traceparent(),
+                browser_profile=project_id,
+                limits=limits,
+            ):
+                if event["event"] == "item":
+                    await spool.add(event["data"])
+                    yield event
+                else:
+                    final = event
+        elapsed = time.perf_counter() - started
+        result = {k: v for k, v in final.items() if k not in ("event", "count", "stopped_early")}
+        # emit() edilen kayıtlar OUTPUT'a girmez; blob / diff yolları görsün diye çıktıya katılır
+        offloaded = await _streamed_output(db, result, spool) if spool.count else None
+    finally:
+        spool.close()
+    execution = await _record_execution(db, project_id, script, result, started_at, elapsed,
+                                        streamed=final, offloaded=offloaded)
+    yield {"event": "execution", "execution": execution}
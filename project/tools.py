@@ -1,6 +1,5 @@
 from tool_local_client import ToolLocalClient
-from datetime import datetime
-from project.utils import nanoid
+from project.service import save_script
 import asyncio
 from bson import ObjectId
 
@@ -30,19 +29,7 @@ def register_all_tools(app, projectId: str = None):
                 raise Exception("No current project selected and no projectId given")
             effective_project_id = current_project["projectId"]
         
-        latest = await db.scripts.find({"projectId": effective_project_id}).sort("version", -1).to_list(1)
-        version = (latest[0]["version"] if latest else 0) + 1
-        script_id = nanoid(14)
-        now = datetime.utcnow().isoformat()
-        script = {
-            "scriptId": script_id,
-            "projectId": effective_project_id,
-            "version": version,
-            "code": code,
-            "createdAt": now,
-        }
-        result = await db.scripts.insert_one(script)
-        script["_id"] = str(result.inserted_id)
+        script = await save_script(db, effective_project_id, code, created_by="llm", generated_by_llm=True)
         return serialize_mongo(script)  # Hatasız döner!
 
     tool_client.register_tool_auto(save_script_tool, description="Saves a script to the current project.")
@@ -0,0 +1,313 @@
+# project/transfer.py
+"""
+Projelerin (script ve execution'larıyla) toplu dışa / içe aktarımı.
+
+Biçim: NDJSON (istenirse gzip), satır başına bir kayıt:
+
+    {"kind": "header", "format": "xray-export", "version": 1, "exportedAt": ...}
+    {"kind": "project",   "data": {...}}      ← önce tüm projeler
+    {"kind": "script",    "data": {...}}      ← sonra script'ler
+    {"kind": "execution", "data": {...}}      ← en son execution'lar
+
+Blob deposundaki çıktılar dışa aktarımda `output` içine açılır (hedef ortamın
+deposunda yoktur); içe aktarımda eşikten büyükse yine blob deposuna konur.
+
+İçe aktarım bulk_write(ordered=False) ile yapılır:
+    upsert  projectId / scriptId / executionId üzerinden ReplaceOne(upsert) – idempotent
+    insert  insert_many; zaten olan kayıtlar (unique index → duplicate key) atlanır – en hızlısı
+
+CLI:
+    python -m project.transfer export -o projects.ndjson.gz [--project P1 ...] [--tag t] [--no-executions]
+    python -m project.transfer import projects.ndjson.gz [--mode insert]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from project.blobstore import blob_threshold, get_blob_store
+from project.cache import CACHE
+from project.indexes import ensure_indexes
+from project.utils import now_iso
+
+FORMAT = "xray-export"
+FORMAT_VERSION = 1
+
+# kind → (koleksiyon, anahtar alan)
+KINDS = {
+    "project": ("projects", "projectId"),
+    "script": ("scripts", "scriptId"),
+    "execution": ("executions", "executionId"),
+}
+BATCH_SIZE = 1000
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+# --- export ---
+
+async def _project_ids(db, project_ids=None, tags=None) -> Optional[List[str]]:
+    """Seçim yoksa None (hepsi)."""
+    if not project_ids and not tags:
+        return None
+    ids = list(project_ids or [])
+    if tags:
+        async for doc in db.projects.find({"tags": {"$in": list(tags)}}, {"_id": 0, "projectId": 1}):
+            ids.append(doc["projectId"])
+    return list(dict.fromkeys(ids))
+
+
+async def export_records(db, project_ids=None, tags=None, executions=True, outputs=True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Dışa aktarılacak kayıtlar (header dahil).
+    outputs=False: execution'lar output/result/logs olmadan (çok daha küçük).
+    """
+    ids = await _project_ids(db, project_ids, tags)
+    query = {} if ids is None else {"projectId": {"$in": ids}}
+    yield {"kind": "header", "format": FORMAT, "version": FORMAT_VERSION, "exportedAt": now_iso()}
+
+    async for doc in db.projects.find(query, {"_id": 0}).sort("projectId", 1).batch_size(BATCH_SIZE):
+        yield {"kind": "project", "data": doc}
+    async for doc in db.scripts.find(query, {"_id": 0}).sort([("projectId", 1), ("version", 1)]).batch_size(BATCH_SIZE):
+        yield {"kind": "script", "data": doc}
+    if not executions:
+        return
+    projection = {"_id": 0} if outputs else {"_id": 0, "output": 0, "result": 0, "logs": 0, "outputRef": 0}
+    async for doc in db.executions.find(query, projection).batch_size(BATCH_SIZE):
+        ref = doc.pop("outputRef", None)
+        if ref and outputs:
+            raw = await get_blob_store(db, ref["store"]).read(ref)
+            doc["output"] = raw.decode("utf-8")
+        yield {"kind": "execution", "data": doc}
+
+
+async def export_ndjson(db, compress=False, **kwargs) -> AsyncIterator[bytes]:
+    """export_records'u NDJSON bayt parçaları olarak akıtır (compress=True: gzip)."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf: List[bytes] = []
+    size = 0
+    async for record in export_records(db, **kwargs):
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        buf.append(line)
+        size += len(line)
+        if size >= 256 * 1024:
+            chunk = b"".join(buf)
+            buf, size = [], 0
+            chunk = gz.compress(chunk) if gz else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(buf)
+    if gz:
+        chunk = gz.compress(chunk) + gz.flush()
+    if chunk:
+        yield chunk
+
+
+# --- import ---
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    """Bayt parçalarından kayıtlar; gzip ise (1f 8b) açarak."""
+    gz = None
+    first = True
+    pending = b""
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                gz = zlib.decompressobj(wbits=31)
+        if gz:
+            chunk = gz.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if gz:
+        pending += gz.flush()
+    for line in pending.split(b"\n"):
+        if line.strip():
+            yield json.loads(line)
+
+
+class _Importer:
+    def __init__(self, db, mode="upsert", batch_size=BATCH_SIZE):
+        if mode not in ("upsert", "insert"):
+            raise ValueError(f"Unknown import mode: {mode}")
+        self.db = db
+        self.mode = mode
+        self.batch_size = batch_size
+        self.buffers: Dict[str, List[dict]] = {kind: [] for kind in KINDS}
+        self.stats = {kind: {"read": 0, "written": 0, "skipped": 0} for kind in KINDS}
+        self.max_versions: Dict[str, int] = {}
+        self.projects = set()
+
+    async def add(self, record):
+        kind = record.get("kind")
+        if kind == "header":
+            if record.get("format") != FORMAT:
+                raise ValueError("Not an xray export")
+            return
+        if kind not in KINDS:
+            raise ValueError(f"Unknown record kind: {kind}")
+        doc = record["data"]
+        key = KINDS[kind][1]
+        if not doc.get(key):
+            raise ValueError(f"{kind} record without {key}")
+        doc.pop("_id", None)
+        self.stats[kind]["read"] += 1
+        self.projects.add(doc.get("projectId"))
+        if kind == "script":
+            pid = doc["projectId"]
+            self.max_versions[pid] = max(self.max_versions.get(pid, 0), int(doc.get("version", 0)))
+        elif kind == "execution":
+            await self._offload(doc)
+        self.buffers[kind].append(doc)
+        if len(self.buffers[kind]) >= self.batch_size:
+            await self.flush(kind)
+
+    async def _offload(self, doc):
+        output = doc.get("output")
+        if isinstance(output, str):
+            raw = output.encode("utf-8")
+            if len(raw) > blob_threshold():
+                doc["outputRef"] = await get_blob_store(self.db).put(raw)
+                doc["output"] = ""
+
+    async def flush(self, kind):
+        docs, self.buffers[kind] = self.buffers[kind], []
+        if not docs:
+            return
+        coll_name, key = KINDS[kind]
+        coll = self.db[coll_name]
+        stats = self.stats[kind]
+        if self.mode == "insert":
+            try:
+                result = await coll.insert_many(docs, ordered=False)
+                stats["written"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                details = e.details
+                other = [w for w in details.get("writeErrors", []) if w.get("code") != 11000]
+                if other:
+                    raise
+                stats["written"] += details.get("nInserted", 0)
+                stats["skipped"] += len(details.get("writeErrors", []))
+            return
+        result = await coll.bulk_write([ReplaceOne({key: d[key]}, d, upsert=True) for d in docs], ordered=False)
+        stats["written"] += result.upserted_count + result.modified_count
+        stats["skipped"] += len(docs) - result.upserted_count - result.modified_count
+
+    async def finish(self):
+        for kind in KINDS:
+            await self.flush(kind)
+        if self.max_versions:
+            # save_script'in sayacı içe aktarılan en büyük versiyondan devam etsin
+            await self.db.script_counters.bulk_write(
+                [UpdateOne({"_id": pid}, {"$max": {"seq": v}}, upsert=True) for pid, v in self.max_versions.items()],
+                ordered=False,
+            )
+        for pid in self.projects:
+            if pid:
+                CACHE.invalidate(pid)
+
+
+async def import_records(db, records, mode="upsert", batch_size=BATCH_SIZE) -> Dict[str, Any]:
+    """
+    records: kayıtların (async) iterable'ı. Dönüş: tür başına read/written/skipped
+    ve süre + kayıt/s (skipped: upsert'te zaten aynı olan, insert'te zaten var olan).
+    """
+    importer = _Importer(db, mode, batch_size)
+    if mode == "insert":
+        # tekrarları unique index'ler ayıklar
+        await ensure_indexes(db)
+    started = time.perf_counter()
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            await importer.add(record)
+    else:
+        for record in records:
+            await importer.add(record)
+    await importer.finish()
+    elapsed = time.perf_counter() - started
+    total = sum(s["read"] for s in importer.stats.values())
+    return {
+        **importer.stats,
+        "mode": mode,
+        "records": total,
+        "seconds": round(elapsed, 3),
+        "recordsPerSec": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+# --- CLI ---
+
+async def _file_chunks(path, size=256 * 1024) -> AsyncIterator[bytes]:
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+async def _cli(args):
+    from project.db import get_db
+    from project.blobstore import configure_blob_store
+    from xray_config import load_xray_config, get_db_config
+
+    cfg = load_xray_config()
+    configure_blob_store(cfg.get("blob_store"))
+    mongo_uri, db_name = get_db_config(cfg)
+    db = get_db(mongo_uri, db_name)
+    started = time.perf_counter()
+    try:
+        if args.command == "export":
+            compress = args.gzip or args.output.endswith(".gz")
+            out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+            written = 0
+            try:
+                async for chunk in export_ndjson(db, compress=compress, project_ids=args.project, tags=args.tag,
+                                                 executions=not args.no_executions, outputs=not args.no_outputs):
+                    await asyncio.to_thread(out.write, chunk)
+                    written += len(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+            elapsed = time.perf_counter() - started
+            print(f"[export] {written / 1e6:.1f} MB in {elapsed:.1f} s ({written / 1e6 / max(elapsed, 1e-9):.1f} MB/s)",
+                  file=sys.stderr)
+        else:
+            stats = await import_records(db, iter_ndjson(_file_chunks(args.input)), mode=args.mode,
+                                         batch_size=args.batch_size)
+            print(json.dumps(stats, indent=2), file=sys.stderr)
+    finally:
+        db.client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk export/import of xray projects (NDJSON, optionally gzip)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write projects, scripts and executions as NDJSON")
+    exp.add_argument("-o", "--output", default="-", help="file (.gz compresses) or - for stdout")
+    exp.add_argument("--project", "-p", action="append", default=[], help="project id (repeatable, default: all)")
+    exp.add_argument("--tag", "-t", action="append", default=[], help="projects with this tag (repeatable)")
+    exp.add_argument("--no-executions", action="store_true")
+    exp.add_argument("--no-outputs", action="store_true", help="executions without output/result/logs")
+    exp.add_argument("--gzip", action="store_true", help="gzip even when writing to stdout")
+    imp = sub.add_parser("import", help="read an export (plain or gzip NDJSON)")
+    imp.add_argument("input", help="file or - for stdin")
+    imp.add_argument("--mode", choices=["upsert", "insert"], default="upsert")
+    imp.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    asyncio.run(_cli(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
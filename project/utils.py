@@ -2,6 +2,8 @@
 from nanoid import generate
 from datetime import datetime
 from bson import ObjectId
+import base64
+import json
 
 ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
 NANOID_SIZE = 21
@@ -12,6 +14,20 @@ def nanoid(size=NANOID_SIZE):
 def now_iso():
     return datetime.utcnow().isoformat()
 
+def encode_cursor(values):
+    """Keyset sayfalama cursor'ı: son kaydın sıralama alanları → opak string."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
 def drop_mongo_id(doc):
     if not doc:
         return doc
@@ -1,5 +1,6 @@
-from mcp.server.fastmcp import FastMCP
-from pw_runner.runner import execute_python_code
+from mcp.server.fastmcp import FastMCP, Context
+from pw_runner.runner import stream_python_code
+from pw_runner.pool import configure_default_pool
 
 import argparse
 import os
@@ -8,8 +9,19 @@ import os
 parser = argparse.ArgumentParser()
 parser.add_argument("--chrome-path", type=str)
 parser.add_argument("--user-data-dir", type=str)
+parser.add_argument("--pool-size", type=int, default=None, help="warm interpreter pool size (0 = cold subprocess per run)")
+parser.add_argument("--pool-max-jobs", type=int, default=100, help="recycle a pool worker after N jobs")
+parser.add_argument("--pool-max-rss-mb", type=float, default=1024, help="recycle a pool worker above this RSS")
+parser.add_argument("--browser-pool", type=str, default=None, help="browser pool URL (pw_runner/browser_pool.py)")
 args, unknown = parser.parse_known_args()
 
+if args.browser_pool:
+    # script süreçleri env'i miras alır, header havuzdan Chrome kiralar
+    os.environ["PW_BROWSER_POOL"] = args.browser_pool
+
+if args.pool_size is not None:
+    configure_default_pool(args.pool_size, args.pool_max_jobs, args.pool_max_rss_mb)
+
 # from dotenv import load_dotenv
 # load_dotenv()
 
@@ -21,12 +33,29 @@ mcp = FastMCP("python_environment")
         "Uses Python 3.11. "
         "The environment has Playwright, BeautifulSoup (bs4), and httpx, requests, pre-installed and ready to use. "
         "Define a `OUTPUT` dictionary in your code, and it will be automatically returned as a result. "
+        "Call `emit(item)` for each scraped item to stream it immediately; emitted items are returned in `items` "
+        "and the run stops after MAX_COUNT items. "
         "**Important:** Do not use a main function or `if __name__ == '__main__':` block in your script. "
     )
 
 )
-async def execute(python_code: str):
-    return  await execute_python_code(python_code, no_prints=False,chrome_path=args.chrome_path,user_data_dir=args.user_data_dir)
+async def execute(python_code: str, ctx: Context):
+    meta = ctx.request_context.meta
+    traceparent = getattr(meta, "traceparent", None) if meta else None
+    items = []
+    result = {}
+    async for event in stream_python_code(python_code, no_prints=False, chrome_path=args.chrome_path,
+                                          user_data_dir=args.user_data_dir, traceparent=traceparent):
+        if event["event"] == "item":
+            items.append(event["data"])
+            await ctx.report_progress(len(items), None)  # mcp 1.9 (uv.lock): no message argument
+        else:
+            result = {k: v for k, v in event.items() if k not in ("event", "count", "stopped_early")}
+            if event["stopped_early"]:
+                result["stopped_early"] = True
+    if items:
+        result["items"] = items
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+"""Long-lived Chrome pool shared by pw_runner scripts.
+
+Without the pool every script launches its own Chrome (seconds of cold
+start) and concurrent runs fight over the same ``USER_DATA_DIR``. The pool
+keeps one Chrome per *profile* (normally the project id, with its own
+persistent user-data dir under ``--profiles-dir``) started with
+``--remote-debugging-port=0``. Scripts lease it over HTTP and attach with
+``connect_over_cdp``; the injected header (``inject/header.py``) does this
+transparently and gives every script its own ``new_context()`` (isolated
+cookies, storage and pages), closed again on release. A lease with
+``"exclusive": true`` (``PW_BROWSER_PERSISTENT=1``) waits until it is the only
+one on the profile; the header then hands out the browser's default context, so
+cookies and storage persist in the profile across runs.
+
+    python -m pw_runner.browser_pool --port 9333 --chrome-path /usr/bin/google-chrome
+    PW_BROWSER_POOL=http://127.0.0.1:9333 python main.py "..."
+
+API::
+
+    POST /lease   {"profile": "<projectId>", "owner": "<run id>", "exclusive": false} → {"lease_id", "cdp_endpoint", "ws_endpoint", …}
+    POST /release {"lease_id": "…"} | {"owner": "…"} (all leases of a run)
+    GET  /status
+
+The runner sets ``PW_BROWSER_OWNER`` per run and releases that owner's leases
+once the script process is gone (killed, timed out or exited without
+``close()``), so slots do not wait for ``--lease-ttl``.
+
+At most ``--max-contexts`` leases (one context each) are active per browser;
+further requests wait (up to ``--wait-timeout``). A browser that served ``--max-leases``
+leases or whose process tree exceeds ``--max-rss-mb`` is drained and
+restarted, which is how leaking contexts are recycled. Leases not released
+within ``--lease-ttl`` seconds (crashed script) are expired.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+_NO_LOCK = contextlib.nullcontext()
+CHROME_CANDIDATES = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"]
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+def find_chrome() -> Optional[str]:
+    for name in CHROME_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def tree_rss_kb(root_pid: int) -> int:
+    """RSS of *root_pid* and all its descendants (Linux /proc)."""
+    children = defaultdict(list)
+    rss = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read().decode(errors="replace")
+        except OSError:
+            continue
+        fields = stat[stat.rfind(")") + 2:].split()
+        pid = int(entry)
+        children[int(fields[1])].append(pid)
+        rss[pid] = int(fields[21]) * _PAGE_KB
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+class BrowserInstance:
+    def __init__(self, profile: str, user_data_dir: str):
+        self.profile = profile
+        self.user_data_dir = user_data_dir
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.cdp_endpoint = ""
+        self.ws_endpoint = ""
+        self.active: set = set()
+        self.served = 0
+        self.started_at = time.time()
+        self.draining = False
+        self.drained = asyncio.Event()
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def start(self, chrome_path: str, headless: bool, extra_args: List[str], timeout: float = 30):
+        os.makedirs(self.user_data_dir, exist_ok=True)
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        if os.path.exists(port_file):
+            os.remove(port_file)
+        args = [
+            chrome_path,
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            *(["--headless=new"] if headless else []),
+            *extra_args,
+            "about:blank",
+        ]
+        self.proc = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.alive():
+                raise RuntimeError(f"Chrome exited during start-up (profile={self.profile})")
+            try:
+                with open(port_file, encoding="utf-8") as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    self.cdp_endpoint = f"http://127.0.0.1:{lines[0]}"
+                    self.ws_endpoint = f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+                    self.started_at = time.time()
+                    return
+            except FileNotFoundError:
+                pass
+            await asyncio.sleep(0.05)
+        await self.close()
+        raise TimeoutError(f"Chrome did not report a DevTools port (profile={self.profile})")
+
+    def rss_kb(self) -> int:
+        return tree_rss_kb(self.proc.pid) if self.alive() else 0
+
+    async def close(self):
+        if not self.alive():
+            return
+        self.proc.terminate()
+        try:
+            await asyncio.wait_for(self.proc.wait(), 5)
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(self.proc.pid, 9)
+            except (ProcessLookupError, PermissionError):
+                pass
+            await self.proc.wait()
+
+
+class BrowserPool:
+    def __init__(self, chrome_path: Optional[str] = None, profiles_dir: str = "browser_profiles",
+                 max_contexts: int = 8, max_rss_mb: float = 2048, max_leases: int = 200,
+                 lease_ttl: float = 600, wait_timeout: float = 120, headless: bool = True,
+                 extra_args: Optional[List[str]] = None):
+        self.chrome_path = chrome_path or find_chrome()
+        self.profiles_dir = os.path.abspath(profiles_dir)
+        self.max_contexts = max_contexts
+        self.max_rss_kb = max_rss_mb * 1024
+        self.max_leases = max_leases
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self.headless = headless
+        self.extra_args = extra_args or []
+        self.browsers: Dict[str, BrowserInstance] = {}
+        self.leases: Dict[str, Dict[str, Any]] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._exclusive: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.stats = {"leases": 0, "launches": 0, "recycled": 0, "expired": 0}
+
+    @staticmethod
+    def profile_name(profile: Optional[str]) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", profile or "default")[:64] or "default"
+
+    def _slot(self, profile: str) -> asyncio.Semaphore:
+        if profile not in self._slots:
+            self._slots[profile] = asyncio.Semaphore(self.max_contexts)
+        return self._slots[profile]
+
+    async def _browser(self, profile: str) -> BrowserInstance:
+        async with self._locks[profile]:
+            browser = self.browsers.get(profile)
+            if browser is not None and browser.draining:
+                # a user-data-dir can only be opened by one Chrome → wait for the old one
+                await browser.drained.wait()
+                await browser.close()
+                self.stats["recycled"] += 1
+                browser = None
+            if browser is not None and not browser.alive():
+                browser = None
+            if browser is None:
+                if not self.chrome_path:
+                    raise RuntimeError("Chrome executable not found (use --chrome-path)")
+                browser = BrowserInstance(profile, os.path.join(self.profiles_dir, profile))
+                await browser.start(self.chrome_path, self.headless, self.extra_args)
+                self.browsers[profile] = browser
+                self.stats["launches"] += 1
+            return browser
+
+    async def _acquire(self, profile: str, permits: int):
+        slot = self._slot(profile)
+        acquired = 0
+
+        async def acquire():
+            nonlocal acquired
+            # exclusive waiters queue up, so two of them never hold part of the slots each
+            async with self._exclusive[profile] if permits > 1 else _NO_LOCK:
+                while acquired < permits:
+                    await slot.acquire()
+                    acquired += 1
+        try:
+            await asyncio.wait_for(acquire(), self.wait_timeout)
+        except BaseException:
+            for _ in range(acquired):
+                slot.release()
+            raise
+
+    async def lease(self, profile: Optional[str] = None, owner: Optional[str] = None,
+                    exclusive: bool = False) -> Dict[str, Any]:
+        profile = self.profile_name(profile)
+        # exclusive = every slot of the profile (persistent default context, see header.py)
+        permits = self.max_contexts if exclusive else 1
+        await self._acquire(profile, permits)
+        try:
+            browser = await self._browser(profile)
+        except BaseException:
+            for _ in range(permits):
+                self._slot(profile).release()
+            raise
+        lease_id = uuid.uuid4().hex
+        browser.active.add(lease_id)
+        browser.served += 1
+        self.leases[lease_id] = {
+            "profile": profile,
+            "browser": browser,
+            "owner": owner,
+            "permits": permits,
+            "expires": time.monotonic() + self.lease_ttl,
+        }
+        self.stats["leases"] += 1
+        return {
+            "lease_id": lease_id,
+            "profile": profile,
+            "exclusive": exclusive,
+            "cdp_endpoint": browser.cdp_endpoint,
+            "ws_endpoint": browser.ws_endpoint,
+            "expires_in": self.lease_ttl,
+        }
+
+    async def release(self, lease_id: str) -> bool:
+        lease = self.leases.pop(lease_id, None)
+        if lease is None:
+            return False
+        browser: BrowserInstance = lease["browser"]
+        browser.active.discard(lease_id)
+        for _ in range(lease["permits"]):
+            self._slot(lease["profile"]).release()
+        if not browser.draining and (
+            browser.served >= self.max_leases or await asyncio.to_thread(browser.rss_kb) > self.max_rss_kb
+        ):
+            browser.draining = True
+        if browser.draining and not browser.active:
+            browser.drained.set()
+        return True
+
+    async def release_owner(self, owner: str) -> int:
+        """Releases every lease taken by one run (see PW_BROWSER_OWNER)."""
+        released = 0
+        for lease_id, lease in list(self.leases.items()):
+            if owner and lease.get("owner") == owner and await self.release(lease_id):
+                released += 1
+        return released
+
+    async def expire_leases(self):
+        now = time.monotonic()
+        for lease_id, lease in list(self.leases.items()):
+            if lease["expires"] < now:
+                self.stats["expired"] += 1
+                await self.release(lease_id)
+
+    async def retire_drained(self):
+        """Close drained browsers nobody is waiting for, so their memory is freed right away."""
+        for profile, browser in list(self.browsers.items()):
+            lock = self._locks[profile]
+            if browser.drained.is_set() and not lock.locked():
+                async with lock:
+                    if self.browsers.get(profile) is browser:
+                        await browser.close()
+                        del self.browsers[profile]
+                        self.stats["recycled"] += 1
+
+    async def maintain(self, interval: float = 5):
+        while True:
+            await asyncio.sleep(interval)
+            await self.expire_leases()
+            await self.retire_drained()
+
+    async def status(self) -> Dict[str, Any]:
+        rss = {profile: await asyncio.to_thread(b.rss_kb) for profile, b in self.browsers.items()}
+        return {
+            "stats": self.stats,
+            "max_contexts": self.max_contexts,
+            "browsers": [
+                {
+                    "profile": b.profile,
+                    "alive": b.alive(),
+                    "pid": b.proc.pid if b.proc else None,
+                    "cdp_endpoint": b.cdp_endpoint,
+                    "active": len(b.active),
+                    "served": b.served,
+                    "draining": b.draining,
+                    "rss_mb": round(rss.get(b.profile, 0) / 1024, 1),
+                    "uptime_s": round(time.time() - b.started_at, 1),
+                }
+                for b in list(self.browsers.values())
+            ],
+        }
+
+    async def close(self):
+        for browser in list(self.browsers.values()):
+            await browser.close()
+        self.browsers.clear()
+        self.leases.clear()
+
+
+def release_owner(pool_url: str, owner: str, timeout: float = 5) -> int:
+    """Client side of ``POST /release {"owner"}`` (used by the runner after a script exits)."""
+    import json
+    import urllib.request
+    req = urllib.request.Request(pool_url.rstrip("/") + "/release", data=json.dumps({"owner": owner}).encode(),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read()).get("released", 0)
+
+
+def create_app(pool: BrowserPool):
+    from contextlib import asynccontextmanager
+
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def lease(request):
+        body = await request.json() if await request.body() else {}
+        try:
+            return JSONResponse(await pool.lease(body.get("profile"), body.get("owner"), bool(body.get("exclusive"))))
+        except asyncio.TimeoutError:
+            return JSONResponse({"error": "no free browser slot"}, status_code=503)
+        except Exception as e:
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+    async def release(request):
+        body = await request.json()
+        if body.get("owner"):
+            released = await pool.release_owner(body["owner"])
+            return JSONResponse({"ok": released > 0, "released": released})
+        return JSONResponse({"ok": await pool.release(body.get("lease_id", ""))})
+
+    async def status(request):
+        return JSONResponse(await pool.status())
+
+    @asynccontextmanager
+    async def lifespan(app):
+        task = asyncio.create_task(pool.maintain())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await pool.close()
+
+    return Starlette(routes=[
+        Route("/lease", lease, methods=["POST"]),
+        Route("/release", release, methods=["POST"]),
+        Route("/status", status, methods=["GET"]),
+    ], lifespan=lifespan)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared Chrome pool for pw_runner scripts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9333)
+    parser.add_argument("--chrome-path", default=os.environ.get("CHROME_PATH"))
+    parser.add_argument("--profiles-dir", default="browser_profiles", help="per-profile user-data dirs")
+    parser.add_argument("--max-contexts", type=int, default=8, help="concurrent leases (contexts) per browser")
+    parser.add_argument("--max-rss-mb", type=float, default=2048, help="recycle a browser above this RSS")
+    parser.add_argument("--max-leases", type=int, default=200, help="recycle a browser after N leases")
+    parser.add_argument("--lease-ttl", type=float, default=600, help="expire unreleased leases (s)")
+    parser.add_argument("--wait-timeout", type=float, default=120, help="max wait for a free slot (s)")
+    parser.add_argument("--headed", action="store_true", help="show browser windows")
+    args, chrome_args = parser.parse_known_args(argv)
+
+    pool = BrowserPool(
+        chrome_path=args.chrome_path, profiles_dir=args.profiles_dir, max_contexts=args.max_contexts,
+        max_rss_mb=args.max_rss_mb, max_leases=args.max_leases, lease_ttl=args.lease_ttl,
+        wait_timeout=args.wait_timeout, headless=not args.headed, extra_args=chrome_args,
+    )
+    import uvicorn
+    uvicorn.run(create_app(pool), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Fork server for warm script execution (see pool.py).
+
+Started once per pool worker. It imports the heavy libraries scripts use
+(Playwright, bs4, httpx …) and then serves jobs read as JSON lines on stdin.
+Every job runs in a freshly forked child, so scripts start with the imports
+already done but never see each other's state:
+
+    → {"job": "…", "script": "/tmp/…/user_script.py", "cwd": "/tmp/…",
+       "stdout": "/tmp/…/stdout", "stderr": "/tmp/…/stderr", "env": {…},
+       "rlimits": {"as": bytes, "cpu": seconds}}
+    ← {"job": "…", "event": "started", "pid": 1234}
+    ← {"job": "…", "event": "exited", "returncode": 0, "rusage": {…}}
+
+The child calls ``setsid()`` so the pool can kill the whole process group
+(browser included) on timeout. ``returncode`` follows subprocess semantics
+(negative signal number when killed by a signal).
+"""
+import atexit
+import importlib
+import json
+import os
+import resource
+import runpy
+import sys
+import traceback
+
+DEFAULT_PRELOAD = "playwright.sync_api,bs4,httpx,requests"
+CPU_GRACE_SECONDS = 5  # limits.CPU_GRACE_SECONDS
+
+
+def preload(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def _reply(msg):
+    sys.stdout.write(json.dumps(msg) + "\n")
+    sys.stdout.flush()
+
+
+def _rusage(ru):
+    return {
+        "utime": ru.ru_utime,
+        "stime": ru.ru_stime,
+        "maxrss_kb": ru.ru_maxrss,
+        "minflt": ru.ru_minflt,
+        "majflt": ru.ru_majflt,
+        "nvcsw": ru.ru_nvcsw,
+        "nivcsw": ru.ru_nivcsw,
+    }
+
+
+def _run_child(job):
+    """Runs in the forked child; never returns."""
+    code = 1
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        out = os.open(job["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        err = os.open(job["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(out, 1)
+        os.dup2(err, 2)
+        for fd in (devnull, out, err):
+            os.close(fd)
+        os.chdir(job.get("cwd") or os.path.dirname(job["script"]))
+        os.environ.update(job.get("env") or {})
+        rl = job.get("rlimits") or {}
+        if "as" in rl:
+            resource.setrlimit(resource.RLIMIT_AS, (rl["as"], rl["as"]))
+        if "cpu" in rl:
+            # CPU time already used by the zygote is not inherited by the child
+            resource.setrlimit(resource.RLIMIT_CPU, (rl["cpu"], rl["cpu"] + CPU_GRACE_SECONDS))
+        sys.argv = [job["script"]]
+        try:
+            runpy.run_path(job["script"], run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            # os._exit skips interpreter shutdown; run atexit handlers (e.g. browser lease release)
+            atexit._run_exitfuncs()
+        except BaseException:
+            pass
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if sys.__stdout__:
+                sys.__stdout__.flush()
+        except Exception:
+            pass
+        os._exit(code)
+
+
+def serve():
+    preload([m for m in os.environ.get("PW_RUNNER_PRELOAD", DEFAULT_PRELOAD).split(",") if m])
+    _reply({"event": "ready", "pid": os.getpid()})
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        job = json.loads(line)
+        # don't duplicate buffered output in the child
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(job)
+        _reply({"job": job["job"], "event": "started", "pid": pid})
+        _, status, ru = os.wait4(pid, 0)
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        _reply({
+            "job": job["job"],
+            "event": "exited",
+            "returncode": returncode,
+            "rusage": _rusage(ru),
+        })
+
+
+if __name__ == "__main__":
+    serve()
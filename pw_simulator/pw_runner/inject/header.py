@@ -3,6 +3,26 @@ import sys
 
 sys.stdout = sys.stderr
 
+# --- streaming results: emit(item) ---
+_RESULT_PATH = os.environ.get("PW_RESULT_PATH")
+_result_stream = None
+
+
+def emit(item):
+    """Send one scraped item to the runner right away (NDJSON on PW_RESULT_PATH).
+
+    Without a result channel (non-streaming run) items are collected in OUTPUT["data"].
+    """
+    global _result_stream
+    import json as _json
+    if _RESULT_PATH:
+        if _result_stream is None:
+            _result_stream = open(_RESULT_PATH, "w", encoding="utf-8", buffering=1)
+        _result_stream.write(_json.dumps(item, ensure_ascii=False, default=str) + "\n")
+        return
+    out = globals().setdefault("OUTPUT", {})
+    out.setdefault("data", []).append(item)
+
 try:
     from playwright.sync_api import _api
     sync_browser_type = _api.SyncBrowserType
@@ -26,7 +46,89 @@ orig_launch_persistent = sync_browser_type.launch_persistent_context
 #     kwargs["headless"] = False
 #     return orig_launch_persistent(self, *args, **kwargs)
 
+# --- shared browser pool (browser_pool.py) ---
+BROWSER_POOL = os.environ.get("PW_BROWSER_POOL")
+
+
+def _pool_call(path, payload):
+    import json as _json
+    import urllib.request
+    req = urllib.request.Request(BROWSER_POOL.rstrip("/") + path, data=_json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=180) as resp:
+        return _json.loads(resp.read())
+
+
+_CONTEXT_OPTIONS = ("viewport", "user_agent", "locale", "timezone_id", "extra_http_headers",
+                    "ignore_https_errors", "java_script_enabled", "geolocation", "permissions",
+                    "storage_state", "device_scale_factor", "is_mobile", "has_touch", "color_scheme")
+
+
+def launch_from_pool(self, **kwargs):
+    # Leased Chrome (per-project profile) + an isolated context, returned in place of the
+    # persistent context so scripts keep working unchanged. With PW_BROWSER_PERSISTENT=1 the
+    # lease is exclusive and the script gets the profile's default context (cookies persist).
+    import atexit
+    persistent = os.environ.get("PW_BROWSER_PERSISTENT") == "1"
+    lease = _pool_call("/lease", {"profile": os.environ.get("PW_BROWSER_PROFILE"),
+                                  "owner": os.environ.get("PW_BROWSER_OWNER"), "exclusive": persistent})
+    if "lease_id" not in lease:
+        raise RuntimeError(f"browser pool: {lease.get('error', lease)}")
+    released = []
+
+    def release():
+        # the runner also releases by PW_BROWSER_OWNER once the process is gone
+        if not released:
+            released.append(True)
+            try:
+                _pool_call("/release", {"lease_id": lease["lease_id"]})
+            except Exception:
+                pass
+
+    browser = self.connect_over_cdp(lease["cdp_endpoint"])
+    options = {k: v for k, v in kwargs.items() if k in _CONTEXT_OPTIONS}
+    own_context = not (persistent and browser.contexts)
+    context = browser.new_context(**options) if own_context else browser.contexts[0]
+    orig_close = context.close
+    own_pages = []
+
+    if not own_context:
+        # the default context's options are fixed; apply what can be set per page
+        orig_new_page = context.new_page
+
+        def new_page(*a, **kw):
+            page = orig_new_page(*a, **kw)
+            own_pages.append(page)
+            if options.get("viewport"):
+                page.set_viewport_size(options["viewport"])
+            if options.get("extra_http_headers"):
+                page.set_extra_http_headers(options["extra_http_headers"])
+            return page
+
+        context.new_page = new_page
+
+    def close(*a, **kw):
+        try:
+            if own_context:
+                orig_close(*a, **kw)
+            else:
+                for page in own_pages:
+                    if not page.is_closed():
+                        page.close()
+            browser.close()  # CDP bağlantısını kapatır, Chrome açık kalır
+        except Exception:
+            pass
+        finally:
+            release()
+
+    context.close = close
+    atexit.register(close)
+    return context
+
+
 def launch(self, *args, **kwargs):
+    if BROWSER_POOL:
+        return launch_from_pool(self, **kwargs)
     kwargs["userDataDir"] = USER_DATA_DIR
     if ("executablePath" not in kwargs or kwargs["executablePath"] is None) and CHROME_PATH:
         kwargs["executablePath"] = CHROME_PATH
@@ -35,3 +137,28 @@ def launch(self, *args, **kwargs):
 
 sync_browser_type.launch = launch
 sync_browser_type.launch_persistent_context = launch
+
+# --- execution profile: max concurrent pages (limits.py) ---
+_MAX_PAGES = int(os.environ.get("PW_MAX_PAGES") or 0)
+
+
+class PageLimitExceeded(RuntimeError):
+    pass
+
+
+if _MAX_PAGES:
+    import playwright.sync_api as _sync_api
+    _open_pages = []
+
+    def _limit_new_page(orig_new_page):
+        def new_page(self, *args, **kwargs):
+            _open_pages[:] = [p for p in _open_pages if not p.is_closed()]
+            if len(_open_pages) >= _MAX_PAGES:
+                raise PageLimitExceeded(f"more than {_MAX_PAGES} concurrent pages")
+            page = orig_new_page(self, *args, **kwargs)
+            _open_pages.append(page)
+            return page
+        return new_page
+
+    _sync_api.BrowserContext.new_page = _limit_new_page(_sync_api.BrowserContext.new_page)
+    _sync_api.Browser.new_page = _limit_new_page(_sync_api.Browser.new_page)
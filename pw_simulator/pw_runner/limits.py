@@ -0,0 +1,130 @@
+"""Execution limits for script runs.
+
+A limits dict (see ``PROFILES``) controls one run::
+
+    timeout           wall-clock seconds (process group is killed)
+    memory_mb         RLIMIT_AS of the script – inherited by anything it
+                      starts, so keep it generous when the script launches
+                      Chrome itself (use the browser pool for tight limits)
+    cpu_seconds       RLIMIT_CPU (SIGXCPU, then SIGKILL 5 s later; SIGKILL
+                      right away under namespace isolation)
+    max_stdout_bytes  cap on the captured OUTPUT/stdout
+    max_pages         concurrently open pages per script (enforced by the header)
+    isolation         None | "namespace" (user/pid/ipc/uts/mount namespaces via
+                      util-linux ``unshare``) | "namespace-nonet" (also no network)
+
+``classify`` maps a finished run to the violated limit, if any, so callers
+can report ``timeout`` / ``memory`` / ``cpu`` / ``output`` / ``pages``
+separately from ordinary script errors.
+"""
+import shutil
+import signal
+from typing import Any, Dict, List, Optional
+
+MB = 1024 * 1024
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "timeout": 120,
+        "memory_mb": None,
+        "cpu_seconds": None,
+        "max_stdout_bytes": 16 * MB,
+        "max_pages": None,
+        "isolation": None,
+    },
+    "strict": {
+        "timeout": 60,
+        "memory_mb": 8192,
+        "cpu_seconds": 60,
+        "max_stdout_bytes": 4 * MB,
+        "max_pages": 4,
+        "isolation": "namespace",
+    },
+    "heavy": {
+        "timeout": 900,
+        "memory_mb": None,
+        "cpu_seconds": None,
+        "max_stdout_bytes": 64 * MB,
+        "max_pages": 16,
+        "isolation": None,
+    },
+}
+
+ISOLATION_MODES = {
+    "namespace": ["--user", "--map-root-user", "--pid", "--fork", "--mount-proc", "--ipc", "--uts"],
+    "namespace-nonet": ["--user", "--map-root-user", "--pid", "--fork", "--mount-proc", "--ipc", "--uts", "--net"],
+}
+
+PAGE_LIMIT_MARKER = "PageLimitExceeded"
+CPU_GRACE_SECONDS = 5
+
+
+def resolve_limits(profile: Optional[str] = None, **overrides) -> Dict[str, Any]:
+    """Profile defaults (``default`` when unknown/None) with non-None *overrides* applied."""
+    limits = dict(PROFILES.get(profile or "default", PROFILES["default"]))
+    for key, value in overrides.items():
+        if key in limits and value is not None:
+            limits[key] = value
+    if not limits["isolation"] or limits["isolation"] == "none":
+        limits["isolation"] = None  # false / "none" turns a profile's isolation off
+    if limits["isolation"] not in (None, *ISOLATION_MODES):
+        raise ValueError(f"unknown isolation mode: {limits['isolation']}")
+    return limits
+
+
+def rlimits(limits: Dict[str, Any]) -> Dict[str, int]:
+    """``{"as": bytes, "cpu": seconds}`` for the limits that are set."""
+    out = {}
+    if limits.get("memory_mb"):
+        out["as"] = int(limits["memory_mb"] * MB)
+    if limits.get("cpu_seconds"):
+        out["cpu"] = int(limits["cpu_seconds"])
+    return out
+
+
+def command_prefix(limits: Dict[str, Any]) -> List[str]:
+    """Wrapper command (``unshare …`` / ``prlimit …``) for a cold run."""
+    prefix: List[str] = []
+    isolation = limits.get("isolation")
+    if isolation:
+        unshare = shutil.which("unshare")
+        if not unshare:
+            raise RuntimeError("isolation requested but util-linux 'unshare' is not available")
+        prefix += [unshare, *ISOLATION_MODES[isolation], "--"]
+    rl = rlimits(limits)
+    if rl:
+        prlimit = shutil.which("prlimit")
+        if not prlimit:
+            raise RuntimeError("resource limits requested but util-linux 'prlimit' is not available")
+        prefix.append(prlimit)
+        if "as" in rl:
+            prefix.append(f"--as={rl['as']}")
+        if "cpu" in rl:
+            # in a pid namespace the script is PID 1 and never sees SIGXCPU → hard limit only
+            grace = 0 if isolation else CPU_GRACE_SECONDS
+            prefix.append(f"--cpu={rl['cpu']}:{rl['cpu'] + grace}")
+        prefix.append("--")
+    return prefix
+
+
+def classify(run: Dict[str, Any], limits: Dict[str, Any]) -> Optional[str]:
+    """Which limit (if any) ended *run* (a ``run_script`` / pool result)."""
+    if run.get("timed_out"):
+        return "timeout"
+    if run.get("stdout_truncated"):
+        return "output"
+    stderr = run.get("stderr") or ""
+    tail = stderr[-4000:]
+    if PAGE_LIMIT_MARKER in tail:
+        return "pages"
+    rc = run.get("returncode")
+    if limits.get("cpu_seconds"):
+        ru = run.get("rusage") or {}
+        cpu_used = ru.get("utime", 0) + ru.get("stime", 0)
+        # unshare may report the killed child as a plain non-zero exit;
+        # rusage is tick-accurate, so allow a little slack below the limit
+        if rc == -signal.SIGXCPU or (rc != 0 and cpu_used >= limits["cpu_seconds"] * 0.9):
+            return "cpu"
+    if limits.get("memory_mb") and ("MemoryError" in tail or "Cannot allocate memory" in tail):
+        return "memory"
+    return None
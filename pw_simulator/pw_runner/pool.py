@@ -0,0 +1,247 @@
+"""Warm interpreter pool for script execution.
+
+A cold run (``python user_script.py``) pays interpreter start-up plus the
+Playwright / bs4 / httpx imports on every call. The pool keeps ``size``
+fork servers (``forkserver.py``) that have done those imports once; each
+job is a fresh ``fork()`` of such a server, so startup drops to a few ms
+while scripts remain isolated from each other (own process, own session,
+own working directory).
+
+Workers are recycled after ``max_jobs`` jobs or after a job whose peak RSS
+(the child's ``wait4`` ``maxrss``) exceeded ``max_rss_mb``; a worker whose job timed out is
+replaced as well. A cancelled job (early stop) is killed and its worker kept once
+the fork server reports the exit.
+
+Opt-in for ``execute_python_code`` via environment::
+
+    PW_RUNNER_POOL_SIZE=4            # 0 / unset = cold subprocess per run
+    PW_RUNNER_POOL_MAX_JOBS=100
+    PW_RUNNER_POOL_MAX_RSS_MB=1024
+    PW_RUNNER_PRELOAD=playwright.sync_api,bs4,httpx,requests
+"""
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+from typing import Any, Dict, Optional
+
+try:
+    from .process import MAX_STDERR_BYTES, MAX_STDOUT_BYTES, kill_group, read_file_capped
+except ImportError:
+    from process import MAX_STDERR_BYTES, MAX_STDOUT_BYTES, kill_group, read_file_capped
+
+FORKSERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forkserver.py")
+
+_job_ids = itertools.count(1)
+
+REAP_TIMEOUT = 5  # s to wait for a killed job's exit report before replacing the worker
+
+
+class PoolError(RuntimeError):
+    pass
+
+
+class _Worker:
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.jobs = 0
+        self.job_rss_kb = 0  # peak RSS of the last job
+
+    async def read(self) -> Dict[str, Any]:
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise PoolError("fork server exited unexpectedly")
+        return json.loads(line)
+
+    def send(self, msg: Dict[str, Any]):
+        self.proc.stdin.write((json.dumps(msg) + "\n").encode())
+
+    def kill(self):
+        if self.proc.returncode is None:
+            try:
+                self.proc.kill()
+            except ProcessLookupError:
+                pass
+
+
+class WarmInterpreterPool:
+    def __init__(self, size: int = 2, max_jobs: int = 100, max_rss_mb: float = 1024,
+                 preload: Optional[str] = None):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_kb = max_rss_mb * 1024
+        self.preload = preload
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self.stats = {"jobs": 0, "spawned": 0, "recycled": 0, "timeouts": 0, "cancelled": 0}
+
+    # ------------------------------------------------------------------
+    async def start(self, warm: bool = True):
+        """Bind to the running loop; with *warm* spawn all workers now instead of on first use."""
+        if self._idle is not None:
+            self._abandon()
+        self.loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            # None = slot without a live worker, spawned lazily on acquire
+            self._idle.put_nowait(await self._spawn() if warm else None)
+
+    def _abandon(self):
+        """Kill idle workers bound to a previous event loop (their pipes are unusable from this one)."""
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker is not None and worker.proc.returncode is None:
+                try:
+                    os.kill(worker.proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    async def close(self):
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker is not None:
+                worker.kill()
+                await worker.proc.wait()
+        self._idle = None
+
+    async def _spawn(self) -> _Worker:
+        env = dict(os.environ)
+        if self.preload is not None:
+            env["PW_RUNNER_PRELOAD"] = self.preload
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, FORKSERVER,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        worker = _Worker(proc)
+        ready = await worker.read()
+        if ready.get("event") != "ready":
+            worker.kill()
+            raise PoolError(f"unexpected fork server greeting: {ready}")
+        self.stats["spawned"] += 1
+        return worker
+
+    async def _release(self, worker: Optional[_Worker], healthy: bool):
+        if worker is not None and healthy and (
+            worker.jobs >= self.max_jobs or worker.job_rss_kb > self.max_rss_kb
+        ):
+            self.stats["recycled"] += 1
+            healthy = False
+        if worker is not None and not healthy:
+            worker.kill()
+            worker = None
+        self._idle.put_nowait(worker)
+
+    async def _reap(self, worker: _Worker) -> bool:
+        """Wait for the killed job's "exited" reply so the worker stays in sync; False = replace it."""
+        try:
+            done = await asyncio.wait_for(worker.read(), REAP_TIMEOUT)
+        except BaseException:
+            return False
+        worker.jobs += 1
+        worker.job_rss_kb = done.get("rusage", {}).get("maxrss_kb", 0)
+        return True
+
+    # ------------------------------------------------------------------
+    async def run(self, script_path: str, cwd: Optional[str] = None,
+                  env: Optional[Dict[str, str]] = None, timeout: float = 120,
+                  max_stdout: int = MAX_STDOUT_BYTES, max_stderr: int = MAX_STDERR_BYTES,
+                  rlimits: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Run *script_path* in a forked warm interpreter.
+
+        Returns the same dict as ``process.run_script``; stdout/stderr are
+        captured to files next to the script and read back capped. *rlimits*
+        (``{"as": bytes, "cpu": seconds}``) are applied in the forked child.
+        """
+        if self._idle is None or self.loop is not asyncio.get_running_loop():
+            await self.start(warm=False)
+
+        cwd = cwd or os.path.dirname(script_path)
+        job = {
+            "job": str(next(_job_ids)),
+            "script": script_path,
+            "cwd": cwd,
+            "stdout": os.path.join(cwd, ".stdout"),
+            "stderr": os.path.join(cwd, ".stderr"),
+            "env": env or {},
+            "rlimits": rlimits or {},
+        }
+
+        worker = await self._idle.get()
+        healthy = False
+        pid = None
+        timed_out = False
+        t0 = time.perf_counter()
+        try:
+            if worker is None:
+                worker = await self._spawn()
+            worker.send(job)
+            await worker.proc.stdin.drain()
+            started = await worker.read()
+            pid = started["pid"]
+            try:
+                done = await asyncio.wait_for(worker.read(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self.stats["timeouts"] += 1
+                kill_group(pid)
+                done = await worker.read()
+            worker.jobs += 1
+            worker.job_rss_kb = done.get("rusage", {}).get("maxrss_kb", 0)
+            healthy = not timed_out
+        except asyncio.CancelledError:
+            # early stop (stream_python_code) – kill the job, keep the warm worker if it answers
+            if pid is not None:
+                kill_group(pid)
+                healthy = await self._reap(worker)
+            self.stats["cancelled"] += 1
+            raise
+        except BaseException:
+            if pid is not None:
+                kill_group(pid)
+            raise
+        finally:
+            await self._release(worker, healthy)
+            self.stats["jobs"] += 1
+
+        out, out_trunc = read_file_capped(job["stdout"], max_stdout)
+        err, err_trunc = read_file_capped(job["stderr"], max_stderr)
+        return {
+            "returncode": done["returncode"],
+            "stdout": out.decode("utf-8", errors="replace"),
+            "stderr": err.decode("utf-8", errors="replace"),
+            "stdout_truncated": out_trunc,
+            "stderr_truncated": err_trunc,
+            "timed_out": timed_out,
+            "rusage": done.get("rusage", {}),
+            "duration": time.perf_counter() - t0,
+        }
+
+
+_default_pool: Optional[WarmInterpreterPool] = None
+
+
+def configure_default_pool(size: int, max_jobs: int = 100, max_rss_mb: float = 1024) -> Optional[WarmInterpreterPool]:
+    """Set the pool used by ``execute_python_code`` (``size <= 0`` disables it)."""
+    global _default_pool
+    _default_pool = WarmInterpreterPool(size, max_jobs, max_rss_mb) if size > 0 else None
+    return _default_pool
+
+
+def get_default_pool() -> Optional[WarmInterpreterPool]:
+    global _default_pool
+    if _default_pool is None:
+        size = int(os.environ.get("PW_RUNNER_POOL_SIZE", "0") or 0)
+        if size > 0:
+            configure_default_pool(
+                size,
+                int(os.environ.get("PW_RUNNER_POOL_MAX_JOBS", "100")),
+                float(os.environ.get("PW_RUNNER_POOL_MAX_RSS_MB", "1024")),
+            )
+    return _default_pool
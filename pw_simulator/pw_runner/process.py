@@ -0,0 +1,183 @@
+"""Non-blocking script processes for the runner.
+
+``run_script`` starts ``python <script>`` in its own session and never blocks
+the event loop: stdout/stderr are read through ``connect_read_pipe`` with a
+byte cap each, and the exit is awaited on a pidfd (Linux ≥ 5.3) and reaped
+with ``wait4`` so resource usage is available. Timeouts and cancellation
+SIGKILL the whole process group and reap the child before re-raising.
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_STDOUT_BYTES = 16 * 1024 * 1024
+MAX_STDERR_BYTES = 1024 * 1024
+_CHUNK = 64 * 1024
+
+
+def kill_group(pid: int):
+    # child is a session leader → its pid is the process group id
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def rusage_dict(ru) -> Dict[str, Any]:
+    return {
+        "utime": ru.ru_utime,
+        "stime": ru.ru_stime,
+        "maxrss_kb": ru.ru_maxrss,
+        "minflt": ru.ru_minflt,
+        "majflt": ru.ru_majflt,
+        "nvcsw": ru.ru_nvcsw,
+        "nivcsw": ru.ru_nivcsw,
+    }
+
+
+async def read_capped(reader: asyncio.StreamReader, limit: int) -> Tuple[bytes, bool]:
+    """Read *reader* to EOF keeping at most *limit* bytes (the rest is drained so the child never blocks)."""
+    buf = bytearray()
+    truncated = False
+    while True:
+        chunk = await reader.read(_CHUNK)
+        if not chunk:
+            return bytes(buf), truncated
+        room = limit - len(buf)
+        if room > 0:
+            buf += chunk[:room]
+        if len(chunk) > room:
+            truncated = True
+
+
+def read_file_capped(path: str, limit: int) -> Tuple[bytes, bool]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read(limit + 1)
+    except FileNotFoundError:
+        return b"", False
+    return data[:limit], len(data) > limit
+
+
+async def _pipe_reader(pipe) -> Tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=_CHUNK)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader, transport
+
+
+async def wait_process(pid: int) -> Tuple[int, Dict[str, Any]]:
+    """Await the exit of child *pid* and reap it → (returncode, rusage)."""
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # no pidfd support: block a worker thread instead of the loop
+        _, status, ru = await loop.run_in_executor(None, os.wait4, pid, 0)
+    else:
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        _, status, ru = os.wait4(pid, os.WNOHANG)
+    return os.waitstatus_to_exitcode(status), rusage_dict(ru)
+
+
+async def _reap_killed(proc: subprocess.Popen, waiter: Optional[asyncio.Future]):
+    """After ``kill_group``: reap the child before the caller re-raises, so no zombie is left behind."""
+    if waiter is not None:
+        try:
+            await asyncio.shield(waiter)
+            return
+        except BaseException:
+            # waiter failed or we were cancelled again: reap directly (a thread finishes it either way)
+            pass
+    try:
+        _, status = await asyncio.to_thread(os.waitpid, proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    except ChildProcessError:
+        pass  # already reaped by the waiter
+
+
+def _mark_reaped(proc: subprocess.Popen, waiter: asyncio.Future):
+    if waiter.cancelled() or waiter.exception() is not None:
+        proc.returncode = -1
+    else:
+        proc.returncode = waiter.result()[0]
+
+
+async def run_script(script_path: str, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                     timeout: float = 120, max_stdout: int = MAX_STDOUT_BYTES,
+                     max_stderr: int = MAX_STDERR_BYTES, command_prefix: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run ``python script_path`` → ``{"returncode", "stdout", "stderr", "stdout_truncated",
+    "stderr_truncated", "timed_out", "rusage", "duration"}`` (same shape as ``WarmInterpreterPool.run``).
+
+    *command_prefix* wraps the interpreter (``unshare …``, ``prlimit …`` – see limits.py).
+    """
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [*(command_prefix or []), sys.executable, script_path],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env={**os.environ, **env} if env else None,
+        start_new_session=True,
+    )
+    transports = []
+    readers = []
+    waiter = None
+    try:
+        for pipe, limit in ((proc.stdout, max_stdout), (proc.stderr, max_stderr)):
+            reader, transport = await _pipe_reader(pipe)
+            transports.append(transport)
+            readers.append(asyncio.ensure_future(read_capped(reader, limit)))
+        waiter = asyncio.ensure_future(wait_process(proc.pid))
+        # keeps *proc* alive until reaped, so Popen never waits on a pid we own
+        waiter.add_done_callback(lambda f: _mark_reaped(proc, f))
+    except BaseException:
+        kill_group(proc.pid)
+        for task in readers:
+            task.cancel()
+        for transport in transports:
+            transport.close()
+        await _reap_killed(proc, waiter)
+        raise
+
+    timed_out = False
+    try:
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+        # leftovers (timeout, or grandchildren still holding the pipes) go with the group
+        kill_group(proc.pid)
+        returncode, rusage = await waiter
+        (out, out_trunc), (err, err_trunc) = await asyncio.gather(*readers)
+    except BaseException:
+        kill_group(proc.pid)
+        for task in readers:
+            task.cancel()
+        await _reap_killed(proc, waiter)
+        raise
+    finally:
+        for transport in transports:
+            transport.close()
+
+    return {
+        "returncode": returncode,
+        "stdout": out.decode("utf-8", errors="replace"),
+        "stderr": err.decode("utf-8", errors="replace"),
+        "stdout_truncated": out_trunc,
+        "stderr_truncated": err_trunc,
+        "timed_out": timed_out,
+        "rusage": rusage,
+        "duration": time.perf_counter() - t0,
+    }
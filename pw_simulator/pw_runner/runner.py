@@ -1,12 +1,31 @@
+import asyncio
 import os
-import sys
 import tempfile
-import subprocess
 import json
-from typing import Any
+import uuid
+from typing import Any, AsyncIterator
 
 import re
 
+try:
+    from .limits import classify, command_prefix, resolve_limits, rlimits
+    from .pool import get_default_pool
+    from .browser_pool import release_owner
+    from .process import MAX_STDOUT_BYTES, run_script
+except ImportError:
+    from limits import classify, command_prefix, resolve_limits, rlimits
+    from pool import get_default_pool
+    from browser_pool import release_owner
+    from process import MAX_STDOUT_BYTES, run_script
+
+LIMIT_MESSAGES = {
+    "timeout": "Script execution timed out",
+    "output": "Script output exceeded the size limit",
+    "memory": "Script exceeded the memory limit ({memory_mb} MB)",
+    "cpu": "Script exceeded the CPU time limit ({cpu_seconds} s)",
+    "pages": "Script exceeded the page limit ({max_pages} concurrent pages)",
+}
+
 def replace_libname(code: str) -> str:
     # playwright. → patchright.
     #code = code.replace("playwright.", "patchright.")
@@ -31,10 +50,7 @@ def read_injectable_code():
             footer = f.read()
     return header, footer
 
-async def execute_python_code(code: str, no_prints=True, max_count: int = 5,chrome_path=None,user_data_dir=None) -> dict[str, Any]:
-    if not code.strip():
-        return {"success": False, "error": "No code provided", "stdout": "", "stderr": "", "json": None}
-        
+def build_script(code: str, max_count: int = 5, chrome_path=None, user_data_dir=None) -> str:
     chrome_path_code = ""
     if chrome_path is not None:
         chrome_path_code += f'CHROME_PATH = r"""{chrome_path}"""\n'
@@ -51,10 +67,98 @@ async def execute_python_code(code: str, no_prints=True, max_count: int = 5,chro
     if max_count is not None:
         code = f"MAX_COUNT = {max_count}\n" + code
 
-    
-    
     header, footer = read_injectable_code()
-    full_code = chrome_path_code + header + "\n" + code + "\n" + footer
+    return chrome_path_code + header + "\n" + code + "\n" + footer
+
+
+def _script_env(traceparent=None, browser_profile=None, limits=None) -> dict[str, str]:
+    extra_env = {}
+    if traceparent:
+        # W3C trace context for anything the script itself instruments
+        extra_env["TRACEPARENT"] = traceparent
+    if browser_profile:
+        # PW_BROWSER_POOL açıksa header bu profilin Chrome'unu kiralar
+        extra_env["PW_BROWSER_PROFILE"] = browser_profile
+    if os.environ.get("PW_BROWSER_POOL"):
+        # bu çalıştırmanın kiraları; script nasıl biterse bitsin _start sonunda bırakılır
+        extra_env["PW_BROWSER_OWNER"] = uuid.uuid4().hex
+    if limits and limits.get("max_pages"):
+        extra_env["PW_MAX_PAGES"] = str(limits["max_pages"])
+    return extra_env
+
+
+async def _start(script_path, tmpdir, extra_env, pool, limits):
+    common = dict(env=extra_env, timeout=limits["timeout"], max_stdout=limits["max_stdout_bytes"])
+    # warm fork-server pool (PW_RUNNER_POOL_SIZE) – falls back to a cold subprocess.
+    # Namespace isolation needs a fresh process tree, so it always runs cold.
+    pool = pool if pool is not None else get_default_pool()
+    try:
+        if pool is not None and not limits.get("isolation"):
+            return await pool.run(script_path, cwd=tmpdir, rlimits=rlimits(limits), **common)
+        return await run_script(script_path, command_prefix=command_prefix(limits), **common)
+    finally:
+        if extra_env.get("PW_BROWSER_OWNER"):
+            # process group is gone (exit, timeout, kill on early stop): free its browser leases
+            await _release_browser_leases(extra_env["PW_BROWSER_OWNER"])
+
+
+async def _release_browser_leases(owner):
+    try:
+        await asyncio.shield(asyncio.to_thread(release_owner, os.environ["PW_BROWSER_POOL"], owner))
+    except Exception:
+        pass
+
+
+def run_usage(run: dict[str, Any]) -> dict[str, Any]:
+    """Resource usage of a finished run, from the child's ``wait4`` rusage."""
+    ru = run.get("rusage") or {}
+    return {
+        "duration": round(run.get("duration", 0.0), 4),
+        "cpu_seconds": round(ru.get("utime", 0.0) + ru.get("stime", 0.0), 4),
+        "max_rss_kb": ru.get("maxrss_kb", 0),
+        "output_bytes": len(run["stdout"].encode("utf-8", errors="replace")),
+        "stderr_bytes": len(run["stderr"].encode("utf-8", errors="replace")),
+    }
+
+
+def _to_result(run: dict[str, Any], no_prints=True, limits=None) -> dict[str, Any]:
+    data = run["stdout"].strip()
+    logs = run["stderr"].strip()
+    usage = run_usage(run)
+    violation = classify(run, limits or {})
+    if violation:
+        return {
+            "error": LIMIT_MESSAGES[violation].format(**(limits or {})),
+            "limit_violation": violation,
+            "logs": logs,
+            "usage": usage,
+        }
+
+    if data:
+        try:
+            data = json.loads(data)
+        except Exception:
+            data = None
+
+    result={}
+    if data is not None:
+         result["output"]= data
+
+    if no_prints==False:
+        result["prints"]= logs
+
+    result["usage"] = usage
+    return result
+
+
+async def execute_python_code(code: str, no_prints=True, max_count: int = 5,chrome_path=None,user_data_dir=None,traceparent=None,pool=None,browser_profile=None,limits=None) -> dict[str, Any]:
+    """*limits*: limits.resolve_limits() dict (default profile when None)."""
+    if not code.strip():
+        return {"success": False, "error": "No code provided", "stdout": "", "stderr": "", "json": None}
+
+    limits = limits or resolve_limits()
+    full_code = build_script(code, max_count, chrome_path, user_data_dir)
+    extra_env = _script_env(traceparent, browser_profile, limits)
 
     try:
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -62,35 +166,96 @@ async def execute_python_code(code: str, no_prints=True, max_count: int = 5,chro
             with open(temp_script_path, "w", encoding="utf-8") as temp_script:
                 temp_script.write(full_code)
 
-            result = subprocess.run(
-                [sys.executable, temp_script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=120
-            )
+            run = await _start(temp_script_path, tmpdir, extra_env, pool, limits)
+            return _to_result(run, no_prints, limits)
 
-            data = result.stdout.strip()
-            logs = result.stderr.strip()
+    except Exception as e:
+        return {"exception": str(e), "logs": ""}
 
-            if data:
-                try:
-                    data = json.loads(data)
-                except Exception:
-                    data = None
 
-            result={}
-            if data is not None:
-                 result["output"]= data
+async def stream_python_code(code: str, no_prints=True, max_count: int = 5, chrome_path=None, user_data_dir=None,
+                             traceparent=None, pool=None, browser_profile=None,
+                             limits=None) -> AsyncIterator[dict[str, Any]]:
+    """Run *code* and yield its ``emit()``-ed items while it is still running.
+
+    Items travel as NDJSON over a FIFO (``PW_RESULT_PATH``) so they never mix
+    with prints or the final ``OUTPUT``. Yields ``{"event": "item", "index", "data"}``
+    per item and finally ``{"event": "result", "count", "stopped_early", **execute_python_code result}``.
+    After ``max_count`` items the script is stopped (process group killed).
+    """
+    if not code.strip():
+        yield {"event": "result", "count": 0, "stopped_early": False, "error": "No code provided"}
+        return
 
-            if no_prints==False:
-                result["prints"]= logs
-            
-            return result
+    limits = limits or resolve_limits()
+    full_code = build_script(code, max_count, chrome_path, user_data_dir)
+    extra_env = _script_env(traceparent, browser_profile, limits)
+    loop = asyncio.get_running_loop()
 
-    except subprocess.TimeoutExpired:
-        return {"error": "Script execution timed out","logs": logs if 'logs' in locals() else ''}
-    except Exception as e:
-        return {"exception": str(e), "logs": logs if 'logs' in locals() else ''}
-    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        temp_script_path = os.path.join(tmpdir, "user_script.py")
+        with open(temp_script_path, "w", encoding="utf-8") as temp_script:
+            temp_script.write(full_code)
+        fifo = os.path.join(tmpdir, "results.ndjson")
+        os.mkfifo(fifo, 0o600)
+        extra_env["PW_RESULT_PATH"] = fifo
 
+        # okuyucu önce açılır; dummy writer script açana/kapatana kadar EOF'u engeller
+        rfd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        wfd = os.open(fifo, os.O_WRONLY)
+        reader = asyncio.StreamReader(limit=limits.get("max_stdout_bytes") or MAX_STDOUT_BYTES)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                                    os.fdopen(rfd, "rb", buffering=0))
+        run_task = asyncio.ensure_future(_start(temp_script_path, tmpdir, extra_env, pool, limits))
+        count = 0
+        stopped_early = False
+        oversized = False
+        try:
+            while True:
+                line_task = asyncio.ensure_future(reader.readline())
+                await asyncio.wait({line_task, run_task}, return_when=asyncio.FIRST_COMPLETED)
+                try:
+                    if not line_task.done():
+                        # script bitti: writer'ı kapat, kalan satırları EOF'a kadar oku
+                        if wfd is not None:
+                            os.close(wfd)
+                            wfd = None
+                        await line_task
+                    line = line_task.result()
+                except ValueError:
+                    # tek bir emit() kaydı okuyucu sınırını (max_stdout_bytes) aştı
+                    oversized = True
+                    break
+                if not line:
+                    break
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                count += 1
+                yield {"event": "item", "index": count - 1, "data": item}
+                if max_count is not None and count >= max_count and not run_task.done():
+                    stopped_early = True
+                    run_task.cancel()
+                    break
+            if oversized:
+                run_task.cancel()
+                result = {"error": LIMIT_MESSAGES["output"], "limit_violation": "output", "logs": ""}
+            elif stopped_early:
+                result = {}
+            else:
+                try:
+                    result = _to_result(await run_task, no_prints, limits)
+                except Exception as e:
+                    result = {"exception": str(e), "logs": ""}
+            yield {"event": "result", "count": count, "stopped_early": stopped_early, **result}
+        finally:
+            if not run_task.done():
+                run_task.cancel()
+                try:
+                    await run_task
+                except BaseException:
+                    pass
+            transport.close()
+            if wfd is not None:
+                os.close(wfd)
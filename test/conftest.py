@@ -0,0 +1,32 @@
+# test/conftest.py
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    """CACHE süreç geneli; testler birbirinin proje kopyalarını görmesin."""
+    from project.cache import CACHE
+    CACHE.clear()
+    yield
+    CACHE.clear()
+
+
+@pytest.fixture
+def db():
+    """Boş, bellekte bir Mongo veritabanı (mongomock-motor)."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["xray_test"]
+
+
+@pytest.fixture
+def run():
+    """Testlerde coroutine çalıştırmak için: run(coro)."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
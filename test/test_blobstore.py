@@ -0,0 +1,62 @@
+import os
+import time
+
+import pytest
+
+from project import blobstore
+from project.blobstore import collect_garbage, configure_blob_store, get_blob_store
+
+
+@pytest.fixture
+def local_store(tmp_path):
+    saved = dict(blobstore._config)
+    configure_blob_store({"backend": "local", "path": str(tmp_path)})
+    yield
+    blobstore._config.clear()
+    blobstore._config.update(saved)
+    blobstore._stores.clear()
+
+
+def _age(store, digest, seconds):
+    path = store._path(digest)
+    old = os.path.getmtime(path) - seconds
+    os.utime(path, (old, old))
+
+
+def test_put_read_dedup(db, run, local_store):
+    async def scenario():
+        store = get_blob_store(db)
+        data = b'{"data": [' + b",".join(b"%d" % i for i in range(50000)) + b"]}"
+        ref = await store.put(data)
+        assert ref["store"] == "local" and ref["size"] == len(data) and ref["storedSize"] < len(data)
+        assert await store.read(ref) == data
+
+        # aynı içerik tekrar yazılmaz, yaşı tazelenir
+        _age(store, ref["id"], 7200)
+        again = await store.put(data)
+        assert again == ref
+        assert [d async for d, _ in store.ids()] == [ref["id"]]
+        assert os.path.getmtime(store._path(ref["id"])) > time.time() - 60
+
+        async def chunks():
+            for i in range(0, len(data), 1000):
+                yield data[i:i + 1000]
+        assert await store.put_stream(chunks()) == ref
+    run(scenario())
+
+
+def test_collect_garbage(db, run, local_store):
+    async def scenario():
+        store = get_blob_store(db)
+        kept = await store.put(b"kept" * 1000)
+        orphan = await store.put(b"orphan" * 1000)
+        fresh = await store.put(b"fresh" * 1000)
+        await db.executions.insert_one({"executionId": "e1", "outputRef": kept})
+        _age(store, kept["id"], 7200)
+        _age(store, orphan["id"], 7200)
+
+        assert await collect_garbage(db, min_age=3600) == 1
+        remaining = {d async for d, _ in store.ids()}
+        assert remaining == {kept["id"], fresh["id"]}
+        assert await store.read(kept) == b"kept" * 1000
+    run(scenario())
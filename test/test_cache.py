@@ -0,0 +1,28 @@
+from project.cache import CACHE
+from project.service import find_script, save_script, update_script
+
+
+def test_save_script_invalidates_cache(db, run):
+    async def scenario():
+        first = await save_script(db, "p", "v1")
+        assert (await find_script(db, "p"))["code"] == "v1"
+        hits = CACHE.hits
+        assert (await find_script(db, "p"))["code"] == "v1"
+        assert CACHE.hits == hits + 1
+
+        second = await save_script(db, "p", "v2")
+        latest = await find_script(db, "p")
+        assert latest["scriptId"] == second["scriptId"] and latest["version"] == 2
+        assert (await find_script(db, "p", first["version"]))["code"] == "v1"
+
+        await update_script(db, second["scriptId"], code="v2b")
+        assert (await find_script(db, "p"))["code"] == "v2b"
+    run(scenario())
+
+
+def test_cached_value_is_a_copy(db, run):
+    async def scenario():
+        await save_script(db, "p", "v1")
+        (await find_script(db, "p"))["code"] = "mutated"
+        assert (await find_script(db, "p"))["code"] == "v1"
+    run(scenario())
@@ -0,0 +1,100 @@
+# test/test_diff.py
+from datetime import datetime, timedelta
+
+from project.indexes import ensure_indexes
+from project.diff import prepare_result_state, record_result_state, reconstruct_data
+from project.retention import RetentionTask
+
+POLICY = {"enabled": True, "keyField": "id", "fullEvery": 50}
+T0 = datetime(2026, 1, 1)
+
+
+async def finish(db, execution_id, start_minute, items, policy=POLICY):
+    """_record_execution'daki sıra: farkı hesapla, execution'ı yaz, durumu ilerlet."""
+    stored, summary, mode, update = await prepare_result_state(db, "p", "s", execution_id, {"data": items}, policy)
+    execution = {
+        "executionId": execution_id, "projectId": "p", "scriptId": "s", "status": "success",
+        "startTime": (T0 + timedelta(minutes=start_minute)).isoformat(),
+        "output": "", "outputRef": None, "result": stored, "resultMode": mode, "diff": summary,
+    }
+    await db.executions.insert_one(execution)
+    await record_result_state(db, update)
+    execution.pop("_id")
+    return execution
+
+
+def items(*values):
+    return [{"id": i, "v": v} for i, v in enumerate(values)]
+
+
+def test_diff_chain_round_trip(db, run):
+    async def scenario():
+        first = await finish(db, "e1", 0, items("a", "b", "c"))
+        second = await finish(db, "e2", 1, items("a", "B", "c", "d"))
+        third = await finish(db, "e3", 2, items("a", "B", "d")[:2])
+        assert first["resultMode"] == "full"
+        assert second["resultMode"] == "diff"
+        assert second["diff"]["baseExecutionId"] == "e1"
+        assert [e["key"] for e in second["result"]["changed"]] == ["1"]
+        assert [e["key"] for e in second["result"]["added"]] == ["3"]
+        assert third["result"]["removed"] == ["2", "3"]
+        assert await reconstruct_data(db, second) == items("a", "B", "c", "d")
+        assert await reconstruct_data(db, third) == items("a", "B")
+        state = await db.result_states.find_one({"projectId": "p", "scriptId": "s"})
+        assert state["executionId"] == "e3" and state["runs"] == 3
+    run(scenario())
+
+
+def test_full_every_stores_full_data(db, run):
+    async def scenario():
+        policy = {**POLICY, "fullEvery": 2}
+        await finish(db, "e1", 0, items("a"), policy)
+        second = await finish(db, "e2", 1, items("b"), policy)
+        third = await finish(db, "e3", 2, items("c"), policy)
+        assert second["resultMode"] == "full" and second["result"] == {"data": items("b")}
+        assert third["resultMode"] == "diff" and third["diff"]["baseExecutionId"] == "e2"
+    run(scenario())
+
+
+def test_state_is_not_advanced_before_insert(db, run):
+    async def scenario():
+        await finish(db, "e1", 0, items("a"))
+        # execution yazılamadıysa record_result_state hiç çağrılmaz
+        await prepare_result_state(db, "p", "s", "lost", {"data": items("b")}, POLICY)
+        state = await db.result_states.find_one({"projectId": "p", "scriptId": "s"})
+        assert state["executionId"] == "e1"
+    run(scenario())
+
+
+def test_overlapping_runs(db, run):
+    async def scenario():
+        await finish(db, "full", 0, items("a", "b"))
+        # uzun çalıştırma 1. dakikada başlar, kısa olan 2. dakikada başlayıp önce biter
+        short = await finish(db, "short", 2, items("a", "B"))
+        long = await finish(db, "long", 1, items("A", "B", "c"))
+        assert long["diff"]["baseExecutionId"] == "short"
+        assert await reconstruct_data(db, short) == items("a", "B")
+        assert await reconstruct_data(db, long) == items("A", "B", "c")
+
+        # retention "long"u tutup daha eskileri silmek isterse zinciri korur
+        base = {"projectId": "p", "scriptId": "s"}
+        query = {**base, "$and": [{"startTime": {"$lt": long["startTime"]}}]}
+        assert await RetentionTask(db)._diff_chain_ids(base, query) == {"full"}
+    run(scenario())
+
+
+def test_concurrent_state_advance_keeps_valid_diff(db, run):
+    async def scenario():
+        await ensure_indexes(db)  # iyimser kilit result_states'teki unique index'e dayanır
+        await finish(db, "e1", 0, items("a"))
+        stored, summary, mode, update = await prepare_result_state(db, "p", "s", "late", {"data": items("x")}, POLICY)
+        await finish(db, "e2", 1, items("b"))
+        await db.executions.insert_one({"executionId": "late", "projectId": "p", "scriptId": "s", "status": "success",
+                                        "startTime": T0.isoformat(), "output": "", "outputRef": None,
+                                        "result": stored, "resultMode": mode, "diff": summary})
+        assert await record_result_state(db, update) is False
+        late = await db.executions.find_one({"executionId": "late"}, {"_id": 0})
+        assert await reconstruct_data(db, late) == items("x")
+        state = await db.result_states.find_one({"projectId": "p", "scriptId": "s"})
+        assert state["executionId"] == "e2"
+    run(scenario())
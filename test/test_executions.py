@@ -0,0 +1,57 @@
+from project.service import get_execution, list_executions, list_projects, save_execution
+from project.service import get_execution, save_execution
+
+
+def test_save_execution(db, run):
+    async def scenario():
+        saved = await save_execution(db, "p", {"scriptId": "s", "scriptVersion": "2", "status": "success",
+                                               "result": ["not", "a", "dict"], "resultCount": 3})
+        assert saved["scriptVersion"] == 2
+        assert saved["result"] == {}
+        stored = await get_execution(db, saved["executionId"])
+        assert stored["projectId"] == "p" and stored["status"] == "success"
+    run(scenario())
+
+
+def _walk(fetch):
+    """fetch(cursor) sayfalarını nextCursor bitene kadar gezer → tüm kayıtlar."""
+    async def walk():
+        items, cursor = [], None
+        while True:
+            page, cursor = await fetch(cursor)
+            items += page
+            if cursor is None:
+                return items
+    return walk()
+
+
+def test_list_executions_cursor(db, run):
+    async def scenario():
+        # aynı startTime'lı kayıtlar: sıra executionId ile belirlenir
+        docs = [{"executionId": f"e{i:02d}", "projectId": "p", "scriptId": "s", "status": "success",
+                 "startTime": f"2024-01-01T00:00:{i // 3:02d}", "output": {"data": [i]}} for i in range(25)]
+        docs.append({**docs[0], "executionId": "other", "projectId": "q"})
+        await db.executions.insert_many(docs)
+
+        async def fetch(cursor):
+            page = await list_executions(db, "p", page_size=4, cursor=cursor, total="exact")
+            assert page["total"] == 25
+            assert all("output" not in e for e in page["executions"])
+            return page["executions"], page["nextCursor"]
+        seen = [e["executionId"] for e in await _walk(fetch)]
+        expected = [d["executionId"] for d in sorted(docs[:25], key=lambda d: (d["startTime"], d["executionId"]),
+                                                      reverse=True)]
+        assert seen == expected
+    run(scenario())
+
+
+def test_list_projects_cursor(db, run):
+    async def scenario():
+        await db.projects.insert_many([{"projectId": f"p{i:02d}", "tags": ["t"], "prompts": []} for i in range(7)])
+
+        async def fetch(cursor):
+            page = await list_projects(db, tag="t", limit=3, cursor=cursor)
+            return page["projects"], page["nextCursor"]
+        seen = [p["projectId"] for p in await _walk(fetch)]
+        assert seen == [f"p{i:02d}" for i in range(7)]
+    run(scenario())
@@ -0,0 +1,36 @@
+# test/test_jobs.py
+import asyncio
+
+from project.jobs import JobQueue, enqueue_job
+from project.service import get_project
+
+
+def test_first_sight_schedules_one_interval_later(db, run):
+    async def scenario():
+        await db.projects.insert_one({"projectId": "p", "projectStatus": "active", "executionConfig": {"interval": 60}})
+        assert (await get_project(db, "p")).get("lastScheduledAt") is None  # cache'e alındı
+        queue = JobQueue(db, scheduler=False)
+        assert await queue.schedule_due() == 0
+        assert await db.jobs.count_documents({}) == 0
+        assert (await get_project(db, "p"))["lastScheduledAt"]  # schedule_due cache'i geçersiz kıldı
+        await db.projects.update_one({"projectId": "p"}, {"$set": {"lastScheduledAt": "2000-01-01T00:00:00"}})
+        assert await queue.schedule_due() == 1
+        assert await queue.schedule_due() == 0
+    run(scenario())
+
+
+def test_heartbeat_extends_lease(db, run):
+    async def scenario():
+        await db.projects.insert_one({"projectId": "p"})
+        job = await enqueue_job(db, {"projectId": "p"})
+        queue = JobQueue(db, lease_seconds=0.3, scheduler=False)
+        claimed = await queue.claim()
+        first = claimed["lockedUntil"]
+        task = asyncio.create_task(queue._heartbeat(job["jobId"]))
+        await asyncio.sleep(0.25)
+        task.cancel()
+        extended = (await db.jobs.find_one({"jobId": job["jobId"]}))["lockedUntil"]
+        assert extended > first
+        await queue.recover_stale()
+        assert (await db.jobs.find_one({"jobId": job["jobId"]}))["status"] == "running"
+    run(scenario())
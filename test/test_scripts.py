@@ -0,0 +1,24 @@
+import asyncio
+
+from project.indexes import ensure_indexes
+from project.service import list_scripts, save_script
+
+
+def test_concurrent_save_script_versions(db, run):
+    async def scenario():
+        await ensure_indexes(db)
+        saved = await asyncio.gather(*(save_script(db, "p", f"print({i})") for i in range(20)))
+        assert sorted(s["version"] for s in saved) == list(range(1, 21))
+        stored = await list_scripts(db, "p")
+        assert len(stored) == 20 and len({s["version"] for s in stored}) == 20
+    run(scenario())
+
+
+def test_counter_continues_after_existing_scripts(db, run):
+    async def scenario():
+        await ensure_indexes(db)
+        # sayaçtan önce kaydedilmiş script'ler
+        await db.scripts.insert_many([{"scriptId": f"old{v}", "projectId": "p", "version": v} for v in (1, 2, 3)])
+        saved = await asyncio.gather(save_script(db, "p", "a"), save_script(db, "p", "b"))
+        assert sorted(s["version"] for s in saved) == [4, 5]
+    run(scenario())
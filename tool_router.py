@@ -1,6 +1,9 @@
 from typing import Dict, Any, List, Optional
 from contextlib import AsyncExitStack
+import time
 from tool_client import ToolClient
+from metrics import TOOL_CALLS, TOOL_LATENCY
+from tracing import TRACER
 
 class ToolRouter(ToolClient):
     """
@@ -61,5 +64,14 @@ class ToolRouter(ToolClient):
             prefix = f"{client_id}__"
             if name.startswith(prefix):
                 raw_name = name[len(prefix):]
-                return await client.call_tool(call_id, raw_name, args)
+                started = time.perf_counter()
+                outcome = "error"
+                try:
+                    with TRACER.span("tool.call", client=client_id, tool=raw_name, call_id=call_id):
+                        result = await client.call_tool(call_id, raw_name, args)
+                    outcome = "ok"
+                    return result
+                finally:
+                    TOOL_LATENCY.labels(client_id).observe(time.perf_counter() - started)
+                    TOOL_CALLS.labels(client_id, outcome).inc()
         raise ValueError(f"Tool '{name}' not found (called with args={args})")
@@ -3,6 +3,7 @@ import json
 from tool_client import ToolClient
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from tracing import TRACER
 
 def is_valid_openai_parameters(params):
     """
@@ -72,5 +73,14 @@ class ToolStdioClient(ToolClient):
         or the raw result as a fallback.
         """
         print(f"[DEBUG] call_tool: tool_name={tool_name}, args={args}")
-        result = (await self.session.call_tool(tool_name, args)).model_dump()
+        with TRACER.span("mcp.call_tool", server=self.server_id, tool=tool_name) as span:
+            # Trace context travels in the request _meta so the server can
+            # hand it on to whatever it spawns.
+            traceparent = span.traceparent()
+            if traceparent:
+                result = await self.session.call_tool(tool_name, args, meta={"traceparent": traceparent})
+            else:
+                result = await self.session.call_tool(tool_name, args)
+            result = result.model_dump()
+            span.set_attribute("is_error", bool(result.get("isError")))
         return result["content"][0]["text"]
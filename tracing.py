@@ -0,0 +1,312 @@
+"""Lightweight tracing for the agent → router → tool → subprocess path.
+
+Usage::
+
+    from tracing import TRACER
+
+    with TRACER.span("tool.call", tool=name) as span:
+        ...
+        span.set_attribute("bytes", n)
+
+Spans nest through a ``ContextVar``, so a span opened in the agent loop is
+the parent of every span opened further down the same task. Sampling is
+decided once per trace (at the root span); with ``sample_ratio == 0`` (the
+default) ``span()`` returns a shared no-op object and costs one attribute
+check. Finished spans are handed to a background thread which writes them
+as JSON lines or posts them in OTLP/JSON format to a collector.
+
+The W3C ``traceparent`` header format is used to carry context across
+process boundaries (MCP ``_meta``, subprocess environment).
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("xray.tracing")
+
+TRACEPARENT_ENV = "TRACEPARENT"
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; every method is a no-op."""
+
+    sampled = False
+    trace_id = span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attrs: Any) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+    def traceparent(self) -> Optional[str]:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Optional["Span"]] = ContextVar("xray_current_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "sampled",
+                 "attributes", "start_ns", "end_ns", "status", "_token", "_parent")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 sampled: bool, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = "ok"
+        self._token = None
+        self._parent = None
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._parent = _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.record_error(exc)
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited from a different context (e.g. an async generator
+            # finalised by another task) – just restore the parent.
+            _current.set(self._parent)
+        if self.sampled:
+            self.tracer._export(self)
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attrs: Any) -> None:
+        self.attributes.update(attrs)
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.attributes["error.type"] = type(exc).__name__
+        self.attributes["error.message"] = str(exc)[:500]
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def parse_traceparent(value: Optional[str]):
+    """Return ``(trace_id, parent_span_id, sampled)`` or ``None``."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == "01"
+
+
+def current_span():
+    """The active span, or :data:`NOOP_SPAN` outside of any trace."""
+    span = _current.get()
+    return span if span is not None else NOOP_SPAN
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+class JsonlExporter:
+    """Append finished spans to a local JSON-lines file."""
+
+    def __init__(self, path: str = "traces.jsonl"):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """POST spans in OTLP/JSON format (``/v1/traces``) to a collector."""
+
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces", service_name: str = "xray", timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "xray"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2 if s.status == "error" else 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, spans: List[Span]) -> None:
+        body = json.dumps(self._payload(spans)).encode("utf-8")
+        req = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(req, timeout=self.timeout).close()
+
+
+# ---------------------------------------------------------------------------
+# Tracer
+# ---------------------------------------------------------------------------
+
+class Tracer:
+    def __init__(self, sample_ratio: float = 0.0, exporter=None, batch_size: int = 128, flush_interval: float = 1.0):
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_ratio > 0 and self.exporter is not None
+
+    def configure(self, sample_ratio: float, exporter) -> None:
+        self.shutdown()
+        self.sample_ratio = max(0.0, min(float(sample_ratio), 1.0))
+        self.exporter = exporter
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name="xray-trace-export", daemon=True)
+            self._thread.start()
+            # Flush what's queued when short-lived processes (CLI) exit.
+            atexit.register(self.shutdown)
+
+    def span(self, name: str, traceparent: Optional[str] = None, **attrs: Any):
+        """Open a child of the current span, or a new root (sampling decided here).
+
+        *traceparent* continues a trace started in another process.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current.get()
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, parent.sampled, attrs)
+        remote = parse_traceparent(traceparent)
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+            return Span(self, name, trace_id, parent_id, sampled, attrs)
+        sampled = random.random() < self.sample_ratio
+        # Unsampled roots still become the current span so that their
+        # children are consistently dropped instead of re-sampled.
+        return Span(self, name, "%032x" % random.getrandbits(128), None, sampled, attrs)
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current.get()
+        return span.traceparent() if span is not None and span.sampled else None
+
+    # --- export thread ---
+    def _export(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                item = ...
+            if item is None:
+                self._flush(batch)
+                return
+            if item is not ...:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: List[Span]) -> None:
+        if not batch or self.exporter is None:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as exc:
+            logger.warning("Trace export failed (%d spans dropped): %r", len(batch), exc)
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+TRACER = Tracer()
+
+
+def configure_tracing(cfg: Optional[Dict[str, Any]]) -> Tracer:
+    """Configure :data:`TRACER` from the ``tracing:`` section of xray_config.yaml."""
+    cfg = cfg or {}
+    ratio = float(cfg.get("sample_ratio", 0.0) or 0.0)
+    kind = cfg.get("exporter", "jsonl")
+    if kind == "jsonl":
+        exporter = JsonlExporter(cfg.get("path", "traces.jsonl"))
+    elif kind == "otlp":
+        exporter = OtlpHttpExporter(cfg.get("endpoint", "http://localhost:4318/v1/traces"),
+                                    service_name=cfg.get("service_name", "xray"))
+    else:
+        raise ValueError(f"Unknown tracing exporter: {kind}")
+    TRACER.configure(ratio, exporter)
+    return TRACER
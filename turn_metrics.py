@@ -0,0 +1,250 @@
+import time
+from typing import Any, Dict, List, Optional
+
+# ---------------------------------------------------------------------------
+# Token counting
+# ---------------------------------------------------------------------------
+
+# Approximate tokens per character when no tokenizer is installed.
+_CHARS_PER_TOKEN: float = 4.0
+# Per-message framing overhead used by OpenAI chat formats.
+_TOKENS_PER_MESSAGE: int = 3
+
+_encoders: Dict[str, Any] = {}
+
+
+def _get_encoder(model_id: Optional[str]):
+    """Return a cached tiktoken encoder for *model_id*, or ``None`` if tiktoken
+    is not installed."""
+    key = model_id or ""
+    if key in _encoders:
+        return _encoders[key]
+    try:
+        import tiktoken
+    except ImportError:
+        _encoders[key] = None
+        return None
+    try:
+        enc = tiktoken.encoding_for_model(model_id) if model_id else tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Non-OpenAI model ids (qwen3:14b, deepseek-r1 …) – close enough.
+        enc = tiktoken.get_encoding("cl100k_base")
+    _encoders[key] = enc
+    return enc
+
+
+def token_source(model_id: Optional[str]) -> str:
+    """``"tokenizer"`` when a local tokenizer is available, else ``"estimate"``."""
+    return "tokenizer" if _get_encoder(model_id) is not None else "estimate"
+
+
+def count_tokens(text: Optional[str], model_id: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    enc = _get_encoder(model_id)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return max(1, round(len(text) / _CHARS_PER_TOKEN))
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model_id: Optional[str] = None) -> int:
+    """Local fallback for ``usage.prompt_tokens`` of a chat request."""
+    total = 0
+    for m in messages:
+        total += _TOKENS_PER_MESSAGE
+        content = m.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content, model_id)
+        for tc in m.get("tool_calls") or []:
+            fn = tc.get("function", {})
+            total += count_tokens(fn.get("name", ""), model_id)
+            total += count_tokens(str(fn.get("arguments", "")), model_id)
+    return total + _TOKENS_PER_MESSAGE  # reply priming
+
+
+# ---------------------------------------------------------------------------
+# Per-turn record
+# ---------------------------------------------------------------------------
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+class TurnMetrics:
+    """Timing and token accounting for one iteration of the agent tool loop.
+
+    An iteration is: refine the context → one LLM request → zero or more tool
+    calls. ``to_dict()`` is what gets attached to the assistant message
+    ``meta["metrics"]``.
+    """
+
+    def __init__(self, model_id: str, loop: int, stream: bool):
+        self.model_id = model_id
+        self.loop = loop
+        self.stream = stream
+        self.started_at = time.perf_counter()
+
+        self.refine_s: Optional[float] = None
+        self._request_at: Optional[float] = None
+        self._first_token_at: Optional[float] = None
+        self._last_token_at: Optional[float] = None
+        self._response_done_at: Optional[float] = None
+        self._gaps: List[float] = []
+
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.token_source: Optional[str] = None
+        self._streamed_tokens: int = 0
+
+        self.tools: List[Dict[str, Any]] = []
+        self.finished_at: Optional[float] = None
+
+    # --- refine ---
+    def refine_done(self, started: float) -> None:
+        self.refine_s = time.perf_counter() - started
+
+    # --- LLM request ---
+    def request_sent(self) -> None:
+        self._request_at = time.perf_counter()
+
+    def on_delta(self, text: Optional[str] = None) -> None:
+        """Record a streamed content/tool-call delta."""
+        now = time.perf_counter()
+        if self._first_token_at is None:
+            self._first_token_at = now
+        elif self._last_token_at is not None:
+            self._gaps.append(now - self._last_token_at)
+        self._last_token_at = now
+        if text:
+            self._streamed_tokens += count_tokens(text, self.model_id)
+
+    def response_done(self) -> None:
+        self._response_done_at = time.perf_counter()
+        if self._first_token_at is None:
+            # Non-stream response (or empty stream): first token == full reply.
+            self._first_token_at = self._last_token_at = self._response_done_at
+
+    def set_usage(self, usage: Any) -> None:
+        """Take token counts from an OpenAI ``usage`` object, if the server sent one."""
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if prompt is None and completion is None:
+            return
+        self.prompt_tokens = prompt
+        self.completion_tokens = completion
+        self.token_source = "usage"
+
+    def fill_missing_tokens(self, messages: List[Dict[str, Any]], reply: str, tool_calls: List[Dict[str, Any]]) -> None:
+        """Fallback to the local tokenizer when the server returned no usage."""
+        if self.token_source == "usage":
+            return
+        self.token_source = token_source(self.model_id)
+        self.prompt_tokens = count_message_tokens(messages, self.model_id)
+        completion = count_tokens(reply, self.model_id)
+        for tc in tool_calls:
+            completion += count_tokens(tc.get("name") or "", self.model_id)
+            completion += count_tokens(tc.get("arguments") or "", self.model_id)
+        self.completion_tokens = completion
+
+    def live_tps(self) -> float:
+        """Running decode rate while streaming (for status notifications)."""
+        if self._first_token_at is None or self._last_token_at is None:
+            return 0.0
+        return self._streamed_tokens / max(self._last_token_at - self._first_token_at, 1e-3)
+
+    # --- tools ---
+    def tool_done(self, call_id: str, name: str, started: float, error: bool = False) -> None:
+        self.tools.append({
+            "call_id": call_id,
+            "name": name,
+            "ms": _ms(time.perf_counter() - started),
+            "error": error,
+        })
+
+    # --- summary ---
+    def finish(self) -> Dict[str, Any]:
+        self.finished_at = time.perf_counter()
+        return self.to_dict()
+
+    @property
+    def ttft_s(self) -> Optional[float]:
+        if self._request_at is None or self._first_token_at is None:
+            return None
+        return self._first_token_at - self._request_at
+
+    @property
+    def decode_s(self) -> Optional[float]:
+        if self._first_token_at is None or self._last_token_at is None:
+            return None
+        return self._last_token_at - self._first_token_at
+
+    @property
+    def decode_tps(self) -> Optional[float]:
+        # Tokens after the first one, over the time it took to produce them.
+        if not self.completion_tokens or not self.decode_s:
+            return None
+        return (self.completion_tokens - 1) / self.decode_s if self.completion_tokens > 1 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        llm_s = None
+        if self._request_at is not None and self._response_done_at is not None:
+            llm_s = self._response_done_at - self._request_at
+        end = self.finished_at or time.perf_counter()
+        decode_tps = self.decode_tps
+        return {
+            "loop": self.loop,
+            "model": self.model_id,
+            "stream": self.stream,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "token_source": self.token_source,
+            "refine_ms": _ms(self.refine_s),
+            "ttft_ms": _ms(self.ttft_s),
+            "decode_ms": _ms(self.decode_s),
+            "decode_tps": round(decode_tps, 2) if decode_tps is not None else None,
+            "itl_ms": _ms(sum(self._gaps) / len(self._gaps)) if self._gaps else None,
+            "itl_max_ms": _ms(max(self._gaps)) if self._gaps else None,
+            "llm_ms": _ms(llm_s),
+            "tools": self.tools,
+            "tool_ms": round(sum(t["ms"] for t in self.tools), 2),
+            "total_ms": _ms(end - self.started_at),
+        }
+
+
+def collect_turn_metrics(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pull every ``meta["metrics"]`` record out of a memory snapshot."""
+    out = []
+    for m in messages:
+        rec = m.get("meta", {}).get("metrics")
+        if rec:
+            out.append({"msg_id": m["meta"].get("id"), **rec})
+    return out
+
+
+def summarize_turn_metrics(turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate totals across turns, grouped by model id."""
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for t in turns:
+        s = by_model.setdefault(t.get("model") or "unknown", {
+            "turns": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "llm_ms": 0.0, "tool_ms": 0.0, "refine_ms": 0.0, "_ttft": [], "_tps": [],
+        })
+        s["turns"] += 1
+        s["prompt_tokens"] += t.get("prompt_tokens") or 0
+        s["completion_tokens"] += t.get("completion_tokens") or 0
+        s["llm_ms"] += t.get("llm_ms") or 0
+        s["tool_ms"] += t.get("tool_ms") or 0
+        s["refine_ms"] += t.get("refine_ms") or 0
+        if t.get("ttft_ms") is not None:
+            s["_ttft"].append(t["ttft_ms"])
+        if t.get("decode_tps") is not None:
+            s["_tps"].append(t["decode_tps"])
+    for s in by_model.values():
+        ttft, tps = s.pop("_ttft"), s.pop("_tps")
+        s["avg_ttft_ms"] = round(sum(ttft) / len(ttft), 2) if ttft else None
+        s["avg_decode_tps"] = round(sum(tps) / len(tps), 2) if tps else None
+        for k in ("llm_ms", "tool_ms", "refine_ms"):
+            s[k] = round(s[k], 2)
+    return by_model
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os, asyncio, logging, traceback, uuid, json, time
@@ -17,8 +17,15 @@ from openai_agent import OpenAIAgent
 from context_memory import ContextMemory
 from tool_router import ToolRouter
 from tool_websocket_client import ToolWebSocketClient
+from turn_metrics import collect_turn_metrics, summarize_turn_metrics
+import metrics
+from tracing import TRACER, configure_tracing
 
 from project.init import setup_all
+from project.jobs import JobQueue
+from project.retention import RetentionTask
+from project.blobstore import configure_blob_store
+from project.cache import configure_cache
 from project.db import get_db
 
 logger = logging.getLogger("xray")
@@ -31,6 +38,7 @@ async def agent_status_notify(status):
     await broadcast_ws_event({"event": "agent_status", "data": status})
 
 async def broadcast_ws_event(event_data):
+    started = time.perf_counter()
     closed = set()
     for ws in ws_clients:
         try:
@@ -38,11 +46,15 @@ async def broadcast_ws_event(event_data):
         except Exception:
             closed.add(ws)
     ws_clients.difference_update(closed)
+    metrics.WS_BROADCAST_LATENCY.observe(time.perf_counter() - started)
 
 async def setup_app_state(app):
     config = load_xray_config()
     mongo_uri, db_name = get_db_config(config)
     app.state.db = get_db(mongo_uri, db_name)
+    configure_tracing(config.get("tracing"))
+    configure_blob_store(config.get("blob_store"))
+    configure_cache(config.get("cache"))
     models = config.get("models", [])
     tools = config.get("tools", [])
     tool_clients = [build_tool_from_config(t) for t in tools]
@@ -57,7 +69,18 @@ async def setup_app_state(app):
     app.state.xray_models = models
     app.state.xray_tools = tools
 
-    setup_all(app, tool_clients=tool_clients)
+    await setup_all(app, tool_clients=tool_clients,
+                    create_indexes=config.get("xray", {}).get("ensure_indexes", True))
+
+    jobs_cfg = dict(config.get("jobs") or {})
+    if jobs_cfg.pop("enabled", True):
+        app.state.jobs = JobQueue(app.state.db, **jobs_cfg)
+        await app.state.jobs.start()
+
+    retention_cfg = dict(config.get("retention") or {})
+    if retention_cfg.pop("enabled", True):
+        app.state.retention = RetentionTask(app.state.db, **retention_cfg)
+        await app.state.retention.start()
 
     app.state.memory.add_observer(lambda memory: asyncio.create_task(
         broadcast_ws_event({"event": "memory_update", "data": {"messages": memory.refine()}})
@@ -67,7 +90,17 @@ async def setup_app_state(app):
     app.state.router = ToolRouter([*tool_clients, app.state.ui_tool_client])
     await app.state.router.__aenter__()
 
+    metrics.preallocate(
+        model_ids=[m.get("model_id") for m in models if m.get("model_id")],
+        client_ids=[c.server_id for c in app.state.router.clients if hasattr(c, "server_id")],
+    )
+
 async def cleanup_app_state(app):
+    if getattr(app.state, "jobs", None) is not None:
+        await app.state.jobs.stop()
+    if getattr(app.state, "retention", None) is not None:
+        await app.state.retention.stop()
+    TRACER.shutdown()
     if hasattr(app.state, 'memory'):
         app.state.memory.clear_observers()
     if hasattr(app.state, "router"):
@@ -102,6 +135,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (/api/chat/{msg_id}) keeps label cardinality bounded.
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUESTS.labels(request.method, path, str(status)).inc()
+        metrics.HTTP_LATENCY.labels(request.method, path).observe(time.perf_counter() - started)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    metrics.MEMORY_MESSAGES.set(len(app.state.memory))
+    metrics.WS_CLIENTS.set(len(ws_clients))
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.websocket("/ws/bridge")
 async def ws_bridge(ws: WebSocket):
     await ws.accept()
@@ -234,6 +288,7 @@ async def replay_chat(request: Request):
                     context_memory=memory,
                     on_status_update=agent_status_notify,
                     max_tool_loop=getattr(app.state, "max_tool_loop", 10),
+                    include_usage=model_cfg.get("include_usage", True),
                 ) as agent:
                     await agent.ask(
                         msg["content"],
@@ -282,6 +337,7 @@ async def replay_until_message(until_id: str, request: Request):
             context_memory=memory,
             on_status_update=agent_status_notify,
             max_tool_loop=getattr(app.state, "max_tool_loop", 10),
+            include_usage=model_cfg.get("include_usage", True),
         ) as agent:
             # until_id mesajını stream ile yeniden çalıştır
             agent_stream = await agent.ask(original_msgs[idx]["content"], stream=True)
@@ -326,6 +382,11 @@ async def restart_backend():
 async def get_chat_prompts():
     return app.state.memory.snapshot()
 
+@app.get("/api/chat/metrics")
+async def get_chat_metrics():
+    turns = collect_turn_metrics(app.state.memory.snapshot())
+    return {"turns": turns, "summary": summarize_turn_metrics(turns)}
+
 @app.post("/api/chat/prompts")
 async def set_chat_prompts(request: Request):
     data = await request.json()
@@ -370,6 +431,7 @@ async def ask(request: Request):
         context_memory=app.state.memory,
         on_status_update=agent_status_notify,
         max_tool_loop=getattr(app.state, "max_tool_loop", 10),
+        include_usage=model_cfg.get("include_usage", True),
     ) as agent:
         reply = await agent.ask(
             data["message"],
@@ -401,6 +463,7 @@ async def ask_stream(request: Request):
                 context_memory=app.state.memory,
                 on_status_update=agent_status_notify,
                 max_tool_loop=getattr(app.state, "max_tool_loop", 10),
+                include_usage=model_cfg.get("include_usage", True),
            ) as agent:
                 agent_stream = await agent.ask(prompt, stream=True)
                 async for sse in agent_stream:
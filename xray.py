@@ -2,13 +2,18 @@
 import argparse
 import asyncio
 import json
+import statistics
 import sys
+import time
+from collections import Counter
 from xray_config import load_xray_config, get_db_config
 from project.db import get_db
-from project.service import run_script_for_project
+from project.service import run_script_for_project, select_project_ids
+from project.blobstore import configure_blob_store
 
 cfg = load_xray_config()
 mongo_uri, db_name = get_db_config(cfg)
+configure_blob_store(cfg.get("blob_store"))
 
 def print_execution(exe):
     print("\n==== EXECUTION RESULT ====")
@@ -21,7 +26,12 @@ def print_execution(exe):
     print("\n--- Output ---")
     try:
         output = exe.get("output", "")
-        if output:
+        ref = exe.get("outputRef")
+        if ref:
+            print(f"(Stored in {ref['store']} blob store: {ref['size']} bytes, "
+                  f"GET /api/execution/{exe.get('executionId')}/output)")
+            print(json.dumps(exe.get("result"), ensure_ascii=False, indent=2))
+        elif output:
             try:
                 out_obj = json.loads(output)
                 print(json.dumps(out_obj, ensure_ascii=False, indent=2))
@@ -53,21 +63,109 @@ async def run(project_id, script_id=None, script_version=None, max_count=3):
     print_execution(execution)
 
 
+async def run_batch(project_ids=None, tags=None, all_active=False, concurrency=4,
+                    script_version=None, max_count=3):
+    """
+    Birden çok projeyi tek süreçte, tek DB bağlantısıyla, en fazla `concurrency`
+    tanesi aynı anda olacak şekilde çalıştırır. Her execution bitince stdout'a
+    bir JSON satırı yazılır; en sonda stderr'e özet basılır.
+    """
+    db = get_db(mongo_uri, db_name)
+    try:
+        ids = await select_project_ids(db, project_ids, tags, all_active)
+        if not ids:
+            print("[ERROR] No projects selected", file=sys.stderr)
+            return 1
+        print(f"[batch] {len(ids)} project(s), concurrency={concurrency}", file=sys.stderr)
+
+        sem = asyncio.Semaphore(concurrency)
+        results = []
+
+        async def one(project_id):
+            async with sem:
+                started = time.perf_counter()
+                record = {"projectId": project_id}
+                try:
+                    execution = await run_script_for_project(
+                        db, project_id, script_version=script_version, max_count=max_count
+                    )
+                    record.update(
+                        status=execution.get("status"),
+                        executionId=execution.get("executionId"),
+                        scriptVersion=execution.get("scriptVersion"),
+                        resultCount=execution.get("resultCount"),
+                        errorMessage=(execution.get("errorMessage") or "")[:500],
+                    )
+                except ValueError as e:
+                    record.update(status="skipped", errorMessage=str(e))
+                except Exception as e:
+                    record.update(status="error", errorMessage=f"{type(e).__name__}: {e}")
+                record["durationSec"] = round(time.perf_counter() - started, 3)
+                results.append(record)
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+
+        batch_started = time.perf_counter()
+        await asyncio.gather(*(one(pid) for pid in ids))
+        print_summary(results, time.perf_counter() - batch_started)
+        return 0 if all(r["status"] == "success" for r in results) else 2
+    finally:
+        db.client.close()
+
+
+def print_summary(results, elapsed):
+    out = sys.stderr
+    statuses = Counter(r["status"] for r in results)
+    durations = [r["durationSec"] for r in results]
+    print("\n==== BATCH SUMMARY ====", file=out)
+    print(f"Projects    : {len(results)}", file=out)
+    print(f"Statuses    : {dict(statuses)}", file=out)
+    print(f"Wall time   : {elapsed:.1f} s", file=out)
+    if durations:
+        print(f"Duration    : mean {statistics.fmean(durations):.2f} s, "
+              f"median {statistics.median(durations):.2f} s, max {max(durations):.2f} s", file=out)
+    print("\n  duration  status          results  project", file=out)
+    for r in sorted(results, key=lambda r: r["durationSec"], reverse=True):
+        print(f"  {r['durationSec']:>8.2f}  {r['status']:<14} {r.get('resultCount') or 0:>8}  {r['projectId']}", file=out)
+    print("=======================\n", file=out)
+
+
 def main():
-    parser = argparse.ArgumentParser(description="XRAY CLI - Run a script for a project (direct db, no API)")
-    parser.add_argument("project",   help="Project ID (required)")
-    parser.add_argument("--script-id", "-i", required=False, help="Script ID (optional)")
+    parser = argparse.ArgumentParser(description="XRAY CLI - Run scripts for one or many projects (direct db, no API)")
+    parser.add_argument("projects", nargs="*", help="Project ID(s)")
+    parser.add_argument("--script-id", "-i", required=False, help="Script ID (optional, single project only)")
     parser.add_argument("--script-version", "-s", required=False, type=int, help="Script version (optional, integer)")
     parser.add_argument("--max-count", "-m", required=False, type=int, default=3, help="Maximum count (default: 3)")
+    parser.add_argument("--tag", "-t", action="append", default=[], help="Also run projects with this tag (repeatable)")
+    parser.add_argument("--all-active", action="store_true", help="Also run every project with projectStatus=active")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="Concurrent executions in batch mode (default: 4)")
+    parser.add_argument("--jsonl", action="store_true", help="Batch mode output (JSON lines) even for a single project")
     args = parser.parse_args()
-    asyncio.run(
-        run(
-            args.project,
-            script_id=args.script_id,
+
+    batch = args.jsonl or args.tag or args.all_active or len(args.projects) > 1
+    if not batch:
+        if not args.projects:
+            parser.error("a project id, --tag or --all-active is required")
+        asyncio.run(
+            run(
+                args.projects[0],
+                script_id=args.script_id,
+                script_version=args.script_version,
+                max_count=args.max_count
+            )
+        )
+        return
+    if args.script_id:
+        parser.error("--script-id can only be used with a single project")
+    sys.exit(asyncio.run(
+        run_batch(
+            args.projects,
+            tags=args.tag,
+            all_active=args.all_active,
+            concurrency=max(args.concurrency, 1),
             script_version=args.script_version,
-            max_count=args.max_count
+            max_count=args.max_count,
         )
-    )
+    ))
 
 if __name__ == "__main__":
     main()